@@ -10,6 +10,8 @@ export interface UserProfile {
   last_name: string;
   profile: {
     photo: string | null;
+    // Square, EXIF-stripped avatar sizes: size -> format -> URL
+    photo_variants?: Record<'small' | 'medium' | 'large', { webp: string; jpeg: string }> | null;
     bio: string;
     middle_initial: string | null;
     created_at: string;
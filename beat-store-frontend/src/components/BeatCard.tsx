@@ -35,6 +35,7 @@ const BeatCard = ({
   id,
   name,
   cover_art,
+  cover_art_variants,
   genre,
   snippet_mp3,
   mp3_file,
@@ -124,7 +125,7 @@ const BeatCard = ({
         {cover_art ? (
           <img 
             className="cover-art" 
-            src={cover_art} 
+            src={cover_art_variants?.card.webp ?? cover_art} 
             alt={name}
             style={{ width: '100%', height: '120px', objectFit: 'cover' }}
           />
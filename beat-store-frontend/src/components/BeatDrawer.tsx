@@ -42,7 +42,7 @@ import AlreadyPurchasedModal from '@/components/AlreadyPurchasedModal';
 
 import { genreColors } from '@/constants/genreColors';
 import { iconTypeMap, levelColorMap, levelLabelMap } from '@/constants/licenseMaps';
-import { useCheckPurchaseQuery, useDownloadBeatMutation } from '@/store/beatApi';
+import { useCheckPurchaseQuery, useDownloadBeatMutation, useGetWaveformQuery } from '@/store/beatApi';
 import JSZip from 'jszip';
 import { generateLicenseAgreementPDF } from '@/utils/pdfUtils';
 import '@/components/Style/beatdrawer.scss';
@@ -181,6 +181,11 @@ const BeatDrawer = ({
   const [isWaveformLoading, setIsWaveformLoading] = useState(true);
   const waveformLoadStartTime = useRef<number | null>(null);
 
+  // Precomputed peaks (shared with the beat's row through the query cache)
+  const { data: waveformPeaks, isLoading: isPeaksLoading } = useGetWaveformQuery(beat?.id ?? 0, {
+    skip: !beat?.snippet_mp3 || !open,
+  });
+
   // Download mutation
   const [downloadBeat, { isLoading: isDownloadingBeat }] = useDownloadBeatMutation();
 
@@ -773,9 +778,10 @@ const BeatDrawer = ({
                           transition: 'opacity 0.5s ease-in-out',
                         }}
                       >
-                        {audioUrl && beat && (
+                        {audioUrl && beat && !isPeaksLoading && (
                           <Waveform
                             url={audioUrl}
+                            peaks={waveformPeaks}
                             isCurrent={isCurrent}
                             beatId={beat.id}
                             height={isSmallScreen ? 32 : 40}
@@ -8,6 +8,7 @@ import {
 } from '@mui/icons-material';
 
 import type { BeatType } from '@/store/beatApi';
+import { useGetWaveformQuery } from '@/store/beatApi';
 import { usePlaybackStore } from '@/store/playBackStore';
 import { useBeatPurchaseCheck } from '@/hooks/useBeatPurchaseCheck';
 
@@ -59,10 +60,15 @@ const BeatRow = ({
   bpm,
   scale,
   cover_art,
+  cover_art_variants,
   snippet_mp3,
   mp3_file,
   onClick,
 }: BeatRowProps) => {
+  // Only generated snippets have peaks; until they arrive the waveform isn't drawn
+  const { data: waveformPeaks, isLoading: isPeaksLoading } = useGetWaveformQuery(id, {
+    skip: !snippet_mp3,
+  });
   const { currentBeatId, isPlaying, play, pause, setBeat } = usePlaybackStore();
 
   const isCurrent = currentBeatId === id;
@@ -183,7 +189,7 @@ const BeatRow = ({
         {cover_art ? (
           <Avatar
             className="cover-art"
-            src={cover_art}
+            src={cover_art_variants?.thumb.webp ?? cover_art}
             alt={name}
             sx={{
               width: 24,
@@ -321,9 +327,10 @@ const BeatRow = ({
             transition: 'opacity 0.5s ease-in-out',
           }}
         >
-          {waveformUrl && (
+          {waveformUrl && !isPeaksLoading && (
             <Waveform
               url={waveformUrl}
+              peaks={waveformPeaks}
               isCurrent={isCurrent}
               beatId={id}
               onReady={handleWaveformReady}
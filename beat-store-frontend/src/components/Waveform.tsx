@@ -2,9 +2,11 @@
 import React, { useEffect, useRef } from 'react';
 import WaveSurfer from 'wavesurfer.js';
 import { useWaveformStore } from '@/store/waveformStore';
+import type { WaveformPeaks } from '@/store/beatApi';
 
 interface WaveformProps {
   url: string;
+  peaks?: WaveformPeaks | null;
   isCurrent: boolean;
   beatId: number;
   audioElementId?: string;
@@ -19,6 +21,7 @@ interface WaveformProps {
 
 const Waveform = ({
   url,
+  peaks,
   isCurrent = false,
   beatId,
   waveColor = '#373737',
@@ -37,6 +40,14 @@ const Waveform = ({
   useEffect(() => {
     if (!containerRef.current || !url) return;
 
+    // With server-side peaks the audio never needs to be fetched or decoded here;
+    // an unloaded media element is enough to keep the progress in sync
+    const channelData = peaks?.data.length
+      ? [Float32Array.from(peaks.data, value => value / 2 ** (peaks.bits - 1))]
+      : undefined;
+    const media = channelData ? document.createElement('audio') : undefined;
+    if (media) media.preload = 'none';
+
     // Create the WaveSurfer instance
     const wavesurfer = WaveSurfer.create({
       container: containerRef.current,
@@ -49,11 +60,12 @@ const Waveform = ({
       cursorWidth: 0,
       mediaControls: false,
       interact: false,
-      backend: 'WebAudio',
+      backend: channelData ? 'MediaElement' : 'WebAudio',
+      media,
     });
 
     wavesurferRef.current = wavesurfer;
-    wavesurfer.load(url);
+    wavesurfer.load(url, channelData, channelData ? peaks?.duration : undefined);
 
     // Register this instance with the store
     registerInstance(url, beatId, wavesurfer);
@@ -68,6 +80,7 @@ const Waveform = ({
     };
   }, [
     url,
+    peaks,
     beatId,
     height,
     waveColor,
@@ -123,5 +136,5 @@ const Waveform = ({
 };
 
 export default React.memo(Waveform, (prev, next) => {
-  return prev.url === next.url && prev.isCurrent === next.isCurrent;
+  return prev.url === next.url && prev.peaks === next.peaks && prev.isCurrent === next.isCurrent;
 });
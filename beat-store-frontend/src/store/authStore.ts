@@ -58,7 +58,7 @@ export const useAuthStore = create<AuthState>((set, get) => ({
 
       // Transform backend profile to frontend format
       // Photo URL is already a full URL from backend (S3 or local)
-      const avatarUrl = profile.profile?.photo || null;
+      const avatarUrl = profile.profile?.photo_variants?.medium.webp || profile.profile?.photo || null;
 
       const authProfile: AuthUserProfile = {
         username: profile.username,
@@ -181,7 +181,8 @@ export const useAuthStore = create<AuthState>((set, get) => ({
 
       // Transform backend response to frontend format
       // Photo URL is already a full URL from backend (S3 or local)
-      const avatarUrl = updatedProfile.profile?.photo || null;
+      const avatarUrl =
+        updatedProfile.profile?.photo_variants?.medium.webp || updatedProfile.profile?.photo || null;
 
       const authProfile: AuthUserProfile = {
         username: updatedProfile.username,
@@ -36,6 +36,19 @@ const baseQueryWithReauth = async (args: any, api: any, extraOptions: any) => {
   return result;
 };
 
+// Precomputed min/max peaks of the preview snippet (audiowaveform JSON layout)
+export interface WaveformPeaks {
+  bits: number;
+  length: number;
+  duration: number;
+  sample_rate: number;
+  samples_per_pixel: number;
+  data: number[];
+}
+
+// Resized copies of the cover art: variant -> format -> URL
+export type CoverArtVariants = Record<'thumb' | 'card' | 'full', { webp: string; jpeg: string }>;
+
 export interface BeatType {
   id: number;
   name: string;
@@ -43,7 +56,9 @@ export interface BeatType {
   bpm: number;
   scale: string;
   cover_art: string | null;
+  cover_art_variants?: CoverArtVariants | null;
   snippet_mp3: string | null;
+  waveform_peaks?: WaveformPeaks | null;
   mp3_file: string | null;
   mp3_price: string | null;
   wav_file: string | null;
@@ -103,6 +118,10 @@ export const beatApi = createApi({
     getBeats: builder.query<BeatType[], void>({
       query: () => 'beats/',
     }),
+    // Peaks aren't part of the list payload; the server revalidates them with an ETag
+    getWaveform: builder.query<WaveformPeaks, number>({
+      query: beatId => `beats/${beatId}/waveform/`,
+    }),
     checkPurchase: builder.query<CheckPurchaseResponse, { beatId: number; downloadType: string }>({
       query: ({ beatId, downloadType }) => ({
         url: `beats/${beatId}/check_purchase/?type=${downloadType}`,
@@ -151,6 +170,7 @@ export const beatApi = createApi({
 
 export const {
   useGetBeatsQuery,
+  useGetWaveformQuery,
   useCreatePaymentIntentMutation,
   usePurchaseBeatMutation,
   useDownloadBeatMutation,
@@ -1,11 +1,17 @@
 from django.contrib import admin
-from .models import Beat, Purchase, UserProfile, StripeWebhookEvent
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import path, reverse
+from django.utils.html import format_html
+from .models import Beat, Purchase, RequestProfile, UserProfile, StripeWebhookEvent
 
 @admin.register(Beat)
 class BeatAdmin(admin.ModelAdmin):
     list_display = ("name", "genre", "bpm", "mp3_price", "uploaded_by", "created_at")
     search_fields = ("name", "genre", "uploaded_by__username")
     list_filter = ("genre", "scale", "bpm", "uploaded_by")
+    # uploaded_by is nullable, so the changelist's automatic select_related() skips it
+    list_select_related = ("uploaded_by",)
     
     def save_model(self, request, obj, form, change):
         """Automatically set uploaded_by to the current user when creating a new beat"""
@@ -112,3 +118,70 @@ class StripeWebhookEventAdmin(admin.ModelAdmin):
     def has_delete_permission(self, request, obj=None):
         """Only superusers can delete StripeWebhookEvents"""
         return request.user.is_superuser
+
+@admin.register(RequestProfile)
+class RequestProfileAdmin(admin.ModelAdmin):
+    list_display = ("method", "path", "status_code", "duration_ms", "format", "user", "created_at", "download_link")
+    search_fields = ("path", "user__username")
+    list_filter = ("format", "method", "created_at")
+    list_select_related = ("user",)
+    fields = ("method", "path", "status_code", "duration_ms", "format", "user", "created_at", "download_link", "summary_text")
+    readonly_fields = fields
+    
+    def get_queryset(self, request):
+        # Raw profiles can be megabytes each; the list and detail pages only need the metadata
+        return super().get_queryset(request).defer("data")
+    
+    def get_urls(self):
+        urls = [
+            path(
+                "<int:pk>/download/",
+                self.admin_site.admin_view(self.download_view),
+                name="beats_requestprofile_download",
+            ),
+        ]
+        return urls + super().get_urls()
+    
+    def download_view(self, request, pk):
+        """Serve the raw profile as a .prof or speedscope .json file"""
+        if not self.has_view_permission(request):
+            return HttpResponse(status=403)
+        profile = get_object_or_404(RequestProfile, pk=pk)
+        if not profile.data:
+            return HttpResponse("Profile was too large to store", status=404, content_type="text/plain")
+        if profile.format == "speedscope":
+            content_type, filename = "application/json", f"profile-{pk}.speedscope.json"
+        else:
+            content_type, filename = "application/octet-stream", f"profile-{pk}.prof"
+        response = HttpResponse(bytes(profile.data), content_type=content_type)
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
+    
+    @admin.display(description="Download")
+    def download_link(self, obj):
+        url = reverse("admin:beats_requestprofile_download", args=[obj.pk])
+        return format_html('<a href="{}">{}</a>', url, "speedscope JSON" if obj.format == "speedscope" else ".prof")
+    
+    @admin.display(description="Summary")
+    def summary_text(self, obj):
+        return format_html('<pre style="white-space: pre; overflow-x: auto;">{}</pre>', obj.summary)
+    
+    def has_module_permission(self, request):
+        """Only superusers can access RequestProfile model"""
+        return request.user.is_superuser
+    
+    def has_view_permission(self, request, obj=None):
+        """Only superusers can view RequestProfiles"""
+        return request.user.is_superuser
+    
+    def has_add_permission(self, request):
+        """RequestProfiles are recorded by the profiler middleware, no manual add"""
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        """RequestProfiles are read-only"""
+        return False
+    
+    def has_delete_permission(self, request, obj=None):
+        """Only superusers can delete RequestProfiles"""
+        return request.user.is_superuser
@@ -0,0 +1,271 @@
+"""
+Local read-through disk cache for media kept in remote storage.
+
+Snippet and waveform generation, metadata and cover backfills and purchased
+downloads all read whole files, and with S3 every read transfers the same
+object again. With MEDIA_CACHE_DIR set, those reads go through a cache on
+local disk:
+
+- Entries are validated against the object's ETag, so a hit costs a HEAD
+  request instead of a GET. Content-addressed objects (see beats.storage)
+  never change and cost no request at all.
+- Entries are downloaded to a temporary file and renamed into place, so a
+  reader never sees a partial file.
+- Filling an entry holds a file lock, so gunicorn workers and management
+  commands that want the same object download it once.
+- The total size is bounded by MEDIA_CACHE_MAX_BYTES. Every hit bumps the
+  entry's mtime and the least recently used entries are evicted first.
+
+An entry may be evicted at any time, so callers either open it straight away
+(open_cached) or take a private hard link to it (checkout). Locks use fcntl,
+so the cache needs a POSIX system.
+"""
+
+from contextlib import closing, contextmanager
+from django.conf import settings
+from .instrumentation import timed
+from .storage import blob_name, is_blob_name
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+import uuid
+
+# Bytes copied at a time while filling an entry
+COPY_SIZE = 1024 * 1024
+
+# Eviction stops at this fraction of MEDIA_CACHE_MAX_BYTES, so it doesn't run on every fill
+LOW_WATER = 0.9
+
+# Larger objects would push out most of the cache; they are read from storage directly
+MAX_ENTRY_FRACTION = 0.25
+
+# Temporary files and checkouts left behind by a crashed process are removed after a day
+STALE_TEMP_AGE = 24 * 60 * 60
+
+# Entries hash onto this many lock files, so the lock directory stays small
+LOCK_STRIPES = 256
+
+
+def enabled(storage):
+    """Check whether reads from ``storage`` go through the cache (remote storage only)"""
+    if not settings.MEDIA_CACHE_DIR:
+        return False
+    try:
+        storage.path('')
+    except NotImplementedError:
+        return True
+    return False
+
+
+def get(storage, name, fill=True):
+    """Return the path of the current cache entry of a stored file, or None.
+
+    Misses are downloaded unless ``fill`` is false. None is also returned
+    when the cache is disabled or the file is too large to cache. Raises
+    FileNotFoundError if the file doesn't exist in storage. The entry may
+    be evicted at any time: open it straight away, or use checkout().
+    """
+    root = settings.MEDIA_CACHE_DIR
+    if not root:
+        return None
+    key = blob_name(name) or name
+
+    # Content-addressed objects never change, so a hit needs no validation
+    if is_blob_name(key):
+        path = _entry_path(root, key, 'immutable')
+        if _touch(path):
+            return path
+    version, size = _stat(storage, name, key)
+    path = _entry_path(root, key, 'immutable' if is_blob_name(key) else version)
+    if _touch(path):
+        return path
+    if not fill or size > settings.MEDIA_CACHE_MAX_BYTES * MAX_ENTRY_FRACTION:
+        return None
+
+    with _locked(_lock_path(root, key)):
+        # Another worker may have filled it while this one waited for the lock
+        if not _touch(path):
+            _fill(storage, name, key, version, path)
+    _evict(root, settings.MEDIA_CACHE_MAX_BYTES)
+    return path
+
+
+def open_cached(storage, name, fill=True):
+    """Open the cache entry of a stored file for binary reading, or return None (see get())"""
+    # Retried once, for an entry evicted between get() and open()
+    for attempt in range(2):
+        path = get(storage, name, fill=fill)
+        if path is None:
+            return None
+        try:
+            return open(path, 'rb')
+        except FileNotFoundError:
+            if attempt:
+                raise
+
+
+def open_file(storage, name):
+    """Open a stored file for binary reading, through the cache when it applies"""
+    handle = open_cached(storage, name) if enabled(storage) else None
+    return handle if handle is not None else storage.open(name, 'rb')
+
+
+def checkout(storage, name, suffix=''):
+    """Return the path of a private hard link to the cache entry of a stored file, or None.
+
+    Unlike the entry itself, the link survives eviction; the caller must
+    delete it. Returns None when get() would.
+    """
+    root = settings.MEDIA_CACHE_DIR
+    for attempt in range(2):
+        path = get(storage, name)
+        if path is None:
+            return None
+        link = os.path.join(_temp_dir(root), f'{uuid.uuid4().hex}{suffix}')
+        try:
+            os.link(path, link)
+            return link
+        except FileNotFoundError:
+            # Evicted between get() and link()
+            if attempt:
+                raise
+        except OSError:
+            # A filesystem without hard links
+            shutil.copyfile(path, link)
+            return link
+
+
+def _stat(storage, name, key):
+    """Return (version, size) of a stored file: its ETag on S3, else its mtime and size"""
+    if settings.USE_S3:
+        from botocore.exceptions import ClientError
+
+        obj = storage.bucket.Object(storage._normalize_name(key))
+        try:
+            with timed('storage'):
+                obj.load()
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                raise FileNotFoundError(name) from None
+            raise
+        return obj.e_tag, obj.content_length
+    size = storage.size(name)
+    return f'{storage.get_modified_time(name).timestamp()}-{size}', size
+
+
+def _open_version(storage, name, key, version):
+    """Open a stored file, failing if it no longer matches ``version``"""
+    if settings.USE_S3:
+        obj = storage.bucket.Object(storage._normalize_name(key))
+        # IfMatch: an object replaced since _stat() raises instead of being cached under the old ETag
+        return closing(obj.get(IfMatch=version)['Body'])
+    return storage.open(name, 'rb')
+
+
+def _fill(storage, name, key, version, path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=_temp_dir(settings.MEDIA_CACHE_DIR))
+    try:
+        with os.fdopen(fd, 'wb') as target, timed('storage'):
+            with _open_version(storage, name, key, version) as source:
+                shutil.copyfileobj(source, target, COPY_SIZE)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+def _evict(root, max_bytes):
+    """Delete the least recently used entries until the cache is under LOW_WATER"""
+    # One process evicts at a time; the others carry on rather than wait
+    with _locked(os.path.join(root, 'locks', 'evict.lock'), blocking=False) as acquired:
+        if not acquired:
+            return
+        entries = []
+        total = 0
+        for folder in _scandir(os.path.join(root, 'objects')):
+            for entry in _scandir(folder.path):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+
+        if total > max_bytes:
+            for _, size, path in sorted(entries):
+                if total <= max_bytes * LOW_WATER:
+                    break
+                _remove(path)
+                total -= size
+
+        stale = time.time() - STALE_TEMP_AGE
+        for entry in _scandir(_temp_dir(root)):
+            try:
+                if entry.stat().st_mtime < stale:
+                    _remove(entry.path)
+            except FileNotFoundError:
+                pass
+
+
+def _entry_path(root, key, version):
+    digest = hashlib.sha256(key.encode('utf-8')).hexdigest()
+    tag = hashlib.sha256(version.encode('utf-8')).hexdigest()[:16]
+    # Keep the extension: ffmpeg and friends look at it
+    extension = os.path.splitext(key)[1].lower()
+    return os.path.join(root, 'objects', digest[:2], f'{digest}-{tag}{extension}')
+
+
+def _lock_path(root, key):
+    stripe = int(hashlib.sha256(key.encode('utf-8')).hexdigest(), 16) % LOCK_STRIPES
+    return os.path.join(root, 'locks', f'{stripe:03d}.lock')
+
+
+def _temp_dir(root):
+    path = os.path.join(root, 'tmp')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+@contextmanager
+def _locked(path, blocking=True):
+    """Hold an exclusive flock on ``path``; yields False if not blocking and it is taken"""
+    import fcntl
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'a') as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _touch(path):
+    """Mark an entry as just used; returns False if there is no such entry"""
+    try:
+        os.utime(path)
+        return True
+    except FileNotFoundError:
+        return False
+
+
+def _scandir(path):
+    try:
+        with os.scandir(path) as entries:
+            return list(entries)
+    except FileNotFoundError:
+        return []
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
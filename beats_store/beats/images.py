@@ -0,0 +1,148 @@
+"""
+Image derivative helpers built on Pillow.
+
+Uploaded images (beat covers, user avatars) are resized into a few fixed
+variants and re-encoded as WebP and JPEG, so clients never download the
+original upload just to draw a thumbnail. Like beats.media, nothing in here
+touches the ORM.
+"""
+
+import hashlib
+import io
+import os
+
+# Longest edge in pixels of each cover art variant
+COVER_VARIANT_SIZES = {
+    'thumb': 160,
+    'card': 480,
+    'full': 1200,
+}
+
+# Edge in pixels of each (square) avatar variant
+AVATAR_VARIANT_SIZES = {
+    'small': 64,
+    'medium': 128,
+    'large': 256,
+}
+
+# Uploads with more pixels than this are rejected before they are decoded
+MAX_SOURCE_PIXELS = 40_000_000
+
+# Output formats: extension -> (Pillow format, save options)
+IMAGE_FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 85, 'optimize': True, 'progressive': True}),
+}
+
+
+def variant_prefix(source_name):
+    """Return the deterministic storage prefix for the variants of a file.
+
+    The prefix sits next to the source ("covers/x.png" -> "covers/variants/
+    x-<hash>") and includes a hash of the full source name, so a replaced
+    upload never collides with the variants of the previous one.
+    """
+    folder = os.path.dirname(source_name)
+    stem = os.path.splitext(os.path.basename(source_name))[0]
+    digest = hashlib.sha1(source_name.encode('utf-8')).hexdigest()[:10]
+    return os.path.join(folder, 'variants', f'{stem}-{digest}')
+
+
+def variant_name(source_name, variant, extension):
+    """Return the storage name of one variant of a source file"""
+    return f'{variant_prefix(source_name)}/{variant}.{extension}'
+
+
+def store_image_variants(storage, source_name, rendered, old_variants=None):
+    """Save rendered variants under their deterministic names.
+
+    Objects that already exist are reused rather than re-uploaded, and any
+    names in ``old_variants`` that are not part of the new set are deleted.
+    With content-addressed storage every save takes a reference on the
+    shared object, so only names not already held by ``old_variants`` are
+    saved. Returns ``{variant: {extension: name}}``.
+    """
+    from django.core.files.base import ContentFile
+    from .storage import ContentAddressedStorageMixin
+
+    content_addressed = isinstance(storage, ContentAddressedStorageMixin)
+    old_names = set(variant_names(old_variants))
+    variants = {}
+    for variant, encoded in rendered.items():
+        variants[variant] = {}
+        for extension, content in encoded.items():
+            name = variant_name(source_name, variant, extension)
+            content = ContentFile(content)
+            if content_addressed:
+                stored = storage.content_name(name, content)
+                name = stored if stored in old_names else storage.save(name, content)
+            elif not storage.exists(name):
+                name = storage.save(name, content)
+            variants[variant][extension] = name
+
+    delete_image_variants(storage, old_variants, keep=variants)
+    return variants
+
+
+def delete_image_variants(storage, variants, keep=None):
+    """Delete the stored files of a variants map, except those also in ``keep``"""
+    kept = set(variant_names(keep))
+    for name in set(variant_names(variants)) - kept:
+        storage.delete(name)
+
+
+def variant_names(variants):
+    """Return every storage name in a {variant: {extension: name}} map"""
+    return [name for formats in (variants or {}).values() for name in formats.values()]
+
+
+def render_image_variants(source, sizes, formats=tuple(IMAGE_FORMATS), square=False):
+    """Resize an image into each size and encode it in each format.
+
+    ``source`` is a path or binary file object and ``sizes`` maps variant
+    names to the longest edge in pixels; images are never upscaled. With
+    ``square`` the image is centre-cropped to a square first. EXIF
+    orientation is applied and all metadata is dropped from the output.
+    Returns ``{variant: {extension: bytes}}``. Raises ValueError for images
+    above MAX_SOURCE_PIXELS.
+    """
+    from PIL import Image, ImageOps
+
+    largest = max(sizes.values())
+    with Image.open(source) as image:
+        # Only the header has been read so far, so this check costs no decoding
+        if image.width * image.height > MAX_SOURCE_PIXELS:
+            raise ValueError(f'Image is too large ({image.width}x{image.height})')
+        # Let the JPEG decoder downscale while decoding, which bounds memory for huge uploads
+        image.draft('RGB', (largest, largest))
+        image = ImageOps.exif_transpose(image)
+        image = _flatten(image)
+
+    if square:
+        side = min(image.size)
+        image = ImageOps.fit(image, (side, side), method=Image.Resampling.LANCZOS)
+
+    rendered = {}
+    # Work from the largest size down so each resize starts from a smaller image
+    for variant, size in sorted(sizes.items(), key=lambda item: item[1], reverse=True):
+        image = image.copy()
+        image.thumbnail((size, size), Image.Resampling.LANCZOS)
+        rendered[variant] = {}
+        for extension in formats:
+            pillow_format, options = IMAGE_FORMATS[extension]
+            buffer = io.BytesIO()
+            image.save(buffer, format=pillow_format, **options)
+            rendered[variant][extension] = buffer.getvalue()
+    return rendered
+
+
+def _flatten(image):
+    """Convert to RGB, compositing any transparency onto white"""
+    from PIL import Image
+
+    if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
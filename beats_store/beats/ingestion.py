@@ -0,0 +1,119 @@
+"""
+Bulk-ingestion mode for beats.
+
+Saving a Beat normally cuts its 30-second preview and resizes its cover art
+inline (see the post_save signals in models.py). When many beats are created
+or updated at once that means a full decode/encode per row, so bulk paths
+should wrap their work in ``bulk_ingestion()``:
+
+    from beats.ingestion import bulk_ingestion
+
+    with bulk_ingestion():
+        for row in rows:
+            Beat.objects.create(**row)
+
+While the block is active the signals only record which beats need media
+processing. When the outermost block exits the queued work is done in one
+batch (pass ``process_on_exit=False`` to leave it for the backfill_snippets
+and backfill_cover_variants commands instead).
+"""
+
+from contextlib import contextmanager
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+_state = threading.local()
+
+
+def is_bulk_ingesting():
+    """Return True if the current thread is inside a bulk_ingestion() block"""
+    return getattr(_state, 'depth', 0) > 0
+
+
+def queue_snippet(beat_id, replace_existing=False):
+    """Remember that a beat needs its snippet generated once ingestion ends"""
+    pending = _state.pending
+    # A replace request wins over a plain generate for the same beat
+    pending[beat_id] = pending.get(beat_id, False) or replace_existing
+
+
+def queue_cover_variants(beat_id):
+    """Remember that a beat needs its cover art variants built once ingestion ends"""
+    _state.pending_covers.add(beat_id)
+
+
+def pending_snippets():
+    """Return a copy of the snippets queued so far in the current block"""
+    return dict(getattr(_state, 'pending', {}))
+
+
+@contextmanager
+def bulk_ingestion(process_on_exit=True):
+    """Suspend per-row media processing for the duration of the block.
+
+    Blocks may be nested; only the outermost one processes the queue.
+    Yields a dict mapping queued beat IDs to their replace_existing flag.
+    """
+    if not is_bulk_ingesting():
+        _state.pending = {}
+        _state.pending_covers = set()
+    _state.depth = getattr(_state, 'depth', 0) + 1
+    completed = False
+    try:
+        yield _state.pending
+        completed = True
+    finally:
+        _state.depth -= 1
+        if _state.depth == 0:
+            pending = _state.pending
+            pending_covers = _state.pending_covers
+            _state.pending = {}
+            _state.pending_covers = set()
+            if completed and process_on_exit:
+                if pending:
+                    generate_pending_snippets(pending)
+                if pending_covers:
+                    generate_pending_cover_variants(pending_covers)
+
+
+def generate_pending_snippets(pending):
+    """Generate snippets for queued beats in one pass.
+
+    ``pending`` maps beat IDs to whether an existing auto-generated snippet
+    should be replaced. Returns a tuple of (generated, failed) counts.
+    """
+    from .models import Beat, generate_snippet
+
+    generated = 0
+    failed = 0
+    beats = Beat.objects.filter(pk__in=list(pending)).only('id', 'mp3_file', 'snippet_mp3')
+    for beat in beats.iterator():
+        if generate_snippet(beat, replace_existing=pending[beat.pk]):
+            generated += 1
+        else:
+            failed += 1
+
+    logger.info(f"Bulk ingestion generated {generated} snippet(s), {failed} failed")
+    return generated, failed
+
+
+def generate_pending_cover_variants(beat_ids):
+    """Build cover art variants for queued beats in one pass.
+
+    Returns a tuple of (generated, failed) counts.
+    """
+    from .models import Beat, generate_cover_variants
+
+    generated = 0
+    failed = 0
+    beats = Beat.objects.filter(pk__in=list(beat_ids)).only('id', 'cover_art', 'cover_art_variants')
+    for beat in beats.iterator():
+        if generate_cover_variants(beat):
+            generated += 1
+        else:
+            failed += 1
+
+    logger.info(f"Bulk ingestion generated cover variants for {generated} beat(s), {failed} failed")
+    return generated, failed
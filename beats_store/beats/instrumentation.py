@@ -0,0 +1,186 @@
+"""
+Per-request performance instrumentation.
+
+RequestMetricsMiddleware (beats.middleware) opens a RequestTimings for every
+request. While it is active, time spent in the database, the storage backend
+and Stripe is added to it:
+
+    from beats.instrumentation import timed
+
+    with timed('stripe'):
+        intent = stripe.PaymentIntent.retrieve(payment_intent_id)
+
+Database queries are timed automatically through connection.execute_wrapper,
+and storage calls through the storage classes in beats.storage. Outside of a
+request ``timed()`` does nothing, so management commands pay no cost.
+
+Finished requests are aggregated per endpoint in an in-process registry,
+which the /metrics view renders in the Prometheus text format. Each worker
+process keeps its own registry, so counters restart with the worker and a
+scrape sees the worker that answered it.
+"""
+
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+import threading
+import time
+
+# Upper bounds (seconds) of the request duration histogram buckets
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_current = ContextVar('beats_request_timings', default=None)
+
+
+class RequestTimings:
+    """Calls and seconds spent per dependency during one request"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.calls = defaultdict(int)
+        self.seconds = defaultdict(float)
+        # Dependencies currently being timed, so nested calls aren't counted twice
+        self.active = set()
+
+    def add(self, dependency, seconds):
+        self.calls[dependency] += 1
+        self.seconds[dependency] += seconds
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+
+def current_timings():
+    """Return the RequestTimings of the request being handled, or None"""
+    return _current.get()
+
+
+@contextmanager
+def track_request():
+    """Collect timings for the enclosed block; yields the RequestTimings"""
+    timings = RequestTimings()
+    token = _current.set(timings)
+    try:
+        yield timings
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def timed(dependency):
+    """Add the time spent in the block to the current request under ``dependency``"""
+    timings = _current.get()
+    if timings is None or dependency in timings.active:
+        yield
+        return
+    timings.active.add(dependency)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.active.discard(dependency)
+        timings.add(dependency, time.perf_counter() - started)
+
+
+def timed_query(execute, sql, params, many, context):
+    """connection.execute_wrapper hook that times every query as 'db'"""
+    with timed('db'):
+        return execute(sql, params, many, context)
+
+
+def server_timing_header(timings):
+    """Format a RequestTimings as a Server-Timing header value"""
+    entries = [f'total;dur={timings.elapsed() * 1000:.1f}']
+    for dependency in sorted(timings.seconds):
+        calls = timings.calls[dependency]
+        label = 'queries' if dependency == 'db' else 'calls'
+        entries.append(
+            f'{dependency};dur={timings.seconds[dependency] * 1000:.1f};desc="{calls} {label}"'
+        )
+    return ', '.join(entries)
+
+
+class MetricsRegistry:
+    """Thread-safe per-endpoint aggregates of finished requests"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.requests = defaultdict(int)
+            self.durations = defaultdict(lambda: [0] * (len(DURATION_BUCKETS) + 1))
+            self.duration_sums = defaultdict(float)
+            self.response_bytes = defaultdict(int)
+            self.dependency_calls = defaultdict(int)
+            self.dependency_seconds = defaultdict(float)
+
+    def observe(self, endpoint, method, status_code, timings, response_size):
+        duration = timings.elapsed()
+        key = (endpoint, method)
+        with self._lock:
+            self.requests[key + (str(status_code),)] += 1
+            buckets = self.durations[key]
+            for index, bound in enumerate(DURATION_BUCKETS):
+                if duration <= bound:
+                    buckets[index] += 1
+                    break
+            else:
+                buckets[-1] += 1
+            self.duration_sums[key] += duration
+            self.response_bytes[key] += response_size
+            for dependency, calls in timings.calls.items():
+                self.dependency_calls[key + (dependency,)] += calls
+                self.dependency_seconds[key + (dependency,)] += timings.seconds[dependency]
+
+    def render(self):
+        """Return the registry in the Prometheus text exposition format"""
+        with self._lock:
+            lines = []
+            self._header(lines, 'beats_http_requests_total', 'counter', 'Finished requests')
+            for (endpoint, method, status_code), count in sorted(self.requests.items()):
+                labels = _labels(endpoint=endpoint, method=method, status=status_code)
+                lines.append(f'beats_http_requests_total{{{labels}}} {count}')
+
+            self._header(lines, 'beats_http_request_duration_seconds', 'histogram', 'Request wall time')
+            for (endpoint, method), buckets in sorted(self.durations.items()):
+                cumulative = 0
+                for bound, count in zip(DURATION_BUCKETS + ('+Inf',), buckets):
+                    cumulative += count
+                    labels = _labels(endpoint=endpoint, method=method, le=bound)
+                    lines.append(f'beats_http_request_duration_seconds_bucket{{{labels}}} {cumulative}')
+                labels = _labels(endpoint=endpoint, method=method)
+                lines.append(f'beats_http_request_duration_seconds_sum{{{labels}}} {self.duration_sums[(endpoint, method)]:.6f}')
+                lines.append(f'beats_http_request_duration_seconds_count{{{labels}}} {cumulative}')
+
+            self._header(lines, 'beats_http_response_size_bytes_total', 'counter', 'Response body bytes')
+            for (endpoint, method), size in sorted(self.response_bytes.items()):
+                labels = _labels(endpoint=endpoint, method=method)
+                lines.append(f'beats_http_response_size_bytes_total{{{labels}}} {size}')
+
+            self._header(lines, 'beats_dependency_calls_total', 'counter', 'Database queries, storage and Stripe calls')
+            for (endpoint, method, dependency), calls in sorted(self.dependency_calls.items()):
+                labels = _labels(endpoint=endpoint, method=method, dependency=dependency)
+                lines.append(f'beats_dependency_calls_total{{{labels}}} {calls}')
+
+            self._header(lines, 'beats_dependency_duration_seconds_total', 'counter', 'Time spent in database, storage and Stripe calls')
+            for (endpoint, method, dependency), seconds in sorted(self.dependency_seconds.items()):
+                labels = _labels(endpoint=endpoint, method=method, dependency=dependency)
+                lines.append(f'beats_dependency_duration_seconds_total{{{labels}}} {seconds:.6f}')
+
+        return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def _header(lines, name, metric_type, help_text):
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {metric_type}')
+
+
+def _labels(**labels):
+    def escape(value):
+        return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return ','.join(f'{name}="{escape(value)}"' for name, value in labels.items())
+
+
+registry = MetricsRegistry()
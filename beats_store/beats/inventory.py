@@ -0,0 +1,207 @@
+"""
+Listing stored media and the file names the database refers to.
+
+Storage backends only offer listdir(), which builds each directory's full
+listing in memory (and on S3 issues a request per "directory"). The
+maintenance commands (collect_orphaned_media, audit_media) instead stream a
+prefix in pages: ListObjectsV2 on S3, os.scandir() locally. Names are
+relative to the storage root, exactly as stored in the file fields.
+"""
+
+from collections import namedtuple
+from datetime import datetime, timezone
+from django.conf import settings
+from .instrumentation import timed
+from .storage import BLOB_PREFIX, blob_name, is_blob_name
+import os
+
+# Keys per ListObjectsV2 page, and the most S3 DeleteObjects accepts per call
+PAGE_SIZE = 1000
+DELETE_BATCH_SIZE = 1000
+
+# Files anyone may fetch, as (model, file field, variants field): previews, covers and
+# avatars. mp3_file, wav_file and stems_file are sold and only leave through the download action
+PUBLIC_FILE_FIELDS = (
+    ('Beat', 'snippet_mp3', 'snippet_renditions'),
+    ('Beat', 'cover_art', 'cover_art_variants'),
+    ('UserProfile', 'photo', 'photo_variants'),
+)
+
+StoredObject = namedtuple('StoredObject', 'name size modified')
+Reference = namedtuple('Reference', 'name owner field size')
+
+
+def media_prefixes():
+    """Return the folders that hold uploaded media: every upload_to, plus the content-addressed objects"""
+    from .models import Beat, UserProfile
+
+    prefixes = {f'{BLOB_PREFIX}/'}
+    for model in (Beat, UserProfile):
+        for field in model._meta.get_fields():
+            upload_to = getattr(field, 'upload_to', None)
+            if isinstance(upload_to, str) and upload_to:
+                prefixes.add(upload_to.rstrip('/') + '/')
+    return sorted(prefixes)
+
+
+def public_prefixes():
+    """Return the folders of the public file fields; their variants are stored beneath them"""
+    from django.apps import apps
+
+    return tuple(sorted({
+        apps.get_model('beats', model)._meta.get_field(field).upload_to.rstrip('/') + '/'
+        for model, field, _ in PUBLIC_FILE_FIELDS
+    }))
+
+
+def is_public_media(name):
+    """Check whether a stored file may be served without authorization.
+
+    ``name`` must be normalized. Content-addressed objects are shared by every
+    name with the same content, so one is public only if it was stored under
+    a public name (ContentBlob.public, set by beats.storage).
+    """
+    from .models import ContentBlob
+
+    if not is_blob_name(name):
+        return name.startswith(public_prefixes())
+    return ContentBlob.objects.filter(name=name, public=True).exists()
+
+
+def iter_references():
+    """Yield a Reference for every stored file a beat or profile points at.
+
+    Includes image variants and snippet renditions. ``size`` is the recorded size from
+    Beat.media_metadata, or None when there is none (or it is stale).
+    """
+    from .models import Beat, UserProfile
+
+    rows = Beat.objects.values_list(
+        'pk', *Beat.MEDIA_FIELDS, 'cover_art_variants', 'snippet_renditions', 'media_metadata',
+    )
+    for pk, *files, variants, renditions, metadata in rows.iterator(chunk_size=2000):
+        owner = f'Beat {pk}'
+        for field, name in zip(Beat.MEDIA_FIELDS, files):
+            if name:
+                recorded = (metadata or {}).get(field) or {}
+                size = recorded.get('size') if recorded.get('name') == name else None
+                yield Reference(name, owner, field, size)
+        yield from _variant_references(owner, 'cover_art_variants', variants)
+        yield from _variant_references(owner, 'snippet_renditions', renditions)
+
+    rows = UserProfile.objects.values_list('pk', 'photo', 'photo_variants')
+    for pk, photo, variants in rows.iterator(chunk_size=2000):
+        owner = f'UserProfile {pk}'
+        if photo:
+            yield Reference(photo, owner, 'photo', None)
+        yield from _variant_references(owner, 'photo_variants', variants)
+
+
+def _variant_references(owner, field, variants):
+    for variant, formats in (variants or {}).items():
+        for extension, name in formats.items():
+            if name:
+                yield Reference(name, owner, f'{field}.{variant}.{extension}', None)
+
+
+def referenced_names():
+    """Return the set of storage names referenced by any row.
+
+    Covers everything from iter_references(), plus the files of resumable
+    uploads still in progress. For content-addressed names, the key of the
+    object behind them is included too.
+    """
+    from .models import ResumableUpload
+
+    names = {reference.name for reference in iter_references()}
+    for key in ResumableUpload.objects.values_list('key', flat=True).iterator(chunk_size=2000):
+        names.update((key, key + '.part'))
+    names.update(filter(None, [blob_name(name) for name in names]))
+    return names
+
+
+def list_objects(storage, prefix='', page_size=PAGE_SIZE):
+    """Yield the objects under ``prefix`` in lists of up to ``page_size`` StoredObjects"""
+    if settings.USE_S3:
+        yield from _list_s3(storage, prefix, page_size)
+    else:
+        yield from _list_local(storage, prefix, page_size)
+
+
+def _list_s3(storage, prefix, page_size):
+    paginator = storage.connection.meta.client.get_paginator('list_objects_v2')
+    location = storage.location.rstrip('/') + '/' if storage.location else ''
+    pages = paginator.paginate(
+        Bucket=storage.bucket_name,
+        Prefix=location + prefix,
+        PaginationConfig={'PageSize': page_size},
+    )
+    while True:
+        with timed('storage'):
+            page = next(pages, None)
+        if page is None:
+            return
+        yield [
+            StoredObject(item['Key'][len(location):], item['Size'], item['LastModified'])
+            for item in page.get('Contents', [])
+        ]
+
+
+def _list_local(storage, prefix, page_size):
+    root = storage.path('')
+    start = storage.path(prefix) if prefix else root
+    if not os.path.isdir(start):
+        return
+    page = []
+    pending = [start]
+    while pending:
+        # One directory at a time; scandir gets the file types without a stat() per entry
+        with timed('storage'):
+            files = []
+            with os.scandir(pending.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        pending.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        files.append((entry.path, entry.stat(follow_symlinks=False)))
+        for path, stat in files:
+            name = os.path.relpath(path, root).replace(os.sep, '/')
+            modified = datetime.fromtimestamp(stat.st_mtime, tz=timezone.utc)
+            page.append(StoredObject(name, stat.st_size, modified))
+            if len(page) >= page_size:
+                yield page
+                page = []
+    if page:
+        yield page
+
+
+def delete_objects(storage, names):
+    """Delete objects straight from the backend, bypassing storage.delete().
+
+    Content-addressed references are not touched. Names are sent to S3
+    DELETE_BATCH_SIZE at a time. Returns {name: error} for the objects that
+    could not be deleted.
+    """
+    errors = {}
+    names = list(names)
+    if settings.USE_S3:
+        location = storage.location.rstrip('/') + '/' if storage.location else ''
+        for offset in range(0, len(names), DELETE_BATCH_SIZE):
+            batch = names[offset:offset + DELETE_BATCH_SIZE]
+            with timed('storage'):
+                response = storage.bucket.delete_objects(
+                    Delete={'Objects': [{'Key': location + name} for name in batch], 'Quiet': True},
+                )
+            for error in response.get('Errors', []):
+                errors[error['Key'][len(location):]] = error.get('Message') or error.get('Code')
+        return errors
+
+    for name in names:
+        try:
+            with timed('storage'):
+                os.remove(storage.path(name))
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            errors[name] = str(e)
+    return errors
@@ -0,0 +1,64 @@
+"""
+Django management command to remove abandoned resumable uploads.
+
+Uploads that haven't received a chunk for a while are aborted: their partial
+file (or S3 multipart upload, which S3 keeps billing for) is deleted along
+with their ResumableUpload row. See beats.resumable.
+
+Usage:
+    python manage.py abort_stale_uploads
+
+    # Uploads idle for more than 6 hours, listing them only
+    python manage.py abort_stale_uploads --hours 6 --dry-run
+"""
+
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from beats import resumable
+from beats.models import ResumableUpload
+
+
+class Command(BaseCommand):
+    help = 'Abort resumable uploads that have not progressed recently'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hours',
+            type=float,
+            default=24,
+            help='Abort uploads idle for longer than this (default: 24)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='List the uploads that would be aborted without aborting them',
+        )
+
+    def handle(self, *args, **options):
+        if options['hours'] <= 0:
+            raise CommandError('--hours must be positive')
+        cutoff = timezone.now() - timedelta(hours=options['hours'])
+        stale = ResumableUpload.objects.filter(updated_at__lt=cutoff).order_by('updated_at')
+
+        aborted = failed = 0
+        for upload in stale.iterator():
+            self.stdout.write(f'  {upload} (idle since {upload.updated_at:%Y-%m-%d %H:%M})')
+            if options['dry_run']:
+                continue
+            try:
+                resumable.abort(upload)
+            except Exception as e:
+                # Leave the row so the next run retries
+                self.stderr.write(self.style.ERROR(f'  Could not abort {upload.pk}: {e}'))
+                failed += 1
+                continue
+            upload.delete()
+            aborted += 1
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(f'Dry run: {stale.count()} uploads would be aborted'))
+            return
+        self.stdout.write(self.style.SUCCESS(f'Aborted {aborted} uploads'))
+        if failed:
+            raise CommandError(f'{failed} uploads could not be aborted')
@@ -0,0 +1,122 @@
+"""
+Django management command to build resized cover art variants for existing beats.
+
+New cover uploads get their thumbnail/card/full WebP and JPEG variants from the
+post_save signal. This command fills them in for beats whose cover was
+uploaded before the pipeline existed, or was loaded during bulk ingestion
+with processing deferred. Pillow releases the GIL while resizing and
+encoding, so covers are processed on a thread pool.
+
+Usage:
+    python manage.py backfill_cover_variants
+
+    # Preview which beats would be processed
+    python manage.py backfill_cover_variants --dry-run
+
+    # Rebuild variants for every beat with a cover
+    python manage.py backfill_cover_variants --force
+"""
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+from beats.models import Beat, build_cover_variants
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Build resized cover art variants for beats that are missing them'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='List the beats that would be processed without generating anything',
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Rebuild variants even for beats that already have them',
+        )
+        parser.add_argument(
+            '--beat-id',
+            type=int,
+            help='Process only a specific beat by ID',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=4,
+            help='Number of covers processed in parallel (default: 4)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=100,
+            help='Beats saved per bulk_update (default: 100)',
+        )
+
+    def handle(self, *args, **options):
+        beats = (
+            Beat.objects.exclude(Q(cover_art='') | Q(cover_art__isnull=True))
+            .only('id', 'name', 'cover_art', 'cover_art_variants')
+            .order_by('id')
+        )
+        if options['beat_id']:
+            beats = beats.filter(id=options['beat_id'])
+        if not options['force']:
+            beats = beats.filter(cover_art_variants__isnull=True)
+
+        beats = list(beats)
+        self.stdout.write(f'Found {len(beats)} beat(s) needing cover variants')
+
+        if options['dry_run']:
+            for beat in beats:
+                self.stdout.write(f'  [DRY RUN] Beat {beat.id} ({beat.name}): {beat.cover_art.name}')
+            return
+
+        batch_size = max(1, options['batch_size'])
+        generated_count = 0
+        error_count = 0
+        with ThreadPoolExecutor(max_workers=max(1, options['workers'])) as pool:
+            for offset in range(0, len(beats), batch_size):
+                batch = beats[offset:offset + batch_size]
+                futures = {pool.submit(self._build, beat): beat for beat in batch}
+                updated = []
+                for future in as_completed(futures):
+                    beat = futures[future]
+                    try:
+                        beat.cover_art_variants, elapsed = future.result()
+                    except Exception as e:
+                        self.stdout.write(
+                            self.style.ERROR(f'  ✗ Beat {beat.id} ({beat.name}): {e}')
+                        )
+                        logger.error(f'Error building cover variants for beat {beat.id}: {e}')
+                        error_count += 1
+                        continue
+                    updated.append(beat)
+                    self.stdout.write(
+                        self.style.SUCCESS(f'  ✓ Beat {beat.id} ({beat.name}): {elapsed:.2f}s')
+                    )
+                # bulk_update bypasses the save signals, so nothing is rebuilt twice
+                Beat.objects.bulk_update(updated, ['cover_art_variants'])
+                generated_count += len(updated)
+
+        # Summary
+        self.stdout.write('\n' + '='*50)
+        self.stdout.write(self.style.SUCCESS('Backfill Summary:'))
+        self.stdout.write(f'  Generated: {generated_count}')
+        self.stdout.write(f'  Errors: {error_count}')
+        self.stdout.write('='*50)
+
+        if error_count > 0:
+            raise CommandError(f'{error_count} cover(s) could not be processed')
+
+    @staticmethod
+    def _build(beat):
+        started = time.perf_counter()
+        variants = build_cover_variants(beat)
+        return variants, time.perf_counter() - started
@@ -0,0 +1,137 @@
+"""
+Django management command to record media metadata for existing beats.
+
+New uploads are described (size, SHA-256, MIME type, audio format) by the
+post_save signal. This command fills Beat.media_metadata in for files stored
+before it existed, loaded during bulk ingestion, too large to describe inline
+(MEDIA_METADATA_INLINE_MAX_BYTES), uploaded straight to storage, or replaced
+without a normal save (e.g. snippets rebuilt by backfill_snippets). Run it
+periodically, e.g. from cron. Reading files is
+I/O bound and hashlib releases the GIL, so beats are processed on a thread
+pool.
+
+Usage:
+    python manage.py backfill_media_metadata
+
+    # Preview which beats would be processed
+    python manage.py backfill_media_metadata --dry-run
+
+    # Describe every file again, e.g. to verify checksums
+    python manage.py backfill_media_metadata --force
+"""
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from django.core.management.base import BaseCommand, CommandError
+from beats.models import Beat, build_media_metadata
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Record size, checksum and format of beat files that have no media metadata'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='List the beats that would be processed without reading any files',
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Describe every file, even ones whose metadata is current',
+        )
+        parser.add_argument(
+            '--beat-id',
+            type=int,
+            help='Process only a specific beat by ID',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=4,
+            help='Number of beats processed in parallel (default: 4)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=100,
+            help='Beats saved per bulk_update (default: 100)',
+        )
+
+    def handle(self, *args, **options):
+        beats = Beat.objects.only('id', 'name', 'media_metadata', *Beat.MEDIA_FIELDS).order_by('id')
+        if options['beat_id']:
+            beats = beats.filter(id=options['beat_id'])
+
+        # Staleness is per field, so it's checked here rather than in SQL
+        pending = []
+        for beat in beats.iterator(chunk_size=2000):
+            fields = self._stale_fields(beat, options['force'])
+            if fields:
+                pending.append((beat, fields))
+        self.stdout.write(f'Found {len(pending)} beat(s) needing media metadata')
+
+        if options['dry_run']:
+            for beat, fields in pending:
+                self.stdout.write(f"  [DRY RUN] Beat {beat.id} ({beat.name}): {', '.join(fields)}")
+            return
+
+        batch_size = max(1, options['batch_size'])
+        recorded_count = 0
+        error_count = 0
+        with ThreadPoolExecutor(max_workers=max(1, options['workers'])) as pool:
+            for offset in range(0, len(pending), batch_size):
+                batch = pending[offset:offset + batch_size]
+                futures = {pool.submit(self._build, beat, fields): beat for beat, fields in batch}
+                updated = []
+                for future in as_completed(futures):
+                    beat = futures[future]
+                    try:
+                        beat.media_metadata, elapsed = future.result()
+                    except Exception as e:
+                        self.stdout.write(
+                            self.style.ERROR(f'  ✗ Beat {beat.id} ({beat.name}): {e}')
+                        )
+                        logger.error(f'Error recording media metadata for beat {beat.id}: {e}')
+                        error_count += 1
+                        continue
+                    updated.append(beat)
+                    self.stdout.write(
+                        self.style.SUCCESS(f'  ✓ Beat {beat.id} ({beat.name}): {elapsed:.2f}s')
+                    )
+                # bulk_update bypasses the save signals, so nothing is described twice
+                Beat.objects.bulk_update(updated, ['media_metadata'])
+                recorded_count += len(updated)
+
+        # Summary
+        self.stdout.write('\n' + '='*50)
+        self.stdout.write(self.style.SUCCESS('Backfill Summary:'))
+        self.stdout.write(f'  Recorded: {recorded_count}')
+        self.stdout.write(f'  Errors: {error_count}')
+        self.stdout.write('='*50)
+
+        if error_count > 0:
+            raise CommandError(f'{error_count} beat(s) could not be processed')
+
+    @staticmethod
+    def _stale_fields(beat, force):
+        """Return the file fields of a beat whose metadata is missing, outdated or left over"""
+        recorded = beat.media_metadata or {}
+        fields = []
+        for name in Beat.MEDIA_FIELDS:
+            if getattr(beat, name):
+                # Never recorded, or recorded for a file that has since been replaced
+                if force or beat.get_media_metadata(name) is None:
+                    fields.append(name)
+            elif name in recorded:
+                fields.append(name)
+        return fields
+
+    @staticmethod
+    def _build(beat, fields):
+        started = time.perf_counter()
+        metadata = build_media_metadata(beat, fields)
+        return metadata, time.perf_counter() - started
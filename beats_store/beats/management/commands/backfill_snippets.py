@@ -0,0 +1,243 @@
+"""
+Django management command to generate preview snippets for existing beats in bulk.
+
+Beats imported by load_beats or migrated by migrate_to_s3 skip the per-save
+snippet signal, and a snippet can go stale when mp3_file is replaced outside
+of a normal save. This command finds those beats and rebuilds their snippets:
+source files are fetched and results uploaded on a thread pool, while the
+CPU-bound decode/trim/encode runs on a process pool sized to the machine.
+Waveform peaks and the bitrate renditions are computed from the same decoded
+audio and saved with the snippet; auto-generated snippets that have no peaks
+or renditions yet are rebuilt too.
+
+Usage:
+    python manage.py backfill_snippets
+
+    # Preview which beats would be processed
+    python manage.py backfill_snippets --dry-run
+
+    # Regenerate every auto-generated snippet, not just missing/stale ones
+    python manage.py backfill_snippets --force
+
+    # Process a single beat with 2 encoder processes
+    python manage.py backfill_snippets --beat-id 1 --workers 2
+"""
+
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from django.core.management.base import BaseCommand, CommandError
+from django.core.files.base import ContentFile
+from django.db import connections
+from django.db.models import Q
+from beats.models import Beat, store_snippet_renditions
+from beats.media import (
+    fetch_to_local,
+    is_auto_snippet,
+    is_stale_snippet,
+    preview_formats,
+    render_snippet_timed,
+    snippet_filename_for,
+)
+import os
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Generate missing or stale preview snippets for existing beats'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='List the beats that would be processed without generating anything',
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Regenerate all auto-generated snippets, not only missing or stale ones',
+        )
+        parser.add_argument(
+            '--beat-id',
+            type=int,
+            help='Process only a specific beat by ID',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Number of encoder processes (default: number of CPU cores)',
+        )
+        parser.add_argument(
+            '--io-workers',
+            type=int,
+            default=8,
+            help='Number of threads used to download sources and upload snippets (default: 8)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=100,
+            help='Beats processed and saved per batch (default: 100)',
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        batch_size = max(1, options['batch_size'])
+
+        candidates = self._find_candidates(options['beat_id'], options['force'])
+        total = len(candidates)
+        self.stdout.write(f'Found {total} beat(s) needing a snippet')
+
+        if dry_run:
+            for beat, reason in candidates:
+                self.stdout.write(f'  [DRY RUN] Beat {beat.id} ({beat.name}): {reason}')
+            return
+        if not candidates:
+            return
+
+        # Worker processes never touch the database; don't let them inherit open connections
+        connections.close_all()
+
+        started = time.perf_counter()
+        generated_count = 0
+        error_count = 0
+        with ProcessPoolExecutor(max_workers=max(1, options['workers'])) as process_pool, \
+                ThreadPoolExecutor(max_workers=max(1, options['io_workers'])) as io_pool:
+            for offset in range(0, total, batch_size):
+                batch = candidates[offset:offset + batch_size]
+                generated, errors = self._process_batch(batch, process_pool, io_pool)
+                generated_count += generated
+                error_count += errors
+
+        elapsed = time.perf_counter() - started
+
+        # Summary
+        self.stdout.write('\n' + '='*50)
+        self.stdout.write(self.style.SUCCESS('Backfill Summary:'))
+        self.stdout.write(f'  Generated: {generated_count}')
+        self.stdout.write(f'  Errors: {error_count}')
+        self.stdout.write(f'  Wall time: {elapsed:.2f}s')
+        self.stdout.write('='*50)
+
+        if error_count > 0:
+            raise CommandError(f'{error_count} snippet(s) could not be generated')
+
+    def _find_candidates(self, beat_id, force):
+        """Return a list of (beat, reason) tuples for beats that need a snippet"""
+        beats = (
+            Beat.objects.exclude(Q(mp3_file='') | Q(mp3_file__isnull=True))
+            .only('id', 'name', 'mp3_file', 'snippet_mp3', 'waveform_peaks', 'snippet_renditions')
+            .order_by('id')
+        )
+        if beat_id:
+            beats = beats.filter(id=beat_id)
+
+        candidates = []
+        for beat in beats.iterator():
+            snippet_name = beat.snippet_mp3.name
+            if not snippet_name:
+                candidates.append((beat, 'missing'))
+            elif is_stale_snippet(snippet_name, beat.mp3_file.name):
+                candidates.append((beat, 'stale'))
+            elif force and is_auto_snippet(snippet_name):
+                candidates.append((beat, 'forced'))
+            elif beat.waveform_peaks is None and is_auto_snippet(snippet_name):
+                candidates.append((beat, 'missing waveform'))
+            elif beat.snippet_renditions is None and is_auto_snippet(snippet_name):
+                candidates.append((beat, 'missing renditions'))
+        return candidates
+
+    def _process_batch(self, batch, process_pool, io_pool):
+        """Fetch, render and upload one batch, then save it with bulk_update"""
+        timings = {beat.id: {} for beat, _ in batch}
+        error_count = 0
+
+        # Stage 1: make every source available on local disk
+        fetch_futures = {
+            io_pool.submit(self._fetch, beat.mp3_file): beat for beat, _ in batch
+        }
+        sources = {}
+        for future in as_completed(fetch_futures):
+            beat = fetch_futures[future]
+            try:
+                sources[beat.id], timings[beat.id]['fetch'] = future.result()
+            except Exception as e:
+                self._report_error(beat, 'fetch', e)
+                error_count += 1
+
+        # Stage 2: decode/trim/encode in worker processes
+        render_futures = {
+            process_pool.submit(render_snippet_timed, sources[beat.id][0], preview_formats()): beat
+            for beat, _ in batch if beat.id in sources
+        }
+        upload_futures = {}
+        try:
+            for future in as_completed(render_futures):
+                beat = render_futures[future]
+                try:
+                    content, render_timings, waveform, renditions = future.result()
+                except Exception as e:
+                    self._report_error(beat, 'render', e)
+                    error_count += 1
+                    continue
+                timings[beat.id].update(render_timings)
+                beat.waveform_peaks = waveform
+                # Stage 3: upload as soon as each render finishes
+                upload_futures[io_pool.submit(self._upload, beat, content, renditions)] = beat
+        finally:
+            for path, is_temporary in sources.values():
+                if is_temporary:
+                    os.unlink(path)
+
+        updated = []
+        for future in as_completed(upload_futures):
+            beat = upload_futures[future]
+            try:
+                timings[beat.id]['upload'] = future.result()
+            except Exception as e:
+                self._report_error(beat, 'upload', e)
+                error_count += 1
+                continue
+            updated.append(beat)
+            self._report_timings(beat, timings[beat.id])
+
+        # bulk_update bypasses the save signals, so nothing is re-generated inline
+        Beat.objects.bulk_update(updated, ['snippet_mp3', 'waveform_peaks', 'snippet_renditions'])
+        return len(updated), error_count
+
+    @staticmethod
+    def _fetch(field_file):
+        started = time.perf_counter()
+        source = fetch_to_local(field_file, suffix='.mp3')
+        return source, time.perf_counter() - started
+
+    @staticmethod
+    def _upload(beat, content, renditions):
+        """Store the snippet and its renditions, replacing an old auto-generated one; return the elapsed time"""
+        started = time.perf_counter()
+        field = beat.snippet_mp3.field
+        old_name = beat.snippet_mp3.name
+        name = field.generate_filename(beat, snippet_filename_for(beat.mp3_file.name))
+        beat.snippet_mp3.name = field.storage.save(name, ContentFile(content))
+        if old_name and is_auto_snippet(old_name) and old_name != beat.snippet_mp3.name:
+            field.storage.delete(old_name)
+        beat.snippet_renditions = store_snippet_renditions(beat, renditions)
+        return time.perf_counter() - started
+
+    def _report_timings(self, beat, timings):
+        stages = ', '.join(
+            f'{stage} {timings[stage]:.2f}s'
+            for stage in ('fetch', 'decode', 'trim', 'encode', 'renditions', 'upload')
+            if stage in timings
+        )
+        self.stdout.write(
+            self.style.SUCCESS(f'  ✓ Beat {beat.id} ({beat.name}): {stages}')
+        )
+
+    def _report_error(self, beat, stage, error):
+        self.stdout.write(
+            self.style.ERROR(f'  ✗ Beat {beat.id} ({beat.name}): {stage} failed - {error}')
+        )
+        logger.error(f'Error backfilling snippet for beat {beat.id} during {stage}: {error}')
@@ -0,0 +1,529 @@
+"""
+Django management command to load-test the main API endpoints.
+
+Creates a throwaway test database (same engine as the configured one; never
+the real database), seeds it with synthetic beats, users, purchases and small
+real media files, then drives the catalog, detail, check_purchase, download,
+registration and webhook endpoints. Requests go through the Django test
+client by default, or over HTTP to a local gunicorn started for the run.
+
+For each endpoint it reports p50/p95/p99 latency, throughput, status codes
+and peak RSS, and writes everything to a JSON file so runs can be compared.
+
+Usage:
+    python manage.py benchmark_api
+
+    # A bigger dataset and more requests per endpoint
+    python manage.py benchmark_api --beats 10000 --users 2000 --purchases 50000 --requests 500
+
+    # Through gunicorn with 2 workers and 8 concurrent clients
+    python manage.py benchmark_api --gunicorn --gunicorn-workers 2 --concurrency 8
+
+    # Only some endpoints, results to a given file
+    python manage.py benchmark_api --endpoints catalog,detail --output results.json
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+from rest_framework_simplejwt.tokens import RefreshToken
+from beats.models import Beat, Purchase
+from beats.synthetic import seed
+import hashlib
+import hmac
+import itertools
+import json
+import math
+import os
+import platform
+import random
+import resource
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import django
+
+ENDPOINTS = ['catalog', 'detail', 'check_purchase', 'download', 'registration', 'webhook']
+
+# Signs the synthetic Stripe events; only valid inside the benchmark
+WEBHOOK_SECRET = 'whsec_benchmark'
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the main API endpoints against a seeded throwaway database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--beats', type=int, default=1000, help='Beats to seed (default: 1000)')
+        parser.add_argument('--users', type=int, default=200, help='Users to seed (default: 200)')
+        parser.add_argument('--purchases', type=int, default=2000, help='Purchases to seed (default: 2000)')
+        parser.add_argument(
+            '--assets',
+            type=int,
+            default=10,
+            help='Distinct sets of generated media files shared by the beats (default: 10)',
+        )
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=100,
+            help='Timed requests per endpoint (default: 100)',
+        )
+        parser.add_argument(
+            '--warmup',
+            type=int,
+            default=5,
+            help='Untimed requests per endpoint before measuring (default: 5)',
+        )
+        parser.add_argument(
+            '--endpoints',
+            type=str,
+            default=','.join(ENDPOINTS),
+            help=f'Comma-separated endpoints to run (default: {",".join(ENDPOINTS)})',
+        )
+        parser.add_argument(
+            '--gunicorn',
+            action='store_true',
+            help='Send requests over HTTP to a local gunicorn instead of the test client',
+        )
+        parser.add_argument(
+            '--gunicorn-workers',
+            type=int,
+            default=2,
+            help='gunicorn worker processes (default: 2)',
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=4,
+            help='Concurrent HTTP clients in --gunicorn mode (default: 4)',
+        )
+        parser.add_argument('--seed', type=int, default=0, help='Random seed (default: 0)')
+        parser.add_argument(
+            '--output',
+            type=str,
+            default=None,
+            help='Result file (default: benchmarks/api-<timestamp>.json)',
+        )
+
+    def handle(self, *args, **options):
+        endpoints = [name.strip() for name in options['endpoints'].split(',') if name.strip()]
+        unknown = set(endpoints) - set(ENDPOINTS)
+        if unknown:
+            raise CommandError(f'Unknown endpoint(s): {", ".join(sorted(unknown))}')
+        if settings.USE_S3:
+            raise CommandError('benchmark_api writes generated media; run it with local storage (no AWS credentials)')
+
+        work_dir = tempfile.mkdtemp(prefix='beats-benchmark-')
+        media_root = os.path.join(work_dir, 'media')
+        setup_test_environment()
+        old_database_name = self._create_database(work_dir)
+        try:
+            with override_settings(MEDIA_ROOT=media_root, STRIPE_WEBHOOK_SECRET=WEBHOOK_SECRET):
+                self.stdout.write('Seeding data...')
+                started = time.perf_counter()
+                fixtures = self._seed(options)
+                self.stdout.write(f'  Seeded in {time.perf_counter() - started:.1f}s')
+
+                if options['gunicorn']:
+                    results = self._run_gunicorn(endpoints, fixtures, media_root, options)
+                else:
+                    results = self._run_client(endpoints, fixtures, options)
+        finally:
+            connection.creation.destroy_test_db(old_database_name, verbosity=0)
+            teardown_test_environment()
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+        report = {
+            'started_at': datetime.now().isoformat(timespec='seconds'),
+            'mode': 'gunicorn' if options['gunicorn'] else 'test-client',
+            'environment': self._environment(options),
+            'dataset': {key: options[key] for key in ('beats', 'users', 'purchases', 'assets', 'seed')},
+            'requests_per_endpoint': options['requests'],
+            'endpoints': results,
+        }
+        self._print_report(results)
+
+        output = options['output'] or os.path.join(
+            'benchmarks', f"api-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+        )
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        with open(output, 'w') as f:
+            json.dump(report, f, indent=2)
+        self.stdout.write(self.style.SUCCESS(f'\nResults written to {output}'))
+
+    # Setup
+
+    def _create_database(self, work_dir):
+        """Create and migrate a test database; returns the name to restore afterwards"""
+        old_name = connection.settings_dict['NAME']
+        if connection.vendor == 'sqlite':
+            # A file rather than the default in-memory database, so gunicorn can open it too
+            connection.settings_dict.setdefault('TEST', {})['NAME'] = os.path.join(work_dir, 'benchmark.sqlite3')
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        return old_name
+
+    def _seed(self, options):
+        data = seed(
+            beats=options['beats'],
+            users=max(2, options['users']),
+            purchases=options['purchases'],
+            assets=options['assets'],
+            seed=options['seed'],
+        )
+        user_ids, beat_ids = data['user_ids'], data['beat_ids']
+        if not beat_ids:
+            raise CommandError('--beats must be at least 1')
+
+        # One buyer owns the MP3 of the first beats with files, so downloads always succeed
+        buyer_id = user_ids[0]
+        downloadable = list(
+            Beat.objects.filter(pk__in=beat_ids).exclude(mp3_file='').values('pk', 'mp3_price')[:50]
+        )
+        for beat in downloadable:
+            Purchase.objects.update_or_create(
+                user_id=buyer_id, beat_id=beat['pk'], download_type='mp3',
+                defaults={'price_paid': beat['mp3_price'], 'payment_status': 'completed'},
+            )
+        purchases = list(
+            Purchase.objects.filter(user__in=user_ids[:20]).values('user_id', 'beat_id', 'download_type')[:200]
+        )
+        tokens = {
+            user.pk: str(RefreshToken.for_user(user).access_token)
+            for user in User.objects.filter(pk__in=user_ids[:20])
+        }
+        return {
+            'beat_ids': beat_ids,
+            'user_ids': user_ids,
+            'buyer_id': buyer_id,
+            'downloadable_ids': [beat['pk'] for beat in downloadable],
+            'purchases': purchases,
+            'tokens': tokens,
+            'seed': options['seed'],
+        }
+
+    # Request definitions
+
+    def _request_factory(self, endpoint, fixtures):
+        """Return a function mapping a request number to (method, path, body, headers)"""
+        rng = random.Random(f"{endpoint}-{fixtures['seed']}")
+        beat_ids = fixtures['beat_ids']
+        tokens = fixtures['tokens']
+
+        def auth(user_id):
+            return {'Authorization': f'Bearer {tokens[user_id]}'}
+
+        if endpoint == 'catalog':
+            return lambda i: ('GET', '/api/beats/', None, {})
+        if endpoint == 'detail':
+            return lambda i: ('GET', f'/api/beats/{rng.choice(beat_ids)}/', None, {})
+        if endpoint == 'check_purchase':
+            purchases = fixtures['purchases']
+
+            def check_purchase(i):
+                purchase = purchases[i % len(purchases)]
+                # Alternate hits and misses
+                download_type = purchase['download_type'] if i % 2 else 'stems'
+                path = f"/api/beats/{purchase['beat_id']}/check_purchase/?type={download_type}"
+                return 'GET', path, None, auth(purchase['user_id'])
+            return check_purchase
+        if endpoint == 'download':
+            downloadable = fixtures['downloadable_ids']
+            if not downloadable:
+                raise CommandError('The download endpoint needs --assets > 0')
+            buyer = fixtures['buyer_id']
+            return lambda i: (
+                'GET', f'/api/beats/{downloadable[i % len(downloadable)]}/download/?type=mp3', None, auth(buyer),
+            )
+        if endpoint == 'registration':
+            def registration(i):
+                username = f'bench_{i}'
+                body = {
+                    'username': username,
+                    'email': f'{username}@example.com',
+                    'password': 'benchmark-password',
+                    'password_confirm': 'benchmark-password',
+                }
+                return 'POST', '/api/users/register/', json.dumps(body), {}
+            return registration
+        if endpoint == 'webhook':
+            user_ids = fixtures['user_ids']
+
+            def webhook(i):
+                event = {
+                    'id': f'evt_bench_{i}',
+                    'object': 'event',
+                    'type': 'payment_intent.succeeded',
+                    'data': {'object': {
+                        'id': f'pi_bench_{i}',
+                        'object': 'payment_intent',
+                        'amount': 2999,
+                        'metadata': {
+                            'user_id': str(rng.choice(user_ids)),
+                            'beat_id': str(rng.choice(beat_ids)),
+                            'download_type': 'wav',
+                        },
+                    }},
+                }
+                payload = json.dumps(event)
+                return 'POST', '/api/stripe/webhook/', payload, {'Stripe-Signature': _stripe_signature(payload)}
+            return webhook
+        raise CommandError(f'Unknown endpoint {endpoint}')
+
+    # Runners
+
+    def _run_client(self, endpoints, fixtures, options):
+        client = Client()
+        results = {}
+        for endpoint in endpoints:
+            self.stdout.write(f'Running {endpoint}...')
+            make_request = self._request_factory(endpoint, fixtures)
+            counter = itertools.count()
+
+            def send(_):
+                method, path, body, headers = make_request(next(counter))
+                started = time.perf_counter()
+                response = client.generic(
+                    method, path, body or '', content_type='application/json', headers=headers,
+                )
+                if getattr(response, 'streaming', False):
+                    b''.join(response.streaming_content)
+                return time.perf_counter() - started, response.status_code
+
+            for i in range(options['warmup']):
+                send(i)
+            _reset_peak_rss([os.getpid()])
+            started = time.perf_counter()
+            samples = [send(i) for i in range(options['requests'])]
+            elapsed = time.perf_counter() - started
+            results[endpoint] = _summarize(samples, elapsed, _peak_rss_kb([os.getpid()]))
+        return results
+
+    def _run_gunicorn(self, endpoints, fixtures, media_root, options):
+        import requests
+
+        port = _free_port()
+        base_url = f'http://127.0.0.1:{port}'
+        server = subprocess.Popen(
+            [
+                sys.executable, '-m', 'gunicorn', 'beats_store.wsgi:application',
+                '--bind', f'127.0.0.1:{port}',
+                '--workers', str(max(1, options['gunicorn_workers'])),
+                '--log-level', 'warning',
+            ],
+            cwd=settings.BASE_DIR,
+            env=self._gunicorn_env(media_root),
+        )
+        try:
+            _wait_until_ready(base_url, server)
+            pids = _process_tree(server.pid)
+            local = threading.local()
+            results = {}
+            with ThreadPoolExecutor(max_workers=max(1, options['concurrency'])) as pool:
+                for endpoint in endpoints:
+                    self.stdout.write(f'Running {endpoint}...')
+                    make_request = self._request_factory(endpoint, fixtures)
+                    counter = itertools.count()
+                    counter_lock = threading.Lock()
+
+                    def send(_):
+                        if not hasattr(local, 'session'):
+                            local.session = requests.Session()
+                        with counter_lock:
+                            method, path, body, headers = make_request(next(counter))
+                        headers = {
+                            'Content-Type': 'application/json',
+                            # Production settings redirect plain HTTP to HTTPS
+                            'X-Forwarded-Proto': 'https',
+                            **headers,
+                        }
+                        started = time.perf_counter()
+                        response = local.session.request(method, base_url + path, data=body, headers=headers)
+                        return time.perf_counter() - started, response.status_code
+
+                    list(pool.map(send, range(options['warmup'])))
+                    _reset_peak_rss(pids)
+                    started = time.perf_counter()
+                    samples = list(pool.map(send, range(options['requests'])))
+                    elapsed = time.perf_counter() - started
+                    results[endpoint] = _summarize(samples, elapsed, _peak_rss_kb(pids))
+            return results
+        finally:
+            server.terminate()
+            try:
+                server.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                server.kill()
+
+    def _gunicorn_env(self, media_root):
+        env = dict(os.environ)
+        database = connection.settings_dict
+        env.update({
+            'DEBUG': 'False',
+            'ALLOWED_HOSTS': '127.0.0.1,localhost',
+            'MEDIA_ROOT': media_root,
+            'STRIPE_WEBHOOK_SECRET': WEBHOOK_SECRET,
+            'STRIPE_WEBHOOK_SECRET_LIVE': WEBHOOK_SECRET,
+            'DATABASE_URL': _database_url(database),
+        })
+        if connection.vendor == 'sqlite':
+            env['SQLITE_PATH'] = str(database['NAME'])
+        return env
+
+    # Reporting
+
+    def _environment(self, options):
+        try:
+            commit = subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, cwd=settings.BASE_DIR,
+            ).stdout.strip() or None
+        except OSError:
+            commit = None
+        return {
+            'git_commit': commit,
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'cpu_count': os.cpu_count(),
+            'gunicorn_workers': options['gunicorn_workers'] if options['gunicorn'] else None,
+            'concurrency': options['concurrency'] if options['gunicorn'] else 1,
+        }
+
+    def _print_report(self, results):
+        self.stdout.write('\n' + '=' * 96)
+        self.stdout.write(
+            f"{'endpoint':<16}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>10}"
+            f"{'errors':>8}{'peak RSS MiB':>14}  status codes"
+        )
+        for endpoint, result in results.items():
+            rss = f"{result['peak_rss_kb'] / 1024:.1f}" if result['peak_rss_kb'] else 'n/a'
+            codes = ', '.join(f'{code}: {count}' for code, count in sorted(result['status_codes'].items()))
+            line = (
+                f"{endpoint:<16}{result['p50_ms']:>10.1f}{result['p95_ms']:>10.1f}{result['p99_ms']:>10.1f}"
+                f"{result['throughput_rps']:>10.1f}{result['errors']:>8}{rss:>14}  {codes}"
+            )
+            self.stdout.write(self.style.ERROR(line) if result['errors'] else line)
+        self.stdout.write('=' * 96)
+
+
+def _stripe_signature(payload):
+    timestamp = int(time.time())
+    signature = hmac.new(
+        WEBHOOK_SECRET.encode('utf-8'), f'{timestamp}.{payload}'.encode('utf-8'), hashlib.sha256,
+    ).hexdigest()
+    return f't={timestamp},v1={signature}'
+
+
+def _percentile(sorted_values, percent):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(percent / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def _summarize(samples, elapsed, peak_rss_kb):
+    latencies = sorted(latency * 1000 for latency, _ in samples)
+    status_codes = {}
+    for _, status_code in samples:
+        status_codes[str(status_code)] = status_codes.get(str(status_code), 0) + 1
+    return {
+        'requests': len(samples),
+        'errors': sum(count for code, count in status_codes.items() if int(code) >= 400),
+        'status_codes': status_codes,
+        'p50_ms': _percentile(latencies, 50),
+        'p95_ms': _percentile(latencies, 95),
+        'p99_ms': _percentile(latencies, 99),
+        'mean_ms': sum(latencies) / len(latencies) if latencies else 0.0,
+        'max_ms': latencies[-1] if latencies else 0.0,
+        'throughput_rps': len(samples) / elapsed if elapsed else 0.0,
+        'peak_rss_kb': peak_rss_kb,
+    }
+
+
+def _process_tree(pid):
+    """Return ``pid`` and its child processes (Linux only; just ``pid`` elsewhere)"""
+    pids = [pid]
+    try:
+        for task in os.listdir(f'/proc/{pid}/task'):
+            with open(f'/proc/{pid}/task/{task}/children') as f:
+                pids.extend(int(child) for child in f.read().split())
+    except OSError:
+        pass
+    return pids
+
+
+def _reset_peak_rss(pids):
+    """Reset the kernel's peak-RSS counter (VmHWM) so it covers only what follows"""
+    for pid in pids:
+        try:
+            with open(f'/proc/{pid}/clear_refs', 'w') as f:
+                f.write('5')
+        except OSError:
+            pass
+
+
+def _peak_rss_kb(pids):
+    """Largest peak RSS among ``pids`` in KiB, from /proc or getrusage() as a fallback"""
+    peaks = []
+    for pid in pids:
+        try:
+            with open(f'/proc/{pid}/status') as f:
+                for line in f:
+                    if line.startswith('VmHWM:'):
+                        peaks.append(int(line.split()[1]))
+        except OSError:
+            pass
+    if peaks:
+        return max(peaks)
+    if pids == [os.getpid()]:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in bytes on macOS and KiB elsewhere
+        return peak // 1024 if sys.platform == 'darwin' else peak
+    return None
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _wait_until_ready(base_url, server, timeout=30):
+    import requests
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise CommandError(f'gunicorn exited with status {server.returncode}')
+        try:
+            requests.get(f'{base_url}/api/beats/?fields=id', headers={'X-Forwarded-Proto': 'https'}, timeout=1)
+            return
+        except requests.ConnectionError:
+            time.sleep(0.2)
+    raise CommandError(f'gunicorn did not start within {timeout}s')
+
+
+def _database_url(database):
+    """Build a DATABASE_URL for the benchmark database, for the gunicorn process"""
+    if 'sqlite' in database['ENGINE']:
+        return f"sqlite:///{database['NAME']}"
+    if 'postgresql' in database['ENGINE']:
+        from urllib.parse import quote
+
+        credentials = quote(database.get('USER') or '')
+        if database.get('PASSWORD'):
+            credentials += ':' + quote(database['PASSWORD'])
+        host = database.get('HOST') or 'localhost'
+        port = f":{database['PORT']}" if database.get('PORT') else ''
+        return f"postgres://{credentials}@{host}{port}/{database['NAME']}"
+    raise CommandError(f"--gunicorn does not support the {database['ENGINE']} backend")
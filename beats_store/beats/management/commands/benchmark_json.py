@@ -0,0 +1,158 @@
+"""
+Django management command to benchmark JSON rendering of the beat catalog.
+
+Builds an in-memory catalog (nothing is written to the database), serializes
+it with BeatListSerializer exactly as the list endpoint does, then times
+DRF's stock JSONRenderer/JSONParser against beats.renderers' orjson-backed
+ones. The rendered bytes of both renderers are compared so any compatibility
+regression shows up next to the timings.
+
+Usage:
+    python manage.py benchmark_json
+
+    # Custom catalog sizes and repeats
+    python manage.py benchmark_json --sizes 1000,5000 --repeat 5
+
+    # Leave waveform peaks out of the catalog
+    python manage.py benchmark_json --no-waveforms
+"""
+
+from datetime import timedelta
+from decimal import Decimal
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from beats.models import Beat
+from beats.media import WAVEFORM_BUCKETS
+from beats.renderers import FastJSONParser, FastJSONRenderer, orjson
+from beats.serializers import BeatListSerializer
+import io
+import random
+import time
+
+# Distinct waveforms shared between the synthetic beats, to keep memory flat at 100k rows
+WAVEFORM_POOL_SIZE = 32
+
+
+class Command(BaseCommand):
+    help = 'Benchmark stdlib vs orjson rendering of the beat catalog'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            type=str,
+            default='1000,10000,100000',
+            help='Comma-separated catalog sizes (default: 1000,10000,100000)',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=3,
+            help='Timed runs per measurement; the fastest is reported (default: 3)',
+        )
+        parser.add_argument(
+            '--no-waveforms',
+            action='store_true',
+            help='Build beats without waveform peaks',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            sizes = [int(size) for size in options['sizes'].split(',') if size.strip()]
+        except ValueError:
+            raise CommandError(f"Invalid --sizes value: {options['sizes']}")
+        repeat = max(1, options['repeat'])
+
+        if orjson is None:
+            self.stdout.write(self.style.WARNING(
+                'orjson is not installed; FastJSONRenderer falls back to the stdlib encoder'
+            ))
+
+        # Build URLs against a host the project accepts, as a real list request would
+        host = next((h.lstrip('.') for h in settings.ALLOWED_HOSTS if h != '*'), 'localhost')
+        request = Request(APIRequestFactory().get('/api/beats/', HTTP_HOST=host))
+        rng = random.Random(0)
+        waveforms = [self._waveform(rng) for _ in range(WAVEFORM_POOL_SIZE)]
+        stock_renderer, fast_renderer = JSONRenderer(), FastJSONRenderer()
+        stock_parser, fast_parser = JSONParser(), FastJSONParser()
+
+        for size in sizes:
+            beats = [
+                self._beat(i, rng, None if options['no_waveforms'] else waveforms[i % len(waveforms)])
+                for i in range(size)
+            ]
+            started = time.perf_counter()
+            data = BeatListSerializer(beats, many=True, context={'request': request}).data
+            serialize_time = time.perf_counter() - started
+
+            stock_time, stock_bytes = self._best_of(repeat, stock_renderer.render, data)
+            fast_time, fast_bytes = self._best_of(repeat, fast_renderer.render, data)
+            stock_parse, _ = self._best_of(repeat, lambda: stock_parser.parse(io.BytesIO(stock_bytes)))
+            fast_parse, _ = self._best_of(repeat, lambda: fast_parser.parse(io.BytesIO(stock_bytes)))
+
+            self.stdout.write(f'\n{size} beats ({len(stock_bytes) / 1024 / 1024:.1f} MiB)')
+            self.stdout.write(f'  Serialize:         {serialize_time * 1000:9.1f} ms')
+            self.stdout.write(f'  Render (stdlib):   {stock_time * 1000:9.1f} ms')
+            self.stdout.write(
+                f'  Render (fast):     {fast_time * 1000:9.1f} ms  ({self._speedup(stock_time, fast_time)})'
+            )
+            self.stdout.write(f'  Parse (stdlib):    {stock_parse * 1000:9.1f} ms')
+            self.stdout.write(
+                f'  Parse (fast):      {fast_parse * 1000:9.1f} ms  ({self._speedup(stock_parse, fast_parse)})'
+            )
+            if fast_bytes == stock_bytes:
+                self.stdout.write(self.style.SUCCESS('  Output: byte-identical'))
+            else:
+                raise CommandError(f'Rendered output differs between renderers at {size} beats')
+
+    @staticmethod
+    def _best_of(repeat, func, *args):
+        best = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            result = func(*args)
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return best, result
+
+    @staticmethod
+    def _speedup(baseline, candidate):
+        return f'{baseline / candidate:.1f}x' if candidate else 'n/a'
+
+    @staticmethod
+    def _waveform(rng):
+        data = []
+        for _ in range(WAVEFORM_BUCKETS):
+            peak = rng.randint(0, 127)
+            data.extend((-peak, peak))
+        return {
+            'version': 2, 'channels': 1, 'sample_rate': 44100, 'samples_per_pixel': 3307,
+            'bits': 8, 'length': WAVEFORM_BUCKETS, 'duration': 30.0, 'data': data,
+        }
+
+    @staticmethod
+    def _beat(i, rng, waveform):
+        name = f'beat_{i:06d}'
+        return Beat(
+            id=i + 1,
+            name=f'Beat {i} – ünïcode',
+            genre=rng.choice(['Trap', 'Drill', 'Boom Bap', 'R&B', 'Afrobeats']),
+            bpm=rng.randint(60, 180),
+            scale=rng.choice(['C Minor', 'A Minor', 'F# Major']),
+            mp3_file=f'beats/{name}.mp3',
+            snippet_mp3=f'beats/snippets/{name}_preview.mp3',
+            cover_art=f'covers/{name}.png',
+            cover_art_variants={
+                variant: {ext: f'covers/variants/{name}/{variant}.{ext}' for ext in ('webp', 'jpeg')}
+                for variant in ('thumb', 'card', 'full')
+            },
+            waveform_peaks=waveform,
+            mp3_price=Decimal(rng.choice(['19.99', '29.99', '34.50'])),
+            wav_price=Decimal('49.99'),
+            stems_price=Decimal('149.00') if i % 3 else None,
+            created_at=timezone.now() - timedelta(minutes=i, microseconds=rng.randint(0, 999999)),
+        )
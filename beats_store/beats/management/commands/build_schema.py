@@ -0,0 +1,50 @@
+"""
+Django management command to prebuild the OpenAPI schema.
+
+Writes schema.json and schema.yaml to OPENAPI_SCHEMA_DIR, where /api/schema/
+serves them from (see beats.schema). Run it on every deploy, before
+collectstatic; outside DEBUG the schema endpoint answers 503 until it has run.
+
+Usage:
+    python manage.py build_schema
+
+    # Somewhere else, and fail on schema warnings (for CI)
+    python manage.py build_schema --output-dir /tmp/schema --fail-on-warn
+"""
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from beats.schema import generate_schema, write_schema
+import os
+
+
+class Command(BaseCommand):
+    help = 'Generate the OpenAPI schema served at /api/schema/'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output-dir',
+            type=str,
+            default=None,
+            help='Directory to write to (default: OPENAPI_SCHEMA_DIR)',
+        )
+        parser.add_argument(
+            '--fail-on-warn',
+            action='store_true',
+            help='Fail if drf-spectacular reports warnings or errors',
+        )
+
+    def handle(self, *args, **options):
+        from drf_spectacular.drainage import GENERATOR_STATS
+
+        schema = generate_schema()
+        if options['verbosity']:
+            GENERATOR_STATS.emit_summary()
+        if options['fail_on_warn'] and GENERATOR_STATS:
+            raise CommandError('Schema generation reported warnings')
+
+        directory = options['output_dir'] or settings.OPENAPI_SCHEMA_DIR
+        paths = write_schema(schema, directory)
+        for fmt, path in paths.items():
+            self.stdout.write(f'  {path} ({os.path.getsize(path)} bytes)')
+        self.stdout.write(self.style.SUCCESS(f"Wrote {len(schema.get('paths', {}))} paths"))
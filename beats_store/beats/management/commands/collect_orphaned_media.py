@@ -0,0 +1,132 @@
+"""
+Django management command to delete media files that nothing refers to.
+
+Deleting a beat, or replacing one of its files, leaves the old objects in
+S3 or MEDIA_ROOT; so do abandoned direct uploads. This command lists the
+media folders in pages (see beats.inventory) and deletes every object that
+no Beat, UserProfile or resumable upload refers to, in batches of up to 1000
+keys per S3 DeleteObjects call.
+
+Objects modified within --hours are always kept, so files uploaded but not
+yet attached to a row (direct uploads awaiting finalize, saves in progress)
+survive; the threshold can't be shorter than DIRECT_UPLOAD_EXPIRES.
+
+Usage:
+    python manage.py collect_orphaned_media --dry-run
+
+    # Only files older than a week, under one folder
+    python manage.py collect_orphaned_media --hours 168 --prefix covers/
+"""
+
+from datetime import timedelta
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from beats.inventory import DELETE_BATCH_SIZE, delete_objects, list_objects, media_prefixes, referenced_names
+from beats.models import ContentBlob
+from beats.storage import is_blob_name
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Delete stored media files that are no longer referenced by any beat or profile'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='List the files that would be deleted without deleting them',
+        )
+        parser.add_argument(
+            '--hours',
+            type=float,
+            default=24,
+            help='Keep files modified within this many hours (default: 24)',
+        )
+        parser.add_argument(
+            '--prefix',
+            action='append',
+            help='Folder to scan, e.g. "beats/"; repeatable (default: every media folder)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=DELETE_BATCH_SIZE,
+            help=f'Files deleted per batch (default and maximum: {DELETE_BATCH_SIZE})',
+        )
+
+    def handle(self, *args, **options):
+        if options['hours'] * 3600 < settings.DIRECT_UPLOAD_EXPIRES:
+            raise CommandError(
+                f'--hours must cover DIRECT_UPLOAD_EXPIRES ({settings.DIRECT_UPLOAD_EXPIRES}s), '
+                'or uploads awaiting finalize would be deleted'
+            )
+        # Taken before the rows are read: anything stored since is too recent to be deleted
+        cutoff = timezone.now() - timedelta(hours=options['hours'])
+        referenced = referenced_names()
+        self.stdout.write(f'{len(referenced)} file names are referenced')
+
+        batch_size = min(max(1, options['batch_size']), DELETE_BATCH_SIZE)
+        self.scanned = self.orphaned = self.deleted = self.freed = self.errors = 0
+        for prefix in options['prefix'] or media_prefixes():
+            batch = []
+            for page in list_objects(default_storage, prefix):
+                self.scanned += len(page)
+                for stored in page:
+                    if stored.name in referenced or stored.modified >= cutoff:
+                        continue
+                    self.orphaned += 1
+                    if options['dry_run']:
+                        self.stdout.write(f'  [DRY RUN] {stored.name} ({stored.size} bytes)')
+                        self.freed += stored.size
+                        continue
+                    batch.append(stored)
+                    if len(batch) >= batch_size:
+                        self._delete(batch, cutoff)
+                        batch = []
+            if batch:
+                self._delete(batch, cutoff)
+
+        # Summary
+        self.stdout.write('\n' + '='*50)
+        self.stdout.write(self.style.SUCCESS('Collection Summary:'))
+        self.stdout.write(f'  Scanned: {self.scanned}')
+        self.stdout.write(f'  Unreferenced: {self.orphaned}')
+        if options['dry_run']:
+            self.stdout.write(f'  Would free: {self.freed} bytes')
+        else:
+            self.stdout.write(f'  Deleted: {self.deleted} ({self.freed} bytes)')
+            self.stdout.write(f'  Errors: {self.errors}')
+        self.stdout.write('='*50)
+
+        if self.errors:
+            raise CommandError(f'{self.errors} file(s) could not be deleted')
+
+    def _delete(self, batch, cutoff):
+        """Delete a batch of unreferenced objects and the rows of content-addressed ones"""
+        with transaction.atomic():
+            # A save of the same content may have taken a new reference since the listing;
+            # the row lock makes it wait until the object is gone, and then upload it again
+            blobs = {stored.name for stored in batch if is_blob_name(stored.name)}
+            recent = set(
+                ContentBlob.objects.select_for_update()
+                .filter(name__in=blobs, updated_at__gte=cutoff)
+                .values_list('name', flat=True)
+            )
+            batch = [stored for stored in batch if stored.name not in recent]
+            errors = delete_objects(default_storage, [stored.name for stored in batch])
+            ContentBlob.objects.filter(name__in=blobs - recent - set(errors)).delete()
+
+        for stored in batch:
+            if stored.name in errors:
+                self.stdout.write(self.style.ERROR(f'  ✗ {stored.name}: {errors[stored.name]}'))
+                logger.error(f'Error deleting orphaned media {stored.name}: {errors[stored.name]}')
+                self.errors += 1
+            else:
+                self.stdout.write(self.style.SUCCESS(f'  ✓ {stored.name} ({stored.size} bytes)'))
+                self.deleted += 1
+                self.freed += stored.size
@@ -0,0 +1,118 @@
+"""
+Django management command to fill the database with a large synthetic catalog.
+
+Beats, users (with profiles) and purchases are inserted with bulk_create in
+batches, with realistic genre, tempo, key and price distributions and
+purchases concentrated on popular beats (see beats.synthetic). Optionally
+writes a few sets of small but real MP3/WAV/stems/PNG files for the beats to
+share, so downloads and snippet playback work too.
+
+Synthetic users are named "<prefix>_<n>" and log in with the password
+"synthetic-password"; their beats are uploaded by "<prefix>_producer".
+--clear removes all of them (and their beats and purchases) first.
+
+Usage:
+    python manage.py generate_catalog
+
+    # Production-sized
+    python manage.py generate_catalog --beats 100000 --users 50000 --purchases 1000000
+
+    # With playable media and waveforms
+    python manage.py generate_catalog --beats 5000 --assets 20 --waveforms
+
+    # Replace a previous run
+    python manage.py generate_catalog --clear --noinput
+"""
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from beats import synthetic
+import time
+
+
+class Command(BaseCommand):
+    help = 'Generate a large synthetic catalog of beats, users and purchases'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--beats', type=int, default=100000, help='Beats to create (default: 100000)')
+        parser.add_argument('--users', type=int, default=50000, help='Users to create (default: 50000)')
+        parser.add_argument(
+            '--purchases', type=int, default=1000000, help='Purchases to create (default: 1000000)'
+        )
+        parser.add_argument(
+            '--assets',
+            type=int,
+            default=0,
+            help='Sets of generated media files shared by the beats; 0 leaves beats without files (default: 0)',
+        )
+        parser.add_argument('--waveforms', action='store_true', help='Give beats synthetic waveform peaks')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows per INSERT (default: 5000)')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed (default: 0)')
+        parser.add_argument(
+            '--prefix',
+            type=str,
+            default=synthetic.DEFAULT_PREFIX,
+            help=f'Username prefix of the synthetic users (default: {synthetic.DEFAULT_PREFIX})',
+        )
+        parser.add_argument('--clear', action='store_true', help='Delete earlier synthetic data with this prefix first')
+        parser.add_argument('--noinput', '--no-input', action='store_false', dest='interactive',
+                            help='Do not ask for confirmation')
+        parser.add_argument('--force', action='store_true', help='Allow running with DEBUG off')
+
+    def handle(self, *args, **options):
+        for key in ('beats', 'users', 'purchases', 'assets'):
+            if options[key] < 0:
+                raise CommandError(f'--{key} cannot be negative')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1')
+        if options['purchases'] and not (options['beats'] and options['users']):
+            raise CommandError('Purchases need at least one beat and one user')
+        if not settings.DEBUG and not options['force']:
+            raise CommandError('DEBUG is off; pass --force to generate synthetic data in this database')
+
+        database = connection.settings_dict['NAME']
+        if options['interactive']:
+            answer = input(
+                f"Add {options['beats']} beats, {options['users']} users and {options['purchases']} purchases "
+                f"to '{database}'? [y/N] "
+            )
+            if answer.strip().lower() not in ('y', 'yes'):
+                self.stdout.write('Cancelled.')
+                return
+
+        started = time.perf_counter()
+
+        def progress(message):
+            self.stdout.write(f'  {message} ({time.perf_counter() - started:.1f}s)')
+
+        if options['clear']:
+            deleted = synthetic.clear(options['prefix'])
+            progress(f'Deleted {deleted} existing synthetic row(s)')
+
+        prefix = f"{options['prefix']}_"
+        if User.objects.filter(username__startswith=prefix).exclude(username=f'{prefix}producer').exists():
+            raise CommandError(f"Synthetic users named '{prefix}*' already exist; pass --clear to replace them")
+
+        with transaction.atomic():
+            result = synthetic.seed(
+                beats=options['beats'],
+                users=options['users'],
+                purchases=options['purchases'],
+                assets=options['assets'],
+                waveforms=options['waveforms'],
+                prefix=options['prefix'],
+                seed=options['seed'],
+                batch_size=options['batch_size'],
+                progress=progress,
+            )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {len(result['beat_ids'])} beats, {len(result['user_ids'])} users and "
+            f"{result['purchases']} purchases in {time.perf_counter() - started:.1f}s"
+        ))
+        if result['purchases'] < options['purchases']:
+            self.stdout.write(self.style.WARNING(
+                f"Only {result['purchases']} distinct purchases fit this many users and beats"
+            ))
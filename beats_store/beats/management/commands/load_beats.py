@@ -12,6 +12,7 @@ Usage:
 from django.core.management.base import BaseCommand
 from django.conf import settings
 from beats.models import Beat
+from beats.ingestion import bulk_ingestion
 from decimal import Decimal
 from pathlib import Path
 import json
@@ -92,47 +93,49 @@ class Command(BaseCommand):
         skipped_count = 0
         error_count = 0
         
-        for beat_data in beats_data:
-            fields = beat_data.get('fields', {})
-            beat_name = fields.get('name')
+        # Defer snippet generation until every row is in
+        with bulk_ingestion() as queued_snippets:
+            for beat_data in beats_data:
+                fields = beat_data.get('fields', {})
+                beat_name = fields.get('name')
             
-            # Check if beat already exists
-            if skip_existing and Beat.objects.filter(name=beat_name).exists():
-                self.stdout.write(f'  ⏭  Skipping existing beat: {beat_name}')
-                skipped_count += 1
-                continue
+                # Check if beat already exists
+                if skip_existing and Beat.objects.filter(name=beat_name).exists():
+                    self.stdout.write(f'  ⏭  Skipping existing beat: {beat_name}')
+                    skipped_count += 1
+                    continue
             
-            try:
-                # Create beat (without file fields - those should be in S3)
-                # Handle backward compatibility: if 'price' exists, use it as mp3_price fallback
-                mp3_price_value = fields.get('mp3_price')
-                if not mp3_price_value and fields.get('price'):
-                    mp3_price_value = fields.get('price')
+                try:
+                    # Create beat (without file fields - those should be in S3)
+                    # Handle backward compatibility: if 'price' exists, use it as mp3_price fallback
+                    mp3_price_value = fields.get('mp3_price')
+                    if not mp3_price_value and fields.get('price'):
+                        mp3_price_value = fields.get('price')
                 
-                beat = Beat.objects.create(
-                    name=beat_name,
-                    genre=fields.get('genre', ''),
-                    bpm=fields.get('bpm', 120),
-                    scale=fields.get('scale', ''),
-                    mp3_price=Decimal(mp3_price_value) if mp3_price_value else Decimal('0.00'),
-                    wav_price=Decimal(fields['wav_price']) if fields.get('wav_price') else None,
-                    stems_price=Decimal(fields['stems_price']) if fields.get('stems_price') else None,
-                )
+                    beat = Beat.objects.create(
+                        name=beat_name,
+                        genre=fields.get('genre', ''),
+                        bpm=fields.get('bpm', 120),
+                        scale=fields.get('scale', ''),
+                        mp3_price=Decimal(mp3_price_value) if mp3_price_value else Decimal('0.00'),
+                        wav_price=Decimal(fields['wav_price']) if fields.get('wav_price') else None,
+                        stems_price=Decimal(fields['stems_price']) if fields.get('stems_price') else None,
+                    )
                 
-                # Note: File fields are not set here - they should already be in S3
-                # The file field names are in the export for reference
-                # You'll need to manually set file fields or they'll be set when files are uploaded
+                    # Note: File fields are not set here - they should already be in S3
+                    # The file field names are in the export for reference
+                    # You'll need to manually set file fields or they'll be set when files are uploaded
                 
-                self.stdout.write(
-                    self.style.SUCCESS(f'  ✓ Created beat: {beat.name} (ID: {beat.id})')
-                )
-                created_count += 1
+                    self.stdout.write(
+                        self.style.SUCCESS(f'  ✓ Created beat: {beat.name} (ID: {beat.id})')
+                    )
+                    created_count += 1
                 
-            except Exception as e:
-                self.stdout.write(
-                    self.style.ERROR(f'  ✗ Error creating beat {beat_name}: {str(e)}')
-                )
-                error_count += 1
+                except Exception as e:
+                    self.stdout.write(
+                        self.style.ERROR(f'  ✗ Error creating beat {beat_name}: {str(e)}')
+                    )
+                    error_count += 1
         
         # Summary
         self.stdout.write('\n' + '='*50)
@@ -140,6 +143,7 @@ class Command(BaseCommand):
         self.stdout.write(f'  Created: {created_count}')
         self.stdout.write(f'  Skipped: {skipped_count}')
         self.stdout.write(f'  Errors: {error_count}')
+        self.stdout.write(f'  Snippets queued: {len(queued_snippets)}')
         self.stdout.write('='*50)
         self.stdout.write('\n⚠️  Note: File fields are not imported.')
         self.stdout.write('   Files should already be in S3. Set file fields manually if needed.')
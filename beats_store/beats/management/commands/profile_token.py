@@ -0,0 +1,38 @@
+"""
+Django management command to issue a request profiling token for a staff user.
+
+Send the token with the request you want to profile, then find the result
+under "Request profiles" in the admin. See beats.profiling for details.
+
+Usage:
+    python manage.py profile_token admin
+
+    # Profile with cProfile (default)
+    curl -H "X-Profile-Token: <token>" https://.../api/beats/
+
+    # Profile with the stack sampler (speedscope output)
+    curl -H "X-Profile-Token: <token>" -H "X-Profile-Mode: sample" https://.../api/beats/
+"""
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth.models import User
+from beats.profiling import make_token
+
+
+class Command(BaseCommand):
+    help = 'Issue a short-lived request profiling token for a staff user'
+
+    def add_arguments(self, parser):
+        parser.add_argument('username', type=str, help='Staff user the token is issued to')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(f"User '{options['username']}' does not exist")
+        if not (user.is_active and user.is_staff):
+            raise CommandError(f"User '{user.username}' is not an active staff user")
+
+        self.stdout.write(make_token(user))
+        self.stderr.write(f'Valid for {settings.PROFILER_TOKEN_MAX_AGE // 60} minutes')
@@ -0,0 +1,290 @@
+"""
+Media helpers shared by the Beat signals and the media management commands.
+
+Nothing in here touches the ORM, so the render functions can run inside
+worker processes (see the backfill_snippets command).
+"""
+
+from contextlib import contextmanager
+from . import diskcache
+import io
+import logging
+import os
+import re
+import shutil
+import tempfile
+import time
+
+logger = logging.getLogger(__name__)
+
+# Length of the auto-generated preview snippet
+SNIPPET_DURATION_MS = 30 * 1000
+
+# Number of min/max pairs stored per waveform
+WAVEFORM_BUCKETS = 400
+
+# Bitrates in kbps of the preview renditions encoded from each snippet, by rendition name
+PREVIEW_BITRATES = {'64k': 64, '128k': 128}
+
+# Encodings of the preview renditions: extension -> (ffmpeg format, encoder)
+PREVIEW_FORMATS = {
+    'mp3': ('mp3', 'libmp3lame'),
+    'opus': ('opus', 'libopus'),
+}
+
+# Media types that ask for each rendition format in an Accept header
+PREVIEW_ACCEPT_TYPES = {
+    'mp3': ('audio/mpeg', 'audio/mp3'),
+    'opus': ('audio/ogg', 'audio/opus'),
+}
+
+# Auto-generated snippets are named "<mp3 name>_preview.mp3"; storage backends
+# that don't overwrite may append a "_<7 random chars>" suffix before the extension
+AUTO_SNIPPET_RE = re.compile(r'_preview(_[A-Za-z0-9]{7})?\.mp3$')
+
+
+def snippet_filename_for(mp3_name):
+    """Return the snippet filename derived from an mp3_file name"""
+    mp3_name_without_ext = os.path.splitext(os.path.basename(mp3_name))[0]
+    return f"{mp3_name_without_ext}_preview.mp3"
+
+
+def is_auto_snippet(snippet_name):
+    """Check if a snippet_mp3 name looks auto-generated rather than uploaded"""
+    return bool(snippet_name) and bool(AUTO_SNIPPET_RE.search(os.path.basename(snippet_name)))
+
+
+def is_stale_snippet(snippet_name, mp3_name):
+    """Check if an auto-generated snippet was cut from a different mp3_file"""
+    if not is_auto_snippet(snippet_name):
+        return False
+    expected_prefix = os.path.splitext(snippet_filename_for(mp3_name))[0]
+    return not os.path.basename(snippet_name).startswith(expected_prefix)
+
+
+def fetch_to_local(field_file, suffix=''):
+    """Return a local filesystem path for a stored file.
+
+    Local storage hands back the file's own path. Remote storage (S3) is
+    read through the disk cache (see beats.diskcache) when it is enabled,
+    otherwise streamed into a temporary file. Returns a tuple of (path,
+    is_temporary); the caller must delete temporary files. Raises
+    FileNotFoundError if a local file is missing.
+    """
+    try:
+        path = field_file.path
+    except (NotImplementedError, AttributeError):
+        # S3 storage doesn't support .path - download through the storage backend
+        path = None
+
+    if path is not None:
+        if not os.path.exists(path):
+            raise FileNotFoundError(path)
+        return path, False
+
+    if diskcache.enabled(field_file.storage):
+        path = diskcache.checkout(field_file.storage, field_file.name, suffix=suffix)
+        if path is not None:
+            return path, True
+
+    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as temp_file:
+        with field_file.open('rb') as source_file:
+            shutil.copyfileobj(source_file, temp_file)
+    return temp_file.name, True
+
+
+@contextmanager
+def local_copy(field_file, suffix=''):
+    """Context manager around fetch_to_local() that cleans up temporary copies"""
+    path, is_temporary = fetch_to_local(field_file, suffix=suffix)
+    try:
+        yield path
+    finally:
+        if is_temporary:
+            os.unlink(path)
+
+
+def render_snippet(source_path, timings=None, waveform=None, renditions=None, formats=('mp3',)):
+    """Decode an MP3, keep the first 30 seconds and encode them as MP3 bytes.
+
+    If a timings dict is passed, the seconds spent decoding, trimming and
+    encoding are recorded in it. If a waveform dict is passed, it is filled
+    with the snippet's peaks (see compute_waveform_peaks) from the audio that
+    is already decoded; likewise a renditions dict with the snippet encoded
+    in ``formats`` (see encode_renditions).
+    """
+    from pydub import AudioSegment
+
+    started = time.perf_counter()
+    audio = AudioSegment.from_mp3(source_path)
+    decoded = time.perf_counter()
+    # Ensure we don't exceed the audio length
+    snippet = audio[:min(SNIPPET_DURATION_MS, len(audio))]
+    trimmed = time.perf_counter()
+    buffer = io.BytesIO()
+    snippet.export(buffer, format='mp3')
+    encoded = time.perf_counter()
+
+    if waveform is not None:
+        waveform.update(compute_waveform_peaks(snippet))
+    if renditions is not None:
+        renditions.update(encode_renditions(snippet, formats))
+    if timings is not None:
+        timings['decode'] = decoded - started
+        timings['trim'] = trimmed - decoded
+        timings['encode'] = encoded - trimmed
+        if renditions is not None:
+            timings['renditions'] = time.perf_counter() - encoded
+    return buffer.getvalue()
+
+
+def render_snippet_timed(source_path, formats=('mp3',)):
+    """Process-pool entry point: return (snippet bytes, timings dict, waveform dict, renditions dict)"""
+    timings = {}
+    waveform = {}
+    renditions = {}
+    content = render_snippet(source_path, timings, waveform, renditions, formats)
+    return content, timings, waveform, renditions
+
+
+def render_preview(source_path, formats=('mp3',)):
+    """Decode an existing snippet once and return (waveform peaks, renditions)"""
+    from pydub import AudioSegment
+
+    audio = AudioSegment.from_file(source_path)
+    return compute_waveform_peaks(audio), encode_renditions(audio, formats)
+
+
+def preview_formats():
+    """Return the rendition formats to encode: MP3, plus Opus with PREVIEW_OPUS"""
+    from django.conf import settings
+
+    return ('mp3', 'opus') if settings.PREVIEW_OPUS else ('mp3',)
+
+
+def encode_renditions(audio, formats=('mp3',)):
+    """Encode a pydub AudioSegment at each of PREVIEW_BITRATES in each of ``formats``.
+
+    Returns ``{rendition: {extension: bytes}}``, the layout of
+    Beat.snippet_renditions. A format ffmpeg can't encode (e.g. Opus without
+    libopus) is logged and left out rather than failing the snippet.
+    """
+    from pydub.exceptions import CouldntEncodeError
+
+    renditions = {}
+    failed = set()
+    for rendition, kbps in PREVIEW_BITRATES.items():
+        encoded = {}
+        for extension in formats:
+            if extension in failed:
+                continue
+            ffmpeg_format, codec = PREVIEW_FORMATS[extension]
+            buffer = io.BytesIO()
+            try:
+                audio.export(buffer, format=ffmpeg_format, codec=codec, bitrate=f'{kbps}k')
+            except CouldntEncodeError as e:
+                logger.warning(f"Skipping {extension} preview renditions: {str(e).splitlines()[0]}")
+                failed.add(extension)
+                continue
+            encoded[extension] = buffer.getvalue()
+        if encoded:
+            renditions[rendition] = encoded
+    return renditions
+
+
+def choose_rendition(renditions, bitrate=None, extension=None, accept='', save_data=False):
+    """Pick the (rendition, extension) of a {rendition: {extension: name}} map that suits a client.
+
+    An explicit ``bitrate`` or ``extension`` wins. Otherwise Save-Data gets
+    the lowest bitrate (everyone else the highest) and the Accept header
+    picks the format, MP3 when the client has no preference. Returns None
+    if there are no renditions; raises ValueError for a bitrate or extension
+    that isn't available.
+    """
+    if not renditions:
+        return None
+    if bitrate is not None:
+        if bitrate not in renditions:
+            raise ValueError(f'Unknown bitrate {bitrate!r}; expected one of {sorted(renditions)}')
+        rendition = bitrate
+    else:
+        by_bitrate = sorted(renditions, key=lambda name: PREVIEW_BITRATES.get(name, 0))
+        rendition = by_bitrate[0] if save_data else by_bitrate[-1]
+
+    available = renditions[rendition]
+    if extension is not None:
+        if extension not in available:
+            raise ValueError(f'Unknown codec {extension!r}; expected one of {sorted(available)}')
+        return rendition, extension
+    return rendition, max(available, key=lambda name: (_accept_quality(accept, name), name == 'mp3'))
+
+
+def _accept_quality(accept, extension):
+    """Return the q-value an Accept header gives a rendition format; the most specific range wins"""
+    types = PREVIEW_ACCEPT_TYPES.get(extension, ())
+    best = (-1, 0.0)
+    for part in (accept or '*/*').split(','):
+        media_range, *params = [item.strip() for item in part.split(';')]
+        media_range = media_range.lower()
+        if media_range in types:
+            specificity = 2
+        elif media_range == 'audio/*':
+            specificity = 1
+        elif media_range == '*/*':
+            specificity = 0
+        else:
+            continue
+        quality = 1.0
+        for param in params:
+            key, _, value = param.partition('=')
+            if key.strip() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        best = max(best, (specificity, quality))
+    return best[1]
+
+
+def extract_waveform_peaks(source_path, buckets=WAVEFORM_BUCKETS):
+    """Decode an audio file and return its waveform peaks"""
+    from pydub import AudioSegment
+
+    return compute_waveform_peaks(AudioSegment.from_file(source_path), buckets)
+
+
+def compute_waveform_peaks(audio, buckets=WAVEFORM_BUCKETS):
+    """Reduce a pydub AudioSegment to ``buckets`` min/max pairs.
+
+    The result follows the audiowaveform JSON layout: ``data`` holds
+    interleaved min/max values as 8-bit integers (-128..127), so clients can
+    draw the waveform by dividing by 128 without decoding any audio.
+    """
+    import numpy as np
+
+    channels = audio.channels
+    samples = np.asarray(audio.get_array_of_samples())
+    frames = samples[:len(samples) - len(samples) % channels].reshape(-1, channels)
+    frame_count = len(frames)
+    buckets = min(buckets, frame_count)
+
+    data = np.zeros(buckets * 2, dtype=np.int8)
+    if buckets:
+        # Collapse channels first, keeping the extremes of each frame
+        lows = frames.min(axis=1)
+        highs = frames.max(axis=1)
+        starts = np.linspace(0, frame_count, buckets, endpoint=False).astype(np.int64)
+        full_scale = float(1 << (8 * audio.sample_width - 1))
+        data[0::2] = np.clip(np.round(np.minimum.reduceat(lows, starts) / full_scale * 128), -128, 127)
+        data[1::2] = np.clip(np.round(np.maximum.reduceat(highs, starts) / full_scale * 128), -128, 127)
+
+    return {
+        'version': 2,
+        'channels': 1,
+        'sample_rate': audio.frame_rate,
+        'samples_per_pixel': frame_count // buckets if buckets else 0,
+        'bits': 8,
+        'length': buckets,
+        'duration': round(frame_count / audio.frame_rate, 3) if audio.frame_rate else 0,
+        'data': data.tolist(),
+    }
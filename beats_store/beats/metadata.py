@@ -0,0 +1,144 @@
+"""
+Stored metadata of media files: size, checksum, MIME type and audio format.
+
+Each of a beat's file fields is described once, when it is stored, and the
+result kept in Beat.media_metadata. Describing reads the whole file, so files
+above MEDIA_METADATA_INLINE_MAX_BYTES and direct or resumable uploads are
+left to the backfill_media_metadata command instead of the saving request.
+Downloads and integrity checks then read size and checksum from the row
+instead of asking the storage backend (a round trip per file on S3). Like
+beats.media, nothing in here touches the ORM.
+
+Audio properties are read from the file headers in pure Python (WAV fmt
+chunk, MP3 frame header and Xing/Info tag), so no ffprobe is needed.
+"""
+
+from .uploads import sniff_content_type
+import base64
+import hashlib
+import mimetypes
+import struct
+
+# Bytes read at a time while hashing
+READ_SIZE = 1024 * 1024
+
+# Bytes of the file start parsed for headers
+HEAD_BYTES = 64 * 1024
+
+# MPEG audio version bits -> version, and Layer III tables per version
+_MPEG_VERSIONS = {0b11: '1', 0b10: '2', 0b00: '2.5'}
+_MP3_BITRATES = {
+    '1': (None, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    '2': (None, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+_MP3_SAMPLE_RATES = {'1': (44100, 48000, 32000), '2': (22050, 24000, 16000), '2.5': (11025, 12000, 8000)}
+
+
+def describe(stream, name=''):
+    """Return the metadata of an open binary file.
+
+    Always has ``size``, ``sha256`` and ``content_type``; WAV and MP3 files
+    also get ``duration`` (seconds), ``bitrate`` (bits per second),
+    ``sample_rate`` and ``channels``. The stream is read once from the start;
+    it must be seekable.
+    """
+    stream.seek(0)
+    head = stream.read(HEAD_BYTES)
+    content_type = sniff_content_type(head) or mimetypes.guess_type(name)[0] or 'application/octet-stream'
+
+    # An ID3 tag with embedded artwork can push the first MP3 frame past the head
+    audio_start = _id3_size(head)
+    frames = head[audio_start:]
+    if content_type == 'audio/mpeg' and audio_start + 4096 > len(head):
+        stream.seek(audio_start)
+        frames = stream.read(4096)
+
+    digest = hashlib.sha256(head)
+    size = len(head)
+    stream.seek(size)
+    while chunk := stream.read(READ_SIZE):
+        digest.update(chunk)
+        size += len(chunk)
+
+    metadata = {'size': size, 'sha256': digest.hexdigest(), 'content_type': content_type}
+    if content_type == 'audio/wav':
+        metadata.update(_wav_info(head))
+    elif content_type == 'audio/mpeg':
+        metadata.update(_mp3_info(frames, size - audio_start))
+    return metadata
+
+
+def digest_header(sha256):
+    """Return the RFC 9530 Repr-Digest value for a hex SHA-256"""
+    return f'sha-256=:{base64.b64encode(bytes.fromhex(sha256)).decode("ascii")}:'
+
+
+def _id3_size(head):
+    # ID3v2: "ID3", version (2), flags (1), size as four 7-bit bytes, not counting the 10-byte header
+    if len(head) < 10 or not head.startswith(b'ID3'):
+        return 0
+    size = 0
+    for byte in head[6:10]:
+        size = (size << 7) | (byte & 0x7F)
+    footer = 10 if head[5] & 0x10 else 0
+    return 10 + size + footer
+
+
+def _wav_info(head):
+    """Read the fmt and data chunks of a RIFF/WAVE header"""
+    fmt = data_size = None
+    position = 12
+    while position + 8 <= len(head):
+        chunk_id, chunk_size = struct.unpack_from('<4sI', head, position)
+        if chunk_id == b'fmt ' and position + 24 <= len(head):
+            fmt = struct.unpack_from('<HHIIHH', head, position + 8)
+        elif chunk_id == b'data':
+            data_size = chunk_size
+            break
+        # Chunks are padded to an even size
+        position += 8 + chunk_size + (chunk_size & 1)
+    if fmt is None:
+        return {}
+    _, channels, sample_rate, byte_rate, _, _ = fmt
+    info = {'sample_rate': sample_rate, 'channels': channels, 'bitrate': byte_rate * 8}
+    if data_size is not None and byte_rate:
+        info['duration'] = round(data_size / byte_rate, 3)
+    return info
+
+
+def _mp3_info(frames, audio_size):
+    """Read the first MPEG Layer III frame header (and Xing/Info tag, for VBR files)"""
+    for i in range(len(frames) - 4):
+        if frames[i] != 0xFF or frames[i + 1] & 0xE0 != 0xE0:
+            continue
+        b1, b2, b3 = frames[i + 1], frames[i + 2], frames[i + 3]
+        version = _MPEG_VERSIONS.get((b1 >> 3) & 0b11)
+        layer = (b1 >> 1) & 0b11
+        bitrate_index, rate_index = b2 >> 4, (b2 >> 2) & 0b11
+        if version is None or layer != 0b01 or bitrate_index in (0, 15) or rate_index == 3:
+            continue
+        break
+    else:
+        return {}
+
+    bitrate = _MP3_BITRATES['1' if version == '1' else '2'][bitrate_index] * 1000
+    sample_rate = _MP3_SAMPLE_RATES[version][rate_index]
+    channels = 1 if b3 >> 6 == 0b11 else 2
+    samples_per_frame = 1152 if version == '1' else 576
+    audio_size -= i
+    duration = audio_size * 8 / bitrate
+
+    # VBR encoders put the frame count in a Xing/Info tag after the side information
+    side_info = (32 if channels == 2 else 17) if version == '1' else (17 if channels == 2 else 9)
+    tag = i + 4 + side_info
+    if frames[tag:tag + 4] in (b'Xing', b'Info') and len(frames) >= tag + 12:
+        flags, frame_count = struct.unpack_from('>II', frames, tag + 4)
+        if flags & 1 and frame_count:
+            duration = frame_count * samples_per_frame / sample_rate
+            bitrate = round(audio_size * 8 / duration)
+    return {
+        'duration': round(duration, 3),
+        'bitrate': bitrate,
+        'sample_rate': sample_rate,
+        'channels': channels,
+    }
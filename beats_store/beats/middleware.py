@@ -0,0 +1,111 @@
+from contextlib import ExitStack
+from django.conf import settings
+from django.db import connections
+from . import profiling
+from .instrumentation import registry, server_timing_header, timed_query, track_request
+from .queries import analyze_queries, check_repeated
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class RequestMetricsMiddleware:
+    """Record wall time, DB/storage/Stripe time and response size per endpoint.
+
+    Results feed the /metrics registry and, when SERVER_TIMING_HEADERS is
+    enabled, a Server-Timing header that browser dev tools display per request.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with track_request() as timings, ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(timed_query))
+            response = self.get_response(request)
+
+        match = getattr(request, 'resolver_match', None)
+        # Unmatched paths share one label so 404 scans can't blow up the metric cardinality
+        endpoint = (match.view_name or match.url_name or 'unnamed') if match else 'unmatched'
+        registry.observe(endpoint, request.method, response.status_code, timings, self._response_size(response))
+
+        if getattr(settings, 'SERVER_TIMING_HEADERS', False):
+            response['Server-Timing'] = server_timing_header(timings)
+        return response
+
+    @staticmethod
+    def _response_size(response):
+        if response.streaming:
+            # Streamed bodies (file downloads) are only known through their Content-Length
+            return int(response.get('Content-Length') or 0)
+        return len(response.content)
+
+
+class RequestProfilerMiddleware:
+    """Profile requests that carry a valid staff profiling token.
+
+    Requests without a token pass straight through. See beats.profiling for
+    how tokens are issued and which limits apply.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        # Header only: a token in the query string would end up in proxy and access logs
+        token = request.headers.get('X-Profile-Token')
+        if not token or not settings.PROFILER_ENABLED:
+            return self.get_response(request)
+
+        user = profiling.user_for_token(token)
+        if user is None:
+            return self._skip(request, 'invalid or expired token')
+        if not profiling.budget_available():
+            return self._skip(request, 'hourly limit reached')
+        if not profiling.try_acquire():
+            return self._skip(request, 'another request is being profiled')
+
+        try:
+            mode = request.headers.get('X-Profile-Mode')
+            recorder = profiling.StackSampler() if mode == 'sample' else profiling.CProfileRecorder()
+            started = time.perf_counter()
+            with recorder:
+                response = self.get_response(request)
+            duration = time.perf_counter() - started
+        finally:
+            profiling.release()
+
+        try:
+            profile = profiling.save_profile(recorder, request, response, user, duration)
+        except Exception as e:
+            # Never fail the profiled request because its profile couldn't be stored
+            logger.error(f'Error saving request profile: {e}')
+            response['X-Profile'] = 'failed'
+        else:
+            response['X-Profile'] = f'saved; id={profile.pk}'
+        return response
+
+    def _skip(self, request, reason):
+        response = self.get_response(request)
+        response['X-Profile'] = f'skipped; {reason}'
+        return response
+
+
+class QueryAnalysisMiddleware:
+    """Run every request under a QueryAnalyzer and report repeated shapes.
+
+    Does nothing unless QUERY_ANALYSIS_ENABLED is set (the default with DEBUG).
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.QUERY_ANALYSIS_ENABLED:
+            return self.get_response(request)
+        with analyze_queries() as analyzer:
+            response = self.get_response(request)
+        check_repeated(analyzer, f'{request.method} {request.path}')
+        return response
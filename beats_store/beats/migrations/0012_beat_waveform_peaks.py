@@ -0,0 +1,18 @@
+# Generated by Django 5.0.8 on 2026-10-19 02:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('beats', '0011_remove_beat_price_alter_beat_mp3_file'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='beat',
+            name='waveform_peaks',
+            field=models.JSONField(blank=True, editable=False, null=True),
+        ),
+    ]
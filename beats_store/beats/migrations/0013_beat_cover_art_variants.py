@@ -0,0 +1,18 @@
+# Generated by Django 5.0.8 on 2026-10-19 02:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('beats', '0012_beat_waveform_peaks'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='beat',
+            name='cover_art_variants',
+            field=models.JSONField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.8 on 2026-10-19 02:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('beats', '0016_resumableupload'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='beat',
+            name='media_metadata',
+            field=models.JSONField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.8 on 2026-10-19 03:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('beats', '0018_contentblob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contentblob',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.8 on 2026-10-19 03:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('beats', '0019_contentblob_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='beat',
+            name='snippet_renditions',
+            field=models.JSONField(blank=True, editable=False, null=True),
+        ),
+    ]
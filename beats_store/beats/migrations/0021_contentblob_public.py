@@ -0,0 +1,36 @@
+# Generated by Django 5.0.8 on 2026-10-19 03:37
+
+from django.db import migrations, models
+
+
+def mark_public_blobs(apps, schema_editor):
+    """Mark the objects behind existing previews, covers and avatars as public"""
+    from beats.inventory import PUBLIC_FILE_FIELDS
+    from beats.storage import blob_name
+
+    ContentBlob = apps.get_model('beats', 'ContentBlob')
+    keys = set()
+    for model, field, variants in PUBLIC_FILE_FIELDS:
+        rows = apps.get_model('beats', model).objects.values_list(field, variants)
+        for name, formats in rows.iterator(chunk_size=2000):
+            names = [name] + [n for by_extension in (formats or {}).values() for n in by_extension.values()]
+            keys.update(filter(None, map(blob_name, names)))
+    keys = sorted(keys)
+    for start in range(0, len(keys), 500):
+        ContentBlob.objects.filter(name__in=keys[start:start + 500]).update(public=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('beats', '0020_beat_snippet_renditions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contentblob',
+            name='public',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(mark_public_blobs, migrations.RunPython.noop),
+    ]
@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.db import models
 from django.contrib.auth.models import User
 from django.db.models.signals import post_save, pre_save
@@ -7,6 +8,25 @@ import uuid
 import os
 import logging
 
+from .images import (
+    AVATAR_VARIANT_SIZES,
+    COVER_VARIANT_SIZES,
+    delete_image_variants,
+    render_image_variants,
+    store_image_variants,
+)
+from . import diskcache
+from .ingestion import is_bulk_ingesting, queue_cover_variants, queue_snippet
+from .metadata import describe
+from .media import (
+    is_auto_snippet,
+    local_copy,
+    preview_formats,
+    render_preview,
+    render_snippet,
+    snippet_filename_for,
+)
+
 logger = logging.getLogger(__name__)
 
 class Beat(models.Model):
@@ -16,7 +36,13 @@ class Beat(models.Model):
     scale = models.CharField(max_length=50)
 
     cover_art = models.ImageField(upload_to="covers/", null=True, blank=True)
+    # Storage names of the resized cover_art copies: {variant: {format: name}}
+    cover_art_variants = models.JSONField(null=True, blank=True, editable=False)
     snippet_mp3 = models.FileField(upload_to="preview-snippet/", null=True, blank=True)
+    # Min/max peaks of snippet_mp3, so clients can draw it without decoding audio
+    waveform_peaks = models.JSONField(null=True, blank=True, editable=False)
+    # Storage names of snippet_mp3 re-encoded per bitrate: {rendition: {format: name}}
+    snippet_renditions = models.JSONField(null=True, blank=True, editable=False)
 
     mp3_file = models.FileField(upload_to="beats/",)
     mp3_price = models.DecimalField(max_digits=6, decimal_places=2, null=True, blank=True)
@@ -27,6 +53,9 @@ class Beat(models.Model):
     stems_file = models.FileField(upload_to="beats/", null=True, blank=True)
     stems_price = models.DecimalField(max_digits=6, decimal_places=2, null=True, blank=True)
 
+    # Size, checksum, MIME type and audio format of each stored file: {field: {...}} (see beats.metadata)
+    media_metadata = models.JSONField(null=True, blank=True, editable=False)
+
     uploaded_by = models.ForeignKey(
         User,
         on_delete=models.SET_NULL,
@@ -37,9 +66,71 @@ class Beat(models.Model):
     )
     created_at = models.DateTimeField(auto_now_add=True)
 
+    # File fields described in media_metadata
+    MEDIA_FIELDS = ('mp3_file', 'wav_file', 'stems_file', 'snippet_mp3', 'cover_art')
+
+    # Fields whose stored values are remembered in memory so that signal
+    # handlers can detect changes without re-reading the row on every save
+    TRACKED_FIELDS = MEDIA_FIELDS
+
     def __str__(self):
         return self.name
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = {
+            name: value or ''
+            for name, value in zip(field_names, values)
+            if name in cls.TRACKED_FIELDS
+        }
+        return instance
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None and self.pk is not None:
+            # Like Model.save(), only loaded fields are written for an instance with deferred fields
+            update_fields = set(self.TRACKED_FIELDS) - self.get_deferred_fields()
+        super().save(*args, **kwargs)
+        # The written fields now match the row, so future saves compare against them;
+        # the others keep their loaded values
+        saved = self.TRACKED_FIELDS if update_fields is None else set(update_fields) & set(self.TRACKED_FIELDS)
+        loaded_values = getattr(self, '_loaded_values', {})
+        for name in saved:
+            loaded_values[name] = getattr(self, name).name or ''
+        self._loaded_values = loaded_values
+
+    def get_loaded_value(self, field_name):
+        """Return the stored value of a tracked field as last loaded or saved.
+
+        Falls back to a single-row query when the instance was built by hand
+        (or loaded with the field deferred), so the answer is always correct.
+        """
+        loaded_values = getattr(self, '_loaded_values', {})
+        if field_name not in loaded_values:
+            row = Beat.objects.filter(pk=self.pk).values(*self.TRACKED_FIELDS).first() or {}
+            loaded_values = {name: value or '' for name, value in row.items()}
+            self._loaded_values = loaded_values
+        return loaded_values.get(field_name, '')
+
+    def get_media_metadata(self, field_name):
+        """Return the recorded metadata of a file field, or None if it is missing or stale"""
+        metadata = (self.media_metadata or {}).get(field_name)
+        field_file = getattr(self, field_name)
+        if not metadata or not field_file or metadata.get('name') != field_file.name:
+            return None
+        return metadata
+
+    def has_field_changed(self, field_name, update_fields=None):
+        """Check if a tracked file field differs from its stored value.
+
+        Saves whose update_fields exclude the field can't change it.
+        """
+        if update_fields is not None and field_name not in update_fields:
+            return False
+        old_name = self.get_loaded_value(field_name) if self.pk else ''
+        return old_name != (getattr(self, field_name).name or '')
+
 class Purchase(models.Model):
     DOWNLOAD_TYPE_CHOICES = [
         ('mp3', 'MP3'),
@@ -77,6 +168,8 @@ class UserProfile(models.Model):
     """Extended user profile with additional fields"""
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='profile')
     photo = models.ImageField(upload_to="user-avatar/", null=True, blank=True)
+    # Storage names of the square avatar sizes: {size: {format: name}}
+    photo_variants = models.JSONField(null=True, blank=True, editable=False)
     bio = models.TextField(max_length=500, blank=True)
     middle_initial = models.CharField(max_length=1, blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -97,6 +190,69 @@ class StripeWebhookEvent(models.Model):
         return f"Stripe Event: {self.event_type} ({self.stripe_event_id})"
 
 
+class RequestProfile(models.Model):
+    """A single request profiled on demand by a staff member (see beats.profiling)"""
+    FORMAT_CHOICES = [
+        ('cprofile', 'cProfile (.prof)'),
+        ('speedscope', 'Sampled stacks (speedscope JSON)'),
+    ]
+    
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    method = models.CharField(max_length=10)
+    path = models.CharField(max_length=500)
+    status_code = models.PositiveSmallIntegerField()
+    duration_ms = models.FloatField()
+    format = models.CharField(max_length=20, choices=FORMAT_CHOICES)
+    # Top functions as text, for reading in the admin
+    summary = models.TextField(blank=True)
+    # Raw profile; empty when it exceeded PROFILER_MAX_BYTES
+    data = models.BinaryField(blank=True, default=b'')
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"{self.method} {self.path} ({self.duration_ms:.0f} ms)"
+
+
+class ResumableUpload(models.Model):
+    """A chunked upload of one beat file, resumable from ``offset`` (see beats.resumable)"""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    beat = models.ForeignKey(Beat, on_delete=models.CASCADE, related_name='resumable_uploads')
+    field = models.CharField(max_length=20)
+    # Storage name the file is assembled under
+    key = models.CharField(max_length=255)
+    content_type = models.CharField(max_length=100)
+    size = models.PositiveBigIntegerField()
+    offset = models.PositiveBigIntegerField(default=0)
+    # S3 multipart upload id and the parts stored so far: [{'PartNumber', 'ETag'}]
+    multipart_id = models.CharField(max_length=255, blank=True)
+    parts = models.JSONField(default=list, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.key} ({self.offset}/{self.size} bytes)"
+
+
+class ContentBlob(models.Model):
+    """A content-addressed media object and how many stored names share it (see beats.storage)"""
+    # Storage key of the object: cas/<ab>/<digest><ext>
+    name = models.CharField(max_length=255, primary_key=True)
+    size = models.PositiveBigIntegerField()
+    references = models.PositiveIntegerField(default=0)
+    # Stored under a public name (preview, cover, avatar), so /media/ may serve it to anyone
+    public = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Last time a save referenced the object; collect_orphaned_media spares recent ones
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.references} references)"
+
+
 @receiver(post_save, sender=User)
 def create_user_profile(sender, instance, created, **kwargs):
     """Automatically create a UserProfile when a User is created"""
@@ -111,35 +267,115 @@ def save_user_profile(sender, instance, **kwargs):
         instance.profile.save()
 
 
+@receiver(pre_save, sender=UserProfile)
+def process_avatar_upload(sender, instance, **kwargs):
+    """Square-crop, strip EXIF and re-encode a newly uploaded photo before it is stored"""
+    photo = instance.photo
+    if not photo:
+        # Photo was removed: drop its variants too
+        if instance.photo_variants:
+            delete_image_variants(photo.storage, instance.photo_variants)
+            instance.photo_variants = None
+        return
+    # Already-stored photos have been processed
+    if photo._committed:
+        return
+    
+    try:
+        rendered = render_image_variants(photo.file, AVATAR_VARIANT_SIZES, square=True)
+    except Exception as e:
+        logger.error(f"Error processing avatar for {instance.user_id}, storing original: {str(e)}")
+        return
+    
+    # Store the largest size as the photo itself instead of the raw upload
+    stem = os.path.splitext(os.path.basename(photo.name))[0]
+    largest = max(AVATAR_VARIANT_SIZES, key=AVATAR_VARIANT_SIZES.get)
+    instance.photo = ContentFile(rendered[largest]['jpeg'], name=f"{stem}.jpg")
+    instance._avatar_renders = rendered
+
+
+@receiver(post_save, sender=UserProfile)
+def store_avatar_variants(sender, instance, **kwargs):
+    """Upload the avatar sizes rendered in process_avatar_upload"""
+    rendered = getattr(instance, '_avatar_renders', None)
+    if rendered is None:
+        return
+    del instance._avatar_renders
+    
+    try:
+        instance.photo_variants = store_image_variants(
+            instance.photo.storage, instance.photo.name, rendered, old_variants=instance.photo_variants
+        )
+        instance.save(update_fields=['photo_variants'])
+    except Exception as e:
+        logger.error(f"Error storing avatar variants for {instance.user_id}: {str(e)}")
+
+
 @receiver(pre_save, sender=Beat)
-def track_mp3_file_change(sender, instance, **kwargs):
+def track_mp3_file_change(sender, instance, update_fields=None, **kwargs):
     """Track if mp3_file is being changed to regenerate snippet if needed"""
-    if instance.pk:
-        try:
-            old_instance = Beat.objects.get(pk=instance.pk)
-            # Check if mp3_file changed
-            if old_instance.mp3_file != instance.mp3_file:
-                instance._mp3_file_changed = True
-            # If snippet was auto-generated (ends with '_preview.mp3'), mark it for regeneration
-            if old_instance.snippet_mp3:
-                snippet_name = os.path.basename(old_instance.snippet_mp3.name)
-                if snippet_name.endswith('_preview.mp3'):
-                    instance._should_regenerate_snippet = True
-        except Beat.DoesNotExist:
-            pass
+    instance._mp3_file_changed = False
+    instance._should_regenerate_snippet = False
+    instance._snippet_changed = False
+
+    if instance.has_field_changed('snippet_mp3', update_fields):
+        instance._snippet_changed = True
+        if not instance.snippet_mp3:
+            instance.waveform_peaks = None
+            # Renditions of a removed snippet go with it
+            if instance.snippet_renditions:
+                delete_image_variants(instance.snippet_mp3.storage, instance.snippet_renditions)
+                instance.snippet_renditions = None
+
+    # Saves that don't write mp3_file (e.g. the snippet update itself) can't change it,
+    # otherwise compare against the values captured when the instance was loaded
+    if not instance.pk or not instance.has_field_changed('mp3_file', update_fields):
+        return
+    instance._mp3_file_changed = True
+
+    # If snippet was auto-generated (ends with '_preview.mp3'), mark it for regeneration
+    if is_auto_snippet(instance.get_loaded_value('snippet_mp3')):
+        instance._should_regenerate_snippet = True
+
+
+@receiver(pre_save, sender=Beat)
+def track_cover_art_change(sender, instance, update_fields=None, **kwargs):
+    """Track if cover_art is being changed so its variants get rebuilt"""
+    instance._cover_art_changed = instance.has_field_changed('cover_art', update_fields)
+
+
+@receiver(pre_save, sender=Beat)
+def track_media_changes(sender, instance, update_fields=None, **kwargs):
+    """Track which file fields are being changed so their metadata gets recorded"""
+    # Accumulated: a nested media save (e.g. the snippet) must not hide the outer save's changes
+    pending = getattr(instance, '_media_changed', [])
+    instance._media_changed = pending + [
+        name for name in Beat.MEDIA_FIELDS
+        if name not in pending and instance.has_field_changed(name, update_fields)
+    ]
 
 
 @receiver(post_save, sender=Beat)
-def generate_snippet_from_mp3(sender, instance, created, **kwargs):
-    """Automatically generate a 30-second snippet from mp3_file if snippet_mp3 is not provided"""
-    # Prevent recursion if we're updating the snippet
-    if hasattr(instance, '_updating_snippet'):
+def generate_cover_variants_on_save(sender, instance, **kwargs):
+    """Rebuild the resized cover_art variants when a new cover is uploaded"""
+    if hasattr(instance, '_updating_media'):
+        return
+    if not getattr(instance, '_cover_art_changed', False):
+        return
+    
+    # During bulk ingestion, queue the beat and let the batch step handle it
+    if instance.cover_art and is_bulk_ingesting():
+        queue_cover_variants(instance.pk)
         return
     
-    # Skip snippet generation during migrations or data loading
-    # Check if we're in a management command context
-    import sys
-    if any('migrate' in arg or 'load_beats' in arg or 'migrate_to_s3' in arg for arg in sys.argv):
+    generate_cover_variants(instance)
+
+
+@receiver(post_save, sender=Beat)
+def generate_snippet_from_mp3(sender, instance, created, **kwargs):
+    """Automatically generate a 30-second snippet from mp3_file if snippet_mp3 is not provided"""
+    # Prevent recursion if we're saving generated media
+    if hasattr(instance, '_updating_media'):
         return
     
     # Skip if mp3_file doesn't exist
@@ -148,94 +384,243 @@ def generate_snippet_from_mp3(sender, instance, created, **kwargs):
     
     # Determine if we need to generate snippet
     should_generate = False
+    replace_existing = getattr(instance, '_should_regenerate_snippet', False)
     
     if created:
         # New beat: generate if snippet doesn't exist
         should_generate = not instance.snippet_mp3
     else:
         # Existing beat: regenerate if mp3_file changed and snippet was auto-generated
-        if hasattr(instance, '_should_regenerate_snippet') and instance._should_regenerate_snippet:
+        if replace_existing:
             should_generate = True
         # Or generate if snippet doesn't exist but mp3_file does
         elif not instance.snippet_mp3:
             should_generate = True
     
     if not should_generate:
+        # An uploaded snippet still needs its waveform and renditions (bulk backfills handle their own)
+        if getattr(instance, '_snippet_changed', False) and instance.snippet_mp3 and not is_bulk_ingesting():
+            update_snippet_preview(instance)
         return
     
+    # During bulk ingestion, queue the beat and let the batch step handle it
+    if is_bulk_ingesting():
+        queue_snippet(instance.pk, replace_existing=replace_existing)
+        return
+    
+    generate_snippet(instance, replace_existing=replace_existing)
+
+
+@receiver(post_save, sender=Beat)
+def record_media_metadata_on_save(sender, instance, **kwargs):
+    """Describe newly stored files in media_metadata.
+
+    Registered after the snippet and cover receivers, so it sees their files
+    closed. Bulk ingestion, files above MEDIA_METADATA_INLINE_MAX_BYTES and
+    fields passed to defer_media_metadata() are left to the
+    backfill_media_metadata command, so the request doesn't read them whole.
+    """
+    changed = getattr(instance, '_media_changed', None)
+    if not changed or is_bulk_ingesting():
+        return
+    instance._media_changed = []
+    deferred = getattr(instance, '_deferred_media_fields', set())
+    inline = [name for name in changed if name not in deferred and not _too_large_to_describe(instance, name)]
+    instance._deferred_media_fields = deferred - set(changed)
+    skipped = [name for name in changed if name not in inline]
+    if skipped:
+        logger.info(f"Left media metadata of beat {instance.id} ({', '.join(skipped)}) to backfill_media_metadata")
+    if inline:
+        record_media_metadata(instance, inline)
+
+
+def defer_media_metadata(instance, field_name):
+    """Leave describing a file field to backfill_media_metadata on the beat's next save.
+
+    For files that just arrived through a direct or resumable upload: reading
+    them back through the worker would undo the point of uploading them
+    straight to storage.
+    """
+    instance._deferred_media_fields = getattr(instance, '_deferred_media_fields', set()) | {field_name}
+
+
+def _too_large_to_describe(instance, field_name):
+    field_file = getattr(instance, field_name)
+    if not field_file:
+        # Emptied: its entry is dropped, which reads nothing
+        return False
     try:
-        from pydub import AudioSegment
-        import tempfile
-        
-        # Handle both local and S3 storage
-        if hasattr(instance.mp3_file, 'path'):
-            # Local storage
-            mp3_path = instance.mp3_file.path
-            if not os.path.exists(mp3_path):
-                logger.warning(f"MP3 file not found at {mp3_path}")
-                return
-            # Load the audio file
-            audio = AudioSegment.from_mp3(mp3_path)
-        else:
-            # S3 storage - download to temp file first using storage backend
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.mp3') as temp_file:
-                # Use storage backend to read the file
-                with instance.mp3_file.open('rb') as source_file:
-                    temp_file.write(source_file.read())
-                    temp_path = temp_file.name
-            
-            # Load the audio file
-            audio = AudioSegment.from_mp3(temp_path)
-            # Clean up temp file after loading
-            os.unlink(temp_path)
-        
-        # Get the first 30 seconds (30 * 1000 milliseconds)
-        snippet_duration = 30 * 1000  # 30 seconds in milliseconds
-        # Ensure we don't exceed the audio length
-        snippet = audio[:min(snippet_duration, len(audio))]
-        
-        # Generate snippet filename - use the beat name or ID for uniqueness
-        mp3_filename = os.path.basename(instance.mp3_file.name)
-        # Remove extension from mp3 filename and use beat name/ID for snippet
-        mp3_name_without_ext = os.path.splitext(mp3_filename)[0]
-        snippet_filename = f"{mp3_name_without_ext}_preview.mp3"
+        return field_file.size > settings.MEDIA_METADATA_INLINE_MAX_BYTES
+    except Exception:
+        # A missing file is reported by record_media_metadata()
+        return False
+
+
+def build_media_metadata(instance, fields=Beat.MEDIA_FIELDS):
+    """Return the beat's media_metadata with ``fields`` described afresh, without saving.
+
+    Emptied fields are dropped. Raises if a file can't be read.
+    """
+    metadata = dict(instance.media_metadata or {})
+    for name in fields:
+        field_file = getattr(instance, name)
+        if not field_file:
+            metadata.pop(name, None)
+            continue
+        with diskcache.open_file(field_file.storage, field_file.name) as stream:
+            metadata[name] = {'name': field_file.name, **describe(stream, field_file.name)}
+    return metadata or None
+
+
+def record_media_metadata(instance, fields=Beat.MEDIA_FIELDS):
+    """Describe the beat's files and save them to media_metadata.
+
+    Returns True if the metadata was updated.
+    """
+    # May run inside another media save (snippet, cover variants), whose flag must survive
+    nested = hasattr(instance, '_updating_media')
+    try:
+        instance.media_metadata = build_media_metadata(instance, fields)
         
-        # Export snippet to a temporary file
-        import tempfile
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.mp3') as temp_file:
-            snippet.export(temp_file.name, format='mp3')
-            temp_path = temp_file.name
+        instance._updating_media = True
+        instance.save(update_fields=['media_metadata'])
+        return True
         
-        # Read the generated snippet
-        with open(temp_path, 'rb') as f:
-            snippet_content = f.read()
+    except FileNotFoundError as e:
+        logger.warning(f"Media file not found for beat {instance.id}: {e}")
+    except Exception as e:
+        logger.error(f"Error recording media metadata for beat {instance.id}: {str(e)}")
+    finally:
+        if not nested and hasattr(instance, '_updating_media'):
+            delattr(instance, '_updating_media')
+    return False
+
+
+def generate_snippet(instance, replace_existing=False):
+    """Cut the first 30 seconds of a beat's mp3_file into its snippet_mp3.
+
+    The snippet's waveform peaks and bitrate renditions are stored alongside
+    it. When replace_existing is set, the current snippet file is deleted
+    from storage first. Returns True if a snippet was generated and saved.
+    """
+    try:
+        waveform = {}
+        renditions = {}
+        with local_copy(instance.mp3_file, suffix='.mp3') as mp3_path:
+            snippet_content = render_snippet(
+                mp3_path, waveform=waveform, renditions=renditions, formats=preview_formats(),
+            )
         
         # Delete old snippet if regenerating
-        if instance.snippet_mp3 and hasattr(instance, '_should_regenerate_snippet'):
+        if instance.snippet_mp3 and replace_existing:
             instance.snippet_mp3.delete(save=False)
         
         # Save to snippet_mp3 field - this will automatically use "preview-snippet/" folder
         # due to upload_to="preview-snippet/" in the model field definition
         instance.snippet_mp3.save(
-            snippet_filename,
+            snippet_filename_for(instance.mp3_file.name),
             ContentFile(snippet_content),
             save=False
         )
-        
-        # Clean up temporary file
-        os.unlink(temp_path)
+        instance.waveform_peaks = waveform
+        instance.snippet_renditions = store_snippet_renditions(instance, renditions)
         
         # Save the instance to persist the snippet (using update_fields to avoid recursion)
-        # Mark that we're updating snippet to prevent infinite recursion
-        instance._updating_snippet = True
-        instance.save(update_fields=['snippet_mp3'])
-        delattr(instance, '_updating_snippet')
+        # Mark that we're updating media to prevent infinite recursion
+        instance._updating_media = True
+        instance.save(update_fields=['snippet_mp3', 'waveform_peaks', 'snippet_renditions'])
+        delattr(instance, '_updating_media')
         
         logger.info(f"Generated 30-second snippet for beat {instance.id}")
+        return True
         
+    except FileNotFoundError as e:
+        logger.warning(f"MP3 file not found at {e}")
     except ImportError:
         logger.error("pydub is not installed. Please install it with: pip install pydub")
     except Exception as e:
         logger.error(f"Error generating snippet for beat {instance.id}: {str(e)}")
         import traceback
         logger.error(traceback.format_exc())
+    return False
+
+
+def update_snippet_preview(instance):
+    """Compute waveform peaks and bitrate renditions from the stored snippet_mp3 and save them.
+
+    Returns True if they were computed and saved.
+    """
+    try:
+        with local_copy(instance.snippet_mp3, suffix=os.path.splitext(instance.snippet_mp3.name)[1]) as snippet_path:
+            instance.waveform_peaks, renditions = render_preview(snippet_path, preview_formats())
+        instance.snippet_renditions = store_snippet_renditions(instance, renditions)
+        
+        instance._updating_media = True
+        instance.save(update_fields=['waveform_peaks', 'snippet_renditions'])
+        delattr(instance, '_updating_media')
+        
+        logger.info(f"Computed waveform peaks and renditions for beat {instance.id}")
+        return True
+        
+    except FileNotFoundError as e:
+        logger.warning(f"Snippet file not found at {e}")
+    except ImportError:
+        logger.error("pydub and numpy are required to compute waveform peaks")
+    except Exception as e:
+        logger.error(f"Error computing waveform peaks for beat {instance.id}: {str(e)}")
+    return False
+
+
+def store_snippet_renditions(instance, renditions):
+    """Store encoded renditions beside the beat's snippet_mp3, without saving the beat.
+
+    Like cover variants, they live under deterministic keys derived from
+    the snippet's name, and renditions of a previous snippet are deleted.
+    Returns the new {rendition: {format: name}} map.
+    """
+    storage = Beat._meta.get_field('snippet_mp3').storage
+    return store_image_variants(
+        storage, instance.snippet_mp3.name, renditions, old_variants=instance.snippet_renditions
+    ) or None
+
+
+def build_cover_variants(instance):
+    """Render and store the cover_art variants of a beat without saving it.
+
+    Variants live under deterministic keys derived from the cover's name
+    (see beats.images.variant_prefix), so existing objects are reused.
+    Variants of a previous cover are deleted. Returns the new
+    {variant: {format: name}} map, or None if the beat has no cover.
+    """
+    storage = Beat._meta.get_field('cover_art').storage
+    if not instance.cover_art:
+        delete_image_variants(storage, instance.cover_art_variants)
+        return None
+    
+    with diskcache.open_file(storage, instance.cover_art.name) as source:
+        rendered = render_image_variants(source, COVER_VARIANT_SIZES)
+    return store_image_variants(
+        storage, instance.cover_art.name, rendered, old_variants=instance.cover_art_variants
+    )
+
+
+def generate_cover_variants(instance):
+    """Build the cover_art variants of a beat and save them.
+
+    Returns True if the variants were updated.
+    """
+    try:
+        instance.cover_art_variants = build_cover_variants(instance)
+        
+        instance._updating_media = True
+        instance.save(update_fields=['cover_art_variants'])
+        delattr(instance, '_updating_media')
+        
+        logger.info(f"Generated cover art variants for beat {instance.id}")
+        return True
+        
+    except ImportError:
+        logger.error("Pillow is not installed. Please install it with: pip install Pillow")
+    except Exception as e:
+        logger.error(f"Error generating cover art variants for beat {instance.id}: {str(e)}")
+    return False
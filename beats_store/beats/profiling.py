@@ -0,0 +1,220 @@
+"""
+On-demand profiling of single requests.
+
+A staff member asks for a token with ``python manage.py profile_token
+<username>`` and sends it with the slow request in an ``X-Profile-Token``
+header. Tokens are never read from the query string, which proxies and access
+logs record. They are signed and expire after PROFILER_TOKEN_MAX_AGE seconds,
+so the frontend's JWT auth doesn't need to know about them.
+
+That one request then runs under cProfile (default) or, with
+``X-Profile-Mode: sample``, under a stack sampler whose output opens in
+https://www.speedscope.app. The result is stored as a
+RequestProfile, shown in the admin and downloadable from there.
+
+The hooks stay safe to leave enabled in production: profiles are capped per
+hour (PROFILER_MAX_PER_HOUR), only one request per process is profiled at a
+time, raw profiles above PROFILER_MAX_BYTES are dropped (the text summary is
+kept) and only the newest PROFILER_KEEP profiles are retained.
+"""
+
+from django.conf import settings
+from django.core import signing
+import io
+import json
+import marshal
+import sys
+import threading
+import time
+
+TOKEN_SALT = 'beats.profiling'
+
+# Longest summary stored per profile, in characters
+MAX_SUMMARY_CHARS = 64 * 1024
+
+# Rows printed in the text summary
+SUMMARY_ROWS = 40
+
+_profiling_lock = threading.Lock()
+
+
+def make_token(user):
+    """Return a signed profiling token for a staff user"""
+    return signing.dumps({'user': user.pk}, salt=TOKEN_SALT)
+
+
+def user_for_token(token):
+    """Return the active staff user a token was issued to, or None if it is invalid or expired"""
+    from django.contrib.auth.models import User
+
+    try:
+        payload = signing.loads(token, salt=TOKEN_SALT, max_age=settings.PROFILER_TOKEN_MAX_AGE)
+    except signing.BadSignature:
+        return None
+    return User.objects.filter(pk=payload.get('user'), is_active=True, is_staff=True).first()
+
+
+def budget_available():
+    """Check the hourly cap on stored profiles"""
+    from datetime import timedelta
+    from django.utils import timezone
+    from .models import RequestProfile
+
+    since = timezone.now() - timedelta(hours=1)
+    return RequestProfile.objects.filter(created_at__gte=since).count() < settings.PROFILER_MAX_PER_HOUR
+
+
+def try_acquire():
+    """Claim the per-process profiling slot; returns False if a profile is already running"""
+    return _profiling_lock.acquire(blocking=False)
+
+
+def release():
+    _profiling_lock.release()
+
+
+class CProfileRecorder:
+    """Deterministic profile of the calling thread"""
+
+    format = 'cprofile'
+
+    def __init__(self):
+        import cProfile
+
+        self._profiler = cProfile.Profile()
+
+    def __enter__(self):
+        self._profiler.enable()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._profiler.disable()
+
+    def result(self, name):
+        """Return (raw .prof bytes, text summary)"""
+        import pstats
+
+        stream = io.StringIO()
+        stats = pstats.Stats(self._profiler, stream=stream)
+        stats.sort_stats('cumulative').print_stats(SUMMARY_ROWS)
+        # Same bytes pstats.Stats.dump_stats() writes to a .prof file
+        return marshal.dumps(stats.stats), stream.getvalue()
+
+
+class StackSampler:
+    """Sample the calling thread's stack from a background thread.
+
+    Much lower overhead than cProfile on slow requests, and the stacks keep
+    their order in time, which speedscope shows as a flame chart.
+    """
+
+    format = 'speedscope'
+
+    def __init__(self, interval=None, max_samples=20000):
+        self.interval = interval or settings.PROFILER_SAMPLE_INTERVAL
+        self.max_samples = max_samples
+        self.frames = []
+        self._frame_index = {}
+        self.samples = []
+        self.weights = []
+        self._thread_id = threading.get_ident()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='request-sampler', daemon=True)
+
+    def __enter__(self):
+        self._started = self._last = time.perf_counter()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+        self._ended = time.perf_counter()
+
+    def _run(self):
+        while not self._stop.wait(self.interval) and len(self.samples) < self.max_samples:
+            frame = sys._current_frames().get(self._thread_id)
+            now = time.perf_counter()
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(self._frame_id(frame.f_code))
+                frame = frame.f_back
+            stack.reverse()
+            self.samples.append(stack)
+            self.weights.append(now - self._last)
+            self._last = now
+
+    def _frame_id(self, code):
+        key = (code.co_name, code.co_filename, code.co_firstlineno)
+        index = self._frame_index.get(key)
+        if index is None:
+            index = self._frame_index[key] = len(self.frames)
+            self.frames.append({'name': key[0], 'file': key[1], 'line': key[2]})
+        return index
+
+    def result(self, name):
+        """Return (speedscope JSON bytes, text summary)"""
+        document = {
+            '$schema': 'https://www.speedscope.app/file-format-schema.json',
+            'name': name,
+            'exporter': 'beats.profiling',
+            'shared': {'frames': self.frames},
+            'profiles': [{
+                'type': 'sampled',
+                'name': name,
+                'unit': 'seconds',
+                'startValue': 0,
+                'endValue': self._ended - self._started,
+                'samples': self.samples,
+                'weights': self.weights,
+            }],
+        }
+        return json.dumps(document).encode('utf-8'), self._summary()
+
+    def _summary(self):
+        """Functions ranked by the time they were on top of the stack"""
+        self_time = {}
+        for stack, weight in zip(self.samples, self.weights):
+            if stack:
+                self_time[stack[-1]] = self_time.get(stack[-1], 0.0) + weight
+        total = sum(self.weights)
+        lines = [
+            f'{len(self.samples)} samples over {(self._ended - self._started) * 1000:.1f} ms',
+            '',
+            '   self ms  self %  function',
+        ]
+        for index, seconds in sorted(self_time.items(), key=lambda item: item[1], reverse=True)[:SUMMARY_ROWS]:
+            frame = self.frames[index]
+            lines.append(
+                f'{seconds * 1000:10.1f}  {seconds / (total or 1) * 100:5.1f}%  '
+                f"{frame['name']} ({frame['file']}:{frame['line']})"
+            )
+        return '\n'.join(lines)
+
+
+def save_profile(recorder, request, response, user, duration):
+    """Store a recorder's result as a RequestProfile and prune old ones"""
+    from .models import RequestProfile
+
+    path = request.get_full_path()
+    data, summary = recorder.result(f'{request.method} {path}')
+    if len(data) > settings.PROFILER_MAX_BYTES:
+        summary = f'Raw profile dropped: {len(data)} bytes exceeds PROFILER_MAX_BYTES\n\n{summary}'
+        data = b''
+
+    profile = RequestProfile.objects.create(
+        user=user,
+        method=request.method,
+        path=path[:500],
+        status_code=response.status_code,
+        duration_ms=duration * 1000,
+        format=recorder.format,
+        summary=summary[:MAX_SUMMARY_CHARS],
+        data=data,
+    )
+
+    stale = RequestProfile.objects.values_list('pk', flat=True)[settings.PROFILER_KEEP:]
+    RequestProfile.objects.filter(pk__in=list(stale)).delete()
+    return profile
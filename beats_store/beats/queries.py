@@ -0,0 +1,125 @@
+"""
+Per-request SQL analysis: slow statements and repeated query shapes.
+
+Every query is reduced to its shape (literals and IN-lists collapsed, see
+normalize_sql) and counted. A shape that runs more than
+QUERY_REPEAT_THRESHOLD times in one request is almost always an N+1 - a
+related object fetched once per row - and is reported with a
+RepeatedQueryWarning; queries slower than SLOW_QUERY_MS are logged as they
+happen.
+
+beats.middleware.QueryAnalysisMiddleware applies this to every request when
+QUERY_ANALYSIS_ENABLED is set (by default only with DEBUG). With
+QUERY_REPEAT_RAISE enabled (the test suite does this) repeated shapes raise
+RepeatedQueryError instead, so a new N+1 fails the test that exercises it.
+For ad-hoc checks outside a request:
+
+    from beats.queries import analyze_queries
+
+    with analyze_queries() as analyzer:
+        list(Purchase.objects.all())
+    print(analyzer.report())
+"""
+
+from contextlib import ExitStack, contextmanager
+from django.conf import settings
+from django.db import connections
+import logging
+import re
+import time
+import warnings
+
+logger = logging.getLogger(__name__)
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LIST_RE = re.compile(r'\bIN \(\s*(?:%s|\?)(?:\s*,\s*(?:%s|\?))*\s*\)', re.IGNORECASE)
+_WHITESPACE_RE = re.compile(r'\s+')
+# Django names savepoints after the thread and a counter
+_SAVEPOINT_RE = re.compile(r'\bSAVEPOINT\s+"?\w+"?', re.IGNORECASE)
+
+
+class RepeatedQueryWarning(UserWarning):
+    """The same query shape ran more than QUERY_REPEAT_THRESHOLD times in one request"""
+
+
+class RepeatedQueryError(Exception):
+    """Raised instead of RepeatedQueryWarning when QUERY_REPEAT_RAISE is enabled"""
+
+
+def normalize_sql(sql):
+    """Reduce a statement to its shape, so queries differing only in values compare equal"""
+    sql = _STRING_RE.sub('?', sql)
+    sql = _NUMBER_RE.sub('?', sql)
+    sql = _IN_LIST_RE.sub('IN (...)', sql)
+    sql = _SAVEPOINT_RE.sub('SAVEPOINT ?', sql)
+    return _WHITESPACE_RE.sub(' ', sql).strip()
+
+
+class QueryAnalyzer:
+    """connection.execute_wrapper hook that groups queries by shape"""
+
+    def __init__(self, slow_ms=None):
+        self.slow_ms = settings.SLOW_QUERY_MS if slow_ms is None else slow_ms
+        # shape -> {'count': int, 'seconds': float, 'sql': first raw statement}
+        self.shapes = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self._record(sql, elapsed)
+            if self.slow_ms and elapsed * 1000 >= self.slow_ms:
+                logger.warning(f'Slow query ({elapsed * 1000:.1f} ms): {sql}')
+
+    def _record(self, sql, elapsed):
+        shape = normalize_sql(sql)
+        stats = self.shapes.get(shape)
+        if stats is None:
+            stats = self.shapes[shape] = {'count': 0, 'seconds': 0.0, 'sql': sql}
+        stats['count'] += 1
+        stats['seconds'] += elapsed
+
+    @property
+    def total_count(self):
+        return sum(stats['count'] for stats in self.shapes.values())
+
+    def repeated(self, threshold=None):
+        """Return [(shape, stats)] for shapes run more than ``threshold`` times, worst first"""
+        threshold = settings.QUERY_REPEAT_THRESHOLD if threshold is None else threshold
+        found = [(shape, stats) for shape, stats in self.shapes.items() if stats['count'] > threshold]
+        return sorted(found, key=lambda item: item[1]['count'], reverse=True)
+
+    def report(self, limit=20):
+        """Return the most frequent shapes as text"""
+        lines = [f'{self.total_count} queries, {len(self.shapes)} shapes']
+        ranked = sorted(self.shapes.items(), key=lambda item: item[1]['count'], reverse=True)
+        for shape, stats in ranked[:limit]:
+            lines.append(f"  {stats['count']:4d}x {stats['seconds'] * 1000:8.1f} ms  {shape}")
+        return '\n'.join(lines)
+
+
+@contextmanager
+def analyze_queries(slow_ms=None):
+    """Analyze every query run on any database connection inside the block"""
+    analyzer = QueryAnalyzer(slow_ms=slow_ms)
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(analyzer))
+        yield analyzer
+
+
+def check_repeated(analyzer, label, threshold=None):
+    """Warn about (or, with QUERY_REPEAT_RAISE, raise on) repeated query shapes"""
+    repeated = analyzer.repeated(threshold)
+    if not repeated:
+        return
+    details = '; '.join(f"{stats['count']}x {shape}" for shape, stats in repeated)
+    message = f'Repeated queries in {label}: {details}'
+    if settings.QUERY_REPEAT_RAISE:
+        raise RepeatedQueryError(message)
+    logger.warning(message)
+    warnings.warn(message, RepeatedQueryWarning)
+
@@ -0,0 +1,171 @@
+"""
+Resumable chunked uploads of beat files (a subset of the tus 1.0 protocol).
+
+A dropped connection halfway through a multi-hundred-MB stems upload
+shouldn't mean starting over. The client creates an upload
+(``POST /api/uploads/``), then PATCHes consecutive chunks with an
+``Upload-Offset`` header, and can ask where to resume with ``HEAD``. Finally
+it finalizes the upload, which assembles the file, checks it like a direct
+upload (beats.uploads.check_upload) and attaches it to the beat.
+
+Chunks are copied from the request stream in CHUNK_COPY_SIZE pieces. They
+never pass through Django's upload handlers, and no request is held in
+memory:
+
+- Local storage appends each chunk to "<key>.part" next to the final file,
+  and assembling is a rename. Bytes that reached the disk before a
+  connection dropped count towards the offset.
+- S3 stores each chunk as one part of a multipart upload, spooled through a
+  temporary file so botocore can retry it, and assembling completes the
+  multipart upload. S3 requires every part except the last to be at least
+  MIN_PART_SIZE, so clients should send CHUNK_SIZE chunks.
+
+Progress lives in ResumableUpload rows. Abandoned uploads are removed by
+``manage.py abort_stale_uploads``.
+"""
+
+from django.conf import settings
+from .instrumentation import timed
+from .models import Beat
+from .uploads import UploadError, check_upload
+import os
+import tempfile
+
+TUS_VERSION = '1.0.0'
+
+# Chunk size clients are told to use
+CHUNK_SIZE = 8 * 1024 * 1024
+
+# Smallest S3 multipart part, except for the last one
+MIN_PART_SIZE = 5 * 1024 * 1024
+
+# S3's limit on the number of parts
+MAX_PARTS = 10000
+
+# Bytes copied at a time from the request to disk
+CHUNK_COPY_SIZE = 1024 * 1024
+
+
+def _storage(upload):
+    return Beat._meta.get_field(upload.field).storage
+
+
+def _part_path(upload):
+    return _storage(upload).path(upload.key) + '.part'
+
+
+def _copy(stream, destination, length):
+    """Copy up to ``length`` bytes from ``stream``; returns the number copied"""
+    copied = 0
+    while copied < length:
+        data = stream.read(min(CHUNK_COPY_SIZE, length - copied))
+        if not data:
+            break
+        destination.write(data)
+        copied += len(data)
+    return copied
+
+
+def start(upload):
+    """Prepare storage for a new upload; sets upload.multipart_id with S3"""
+    if settings.USE_S3:
+        storage = _storage(upload)
+        params = {'ContentType': upload.content_type}
+        # Match what storage.save() would have set on the object
+        if storage.default_acl:
+            params['ACL'] = storage.default_acl
+        if storage.object_parameters.get('CacheControl'):
+            params['CacheControl'] = storage.object_parameters['CacheControl']
+        with timed('storage'):
+            response = storage.connection.meta.client.create_multipart_upload(
+                Bucket=storage.bucket_name, Key=storage._normalize_name(upload.key), **params,
+            )
+        upload.multipart_id = response['UploadId']
+        return
+
+    path = _part_path(upload)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb'):
+        pass
+
+
+def write_chunk(upload, stream, length):
+    """Append ``length`` bytes read from ``stream`` at upload.offset.
+
+    Advances upload.offset (and upload.parts with S3); the caller saves the
+    row, also when reading the stream fails part way.
+    """
+    if settings.USE_S3:
+        _write_part(upload, stream, length)
+        return
+
+    with timed('storage'), open(_part_path(upload), 'r+b') as part:
+        # Drop anything past the offset, e.g. from a request that failed before it was recorded
+        part.seek(upload.offset)
+        part.truncate()
+        try:
+            _copy(stream, part, length)
+        finally:
+            part.flush()
+            upload.offset = part.tell()
+
+
+def _write_part(upload, stream, length):
+    is_last = upload.offset + length == upload.size
+    if length < MIN_PART_SIZE and not is_last:
+        raise UploadError(f'Chunks must be at least {MIN_PART_SIZE} bytes, except the last one')
+    if len(upload.parts) >= MAX_PARTS:
+        raise UploadError(f'An upload can have at most {MAX_PARTS} chunks')
+
+    storage = _storage(upload)
+    with tempfile.TemporaryFile() as spool:
+        if _copy(stream, spool, length) != length:
+            # A part must be complete; the client resends the chunk from the same offset
+            raise UploadError('Chunk ended before Content-Length bytes were received')
+        spool.seek(0)
+        part_number = len(upload.parts) + 1
+        with timed('storage'):
+            response = storage.connection.meta.client.upload_part(
+                Bucket=storage.bucket_name,
+                Key=storage._normalize_name(upload.key),
+                UploadId=upload.multipart_id,
+                PartNumber=part_number,
+                Body=spool,
+                ContentLength=length,
+            )
+    upload.parts = [*upload.parts, {'PartNumber': part_number, 'ETag': response['ETag']}]
+    upload.offset += length
+
+
+def assemble(upload, max_size):
+    """Turn the received chunks into the stored file and check it; returns its size.
+
+    Raises UploadError (and deletes the file) if the check fails.
+    """
+    storage = _storage(upload)
+    if settings.USE_S3:
+        with timed('storage'):
+            storage.connection.meta.client.complete_multipart_upload(
+                Bucket=storage.bucket_name,
+                Key=storage._normalize_name(upload.key),
+                UploadId=upload.multipart_id,
+                MultipartUpload={'Parts': upload.parts},
+            )
+    else:
+        os.replace(_part_path(upload), storage.path(upload.key))
+    return check_upload(storage, {'key': upload.key, 'content_type': upload.content_type, 'max_size': max_size})
+
+
+def abort(upload):
+    """Throw away the chunks received for an upload"""
+    if settings.USE_S3:
+        storage = _storage(upload)
+        with timed('storage'):
+            storage.connection.meta.client.abort_multipart_upload(
+                Bucket=storage.bucket_name, Key=storage._normalize_name(upload.key), UploadId=upload.multipart_id,
+            )
+        return
+    try:
+        os.remove(_part_path(upload))
+    except FileNotFoundError:
+        pass
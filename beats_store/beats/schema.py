@@ -0,0 +1,88 @@
+"""
+Prebuilt OpenAPI schema.
+
+Generating the schema walks every view and serializer, which is too much
+work to repeat on every request to /api/schema/ (and Swagger UI and Redoc
+fetch it on every page load). ``python manage.py build_schema`` writes it
+once per deploy as schema.json and schema.yaml under OPENAPI_SCHEMA_DIR.
+beats.views.SchemaView serves those files with an ETag and long cache
+headers. It only generates the schema live in DEBUG, where the code changes
+under it.
+"""
+
+from django.conf import settings
+import hashlib
+import os
+import tempfile
+import threading
+
+# Artifact format -> drf-spectacular renderer that produces it
+FORMATS = {
+    'json': 'drf_spectacular.renderers.OpenApiJsonRenderer',
+    'yaml': 'drf_spectacular.renderers.OpenApiYamlRenderer',
+}
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+class SchemaNotBuilt(Exception):
+    """The schema artifact is missing; run ``manage.py build_schema``"""
+
+
+def schema_path(fmt, directory=None):
+    return os.path.join(directory or settings.OPENAPI_SCHEMA_DIR, f'schema.{fmt}')
+
+
+def generate_schema():
+    """Generate the public schema the same way /api/schema/ does"""
+    from drf_spectacular.settings import spectacular_settings
+
+    generator = spectacular_settings.DEFAULT_GENERATOR_CLASS(urlconf=spectacular_settings.SERVE_URLCONF)
+    return generator.get_schema(request=None, public=True)
+
+
+def render_schema(schema, fmt):
+    from django.utils.module_loading import import_string
+
+    return import_string(FORMATS[fmt])().render(schema, renderer_context={})
+
+
+def write_schema(schema, directory=None):
+    """Write every format of ``schema`` atomically; returns {format: path}"""
+    directory = directory or settings.OPENAPI_SCHEMA_DIR
+    os.makedirs(directory, exist_ok=True)
+    paths = {}
+    for fmt in FORMATS:
+        path = schema_path(fmt, directory)
+        # Write next to the target and rename, so a running worker never reads half a file
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.schema-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(render_schema(schema, fmt))
+            os.chmod(temp_path, 0o644)
+            os.replace(temp_path, path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+        paths[fmt] = path
+    return paths
+
+
+def load_schema(fmt):
+    """Return (body, etag) of a prebuilt schema, re-reading the file only when it changes"""
+    path = schema_path(fmt)
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        raise SchemaNotBuilt(path) from None
+    key = (stat.st_mtime_ns, stat.st_size)
+    cached = _cache.get(path)
+    if cached and cached[0] == key:
+        return cached[1], cached[2]
+    with _cache_lock:
+        with open(path, 'rb') as f:
+            body = f.read()
+        etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+        _cache[path] = (key, body, etag)
+    return body, etag
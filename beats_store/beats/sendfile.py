@@ -0,0 +1,178 @@
+"""
+Serving stored media without copying it through Python.
+
+Django decides whether a file may be served (the download action checks the
+purchase); the bytes are then sent by whatever sits closest to the disk,
+chosen with MEDIA_SENDFILE_BACKEND:
+
+- ``nginx``: an empty response with ``X-Accel-Redirect`` pointing into an
+  internal location that maps MEDIA_SENDFILE_PREFIX to MEDIA_ROOT:
+
+      location /protected-media/ {
+          internal;
+          alias /path/to/media/;
+      }
+
+- ``xsendfile``: an ``X-Sendfile`` header with the absolute path, for
+  Apache mod_xsendfile, lighttpd and Caddy.
+
+- empty (default): a FileResponse over the open file. Under gunicorn it is
+  sent with wsgi.file_wrapper, i.e. os.sendfile(), so the worker still never
+  reads the file into memory.
+
+Remote storage (S3) has no local path; those files are served from the disk
+cache when they are in it (see beats.diskcache), and otherwise streamed
+from their URL in chunks rather than buffered whole.
+
+With the file's recorded metadata (see beats.metadata), responses carry its
+SHA-256 as ETag and Repr-Digest, so clients can verify what they received
+and revalidate without downloading again. A file whose size no longer
+matches its metadata is logged and served without them.
+"""
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils.http import content_disposition_header, http_date
+from django.views.static import was_modified_since
+from urllib.parse import quote
+from django.utils.cache import get_conditional_response
+from . import diskcache
+from .instrumentation import timed
+from .metadata import digest_header
+from stat import S_ISREG
+import logging
+import mimetypes
+import os
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ('', 'nginx', 'xsendfile')
+
+# Bytes per chunk when streaming remote files
+CHUNK_SIZE = 64 * 1024
+
+
+def _local_path(storage, name):
+    """Return the filesystem path of ``name``, or None if the storage is remote"""
+    try:
+        return storage.path(name)
+    except NotImplementedError:
+        return None
+
+
+def serve_file(storage, name, request=None, content_type=None, filename=None, as_attachment=False,
+               metadata=None):
+    """Return a response that sends stored file ``name``.
+
+    Raises FileNotFoundError if the file does not exist. With ``request``,
+    local files honour If-Modified-Since, and files with ``metadata`` honour
+    If-None-Match against their checksum.
+    """
+    backend = settings.MEDIA_SENDFILE_BACKEND
+    if backend not in BACKENDS:
+        raise ValueError(f'Unknown MEDIA_SENDFILE_BACKEND {backend!r}; expected one of {BACKENDS}')
+
+    content_type = content_type or mimetypes.guess_type(name)[0] or 'application/octet-stream'
+    filename = filename or os.path.basename(name)
+    etag = f'"{metadata["sha256"]}"' if metadata else None
+    if etag and request is not None and request.headers.get('If-None-Match'):
+        # Answered from the row alone, without touching storage
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            return not_modified
+
+    path = _local_path(storage, name)
+    if path is None:
+        # Remote files already in the disk cache are served from it; misses stream from storage
+        # rather than waiting for the whole file to be cached
+        cached = diskcache.open_cached(storage, name, fill=False)
+        if cached is None:
+            return _stream_remote(storage, name, content_type, filename, as_attachment, metadata)
+        metadata = _checked(metadata, os.fstat(cached.fileno()).st_size, name)
+        response = FileResponse(cached, content_type=content_type)
+        # The entry's mtime is its last use, not the file's, so no Last-Modified
+        return _finish(response, None, filename, as_attachment, metadata)
+
+    with timed('storage'):
+        stat = os.stat(path)
+    if not S_ISREG(stat.st_mode):
+        raise FileNotFoundError(name)
+    metadata = _checked(metadata, stat.st_size, name)
+    if request is not None and not was_modified_since(request.META.get('HTTP_IF_MODIFIED_SINCE'), stat.st_mtime):
+        return HttpResponseNotModified()
+
+    if backend == 'nginx':
+        response = HttpResponse(content_type=content_type)
+        # Relative to MEDIA_ROOT on disk, which differs from the name for content-addressed files
+        relative = os.path.relpath(path, storage.location).replace(os.sep, '/')
+        response['X-Accel-Redirect'] = settings.MEDIA_SENDFILE_PREFIX.rstrip('/') + '/' + quote(relative)
+    elif backend == 'xsendfile':
+        response = HttpResponse(content_type=content_type)
+        response['X-Sendfile'] = os.path.abspath(path)
+    else:
+        with timed('storage'):
+            handle = open(path, 'rb')
+        response = FileResponse(handle, content_type=content_type)
+    return _finish(response, stat, filename, as_attachment, metadata)
+
+
+def _checked(metadata, size, name):
+    """Return ``metadata`` if it still describes a file of ``size`` bytes, else None"""
+    if metadata and metadata['size'] != size:
+        logger.error(f"{name} is {size} bytes but its recorded metadata says {metadata['size']}")
+        return None
+    return metadata
+
+
+def _add_digest(response, metadata):
+    if metadata:
+        response['ETag'] = f'"{metadata["sha256"]}"'
+        response['Repr-Digest'] = digest_header(metadata['sha256'])
+
+
+def _finish(response, stat, filename, as_attachment, metadata):
+    # Content-Length is left to FileResponse or the proxy; an empty X-Accel/X-Sendfile
+    # response must not announce the file's size
+    if stat is not None:
+        response['Last-Modified'] = http_date(stat.st_mtime)
+    _add_digest(response, metadata)
+    disposition = content_disposition_header(as_attachment, filename)
+    if disposition:
+        response['Content-Disposition'] = disposition
+    return response
+
+
+def _stream_remote(storage, name, content_type, filename, as_attachment, metadata):
+    import requests
+
+    url = storage.url(name)
+    # Ensure HTTPS for S3 URLs
+    if url.startswith('http://') and 'amazonaws.com' in url:
+        url = url.replace('http://', 'https://')
+    with timed('storage'):
+        upstream = requests.get(url, stream=True, timeout=30)
+    if upstream.status_code == 404:
+        upstream.close()
+        raise FileNotFoundError(name)
+    upstream.raise_for_status()
+
+    response = StreamingHttpResponse(_chunks(upstream), content_type=content_type)
+    upstream_length = upstream.headers.get('Content-Length')
+    if upstream_length:
+        response['Content-Length'] = upstream_length
+        metadata = _checked(metadata, int(upstream_length), name)
+    elif metadata:
+        response['Content-Length'] = str(metadata['size'])
+    _add_digest(response, metadata)
+    disposition = content_disposition_header(as_attachment, filename)
+    if disposition:
+        response['Content-Disposition'] = disposition
+    return response
+
+
+def _chunks(upstream):
+    # Closed with the response, so the upstream connection is released even if the client disconnects
+    try:
+        yield from upstream.iter_content(CHUNK_SIZE)
+    finally:
+        upstream.close()
@@ -1,26 +1,12 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
 from django.conf import settings
+from django.db.models.fields.files import FieldFile
 from urllib.parse import urljoin
 from .models import Beat, Purchase, UserProfile
 
-class BeatSerializer(serializers.ModelSerializer):
-    # Ensure file fields return absolute URLs
-    cover_art = serializers.SerializerMethodField()
-    snippet_mp3 = serializers.SerializerMethodField()
-    mp3_file = serializers.SerializerMethodField()
-    wav_file = serializers.SerializerMethodField()
-    stems_file = serializers.SerializerMethodField()
-    uploaded_by_username = serializers.SerializerMethodField()
-    
-    class Meta:
-        model = Beat
-        fields = '__all__'
-        read_only_fields = ['snippet_mp3']  # snippet_mp3 is auto-generated from mp3_file
-    
-    def get_uploaded_by_username(self, obj):
-        """Return the username of the user who uploaded the beat"""
-        return obj.uploaded_by.username if obj.uploaded_by else None
+class FileURLMixin:
+    """Resolve stored files to absolute URLs for both local storage and S3"""
     
     def _get_file_url(self, file_field):
         """Helper method to get absolute URL for file fields"""
@@ -75,12 +61,95 @@ class BeatSerializer(serializers.ModelSerializer):
         
         return None
     
+    def _get_variant_urls(self, obj, field_name, variants):
+        """Map a {variant: {format: name}} dict of stored names to absolute URLs"""
+        if not variants:
+            return None
+        field = obj._meta.get_field(field_name)
+        return {
+            variant: {
+                extension: self._get_file_url(FieldFile(obj, field, name))
+                for extension, name in formats.items()
+            }
+            for variant, formats in variants.items()
+        }
+
+
+class SparseFieldsetMixin:
+    """Let clients trim read responses with ?fields=a,b and ?omit=c,d.
+
+    Dropped fields are removed before serialization, so their
+    SerializerMethodFields (and storage URL lookups) never run. Fields
+    listed in Meta.opt_in_fields are only included when ?fields= names them.
+    """
+    
+    def get_fields(self):
+        fields = super().get_fields()
+        request = self.context.get('request')
+        read = request is not None and request.method in ('GET', 'HEAD')
+        requested = self._parse_field_list(request.query_params.get('fields')) if read else set()
+        for name in getattr(self.Meta, 'opt_in_fields', ()):
+            if name not in requested:
+                fields.pop(name, None)
+        if not read:
+            return fields
+        
+        omitted = self._parse_field_list(request.query_params.get('omit'))
+        if requested:
+            fields = {name: field for name, field in fields.items() if name in requested}
+        for name in omitted:
+            fields.pop(name, None)
+        return fields
+    
+    @classmethod
+    def wants_field(cls, request, name):
+        """Check whether a read request keeps field ``name``, e.g. to skip loading its column"""
+        requested = cls._parse_field_list(request.query_params.get('fields'))
+        if requested:
+            wanted = name in requested
+        else:
+            wanted = name not in getattr(cls.Meta, 'opt_in_fields', ())
+        return wanted and name not in cls._parse_field_list(request.query_params.get('omit'))
+    
+    @staticmethod
+    def _parse_field_list(value):
+        return {name.strip() for name in (value or '').split(',') if name.strip()}
+
+
+class BeatSerializer(SparseFieldsetMixin, FileURLMixin, serializers.ModelSerializer):
+    # Ensure file fields return absolute URLs
+    cover_art = serializers.SerializerMethodField()
+    cover_art_variants = serializers.SerializerMethodField()
+    snippet_mp3 = serializers.SerializerMethodField()
+    snippet_renditions = serializers.SerializerMethodField()
+    mp3_file = serializers.SerializerMethodField()
+    wav_file = serializers.SerializerMethodField()
+    stems_file = serializers.SerializerMethodField()
+    uploaded_by_username = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = Beat
+        fields = '__all__'
+        read_only_fields = ['snippet_mp3']  # snippet_mp3 is auto-generated from mp3_file
+    
+    def get_uploaded_by_username(self, obj):
+        """Return the username of the user who uploaded the beat"""
+        return obj.uploaded_by.username if obj.uploaded_by else None
+    
     def get_cover_art(self, obj):
         return self._get_file_url(obj.cover_art)
     
+    def get_cover_art_variants(self, obj):
+        """Return {variant: {format: url}} for the resized copies of cover_art"""
+        return self._get_variant_urls(obj, 'cover_art', obj.cover_art_variants)
+    
     def get_snippet_mp3(self, obj):
         return self._get_file_url(obj.snippet_mp3)
     
+    def get_snippet_renditions(self, obj):
+        """Return {bitrate: {format: url}} for the re-encoded copies of snippet_mp3"""
+        return self._get_variant_urls(obj, 'snippet_mp3', obj.snippet_renditions)
+    
     def get_mp3_file(self, obj):
         return self._get_file_url(obj.mp3_file)
     
@@ -90,6 +159,23 @@ class BeatSerializer(serializers.ModelSerializer):
     def get_stems_file(self, obj):
         return self._get_file_url(obj.stems_file)
 
+class BeatListSerializer(BeatSerializer):
+    """Compact catalog row: only what the grid needs to show and preview a beat.
+
+    The full-quality file URLs and uploader details stay on the detail view.
+    Waveform peaks (800 numbers a row) are opt-in with ?fields=; clients
+    otherwise fetch them per beat from the waveform action.
+    """
+    
+    class Meta(BeatSerializer.Meta):
+        fields = [
+            'id', 'name', 'genre', 'bpm', 'scale',
+            'cover_art', 'cover_art_variants', 'snippet_mp3', 'snippet_renditions', 'waveform_peaks',
+            'mp3_price', 'wav_price', 'stems_price', 'created_at',
+        ]
+        opt_in_fields = ['waveform_peaks']
+
+
 class PurchaseSerializer(serializers.ModelSerializer):
     class Meta:
         model = Purchase
@@ -97,66 +183,28 @@ class PurchaseSerializer(serializers.ModelSerializer):
         read_only_fields = ['user', 'created_at']
 
 
-class UserProfileSerializer(serializers.ModelSerializer):
-    photo = serializers.SerializerMethodField()
+class UserProfileSerializer(FileURLMixin, serializers.ModelSerializer):
+    # Writable so uploads reach the model (and its avatar processing); read back as a URL
+    photo = serializers.ImageField(required=False, allow_null=True)
+    photo_variants = serializers.SerializerMethodField()
     
     class Meta:
         model = UserProfile
-        fields = ['photo', 'bio', 'middle_initial', 'created_at', 'updated_at']
+        fields = ['photo', 'photo_variants', 'bio', 'middle_initial', 'created_at', 'updated_at']
         read_only_fields = ['created_at', 'updated_at']
     
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        data['photo'] = self.get_photo(instance)
+        return data
+    
     def get_photo(self, obj):
         """Get absolute URL for photo field (works for both local and S3)"""
-        if not obj.photo:
-            return None
-        
-        try:
-            # Try to get URL from storage backend (works for both local and S3)
-            if hasattr(obj.photo, 'url'):
-                url = obj.photo.url
-                
-                # Ensure HTTPS for S3 URLs (fix any HTTP S3 URLs)
-                if url.startswith('http://') and 'amazonaws.com' in url:
-                    url = url.replace('http://', 'https://')
-                
-                # Handle protocol-relative URLs
-                if url.startswith('//'):
-                    url = 'https:' + url
-                
-                # Handle relative URLs
-                elif url.startswith('/') and not url.startswith('http'):
-                    if settings.USE_S3:
-                        # S3: prepend MEDIA_URL (which is already the full S3 domain)
-                        url = urljoin(settings.MEDIA_URL, url.lstrip('/'))
-                    else:
-                        # Local: build absolute URL using request
-                        request = self.context.get('request')
-                        if request:
-                            url = request.build_absolute_uri(url)
-                        else:
-                            # Fallback: prepend MEDIA_URL
-                            url = urljoin(settings.MEDIA_URL, url.lstrip('/'))
-                
-                return url
-            elif hasattr(obj.photo, 'name') and obj.photo.name:
-                # Fallback: construct URL from name
-                if settings.USE_S3:
-                    # S3: MEDIA_URL is already the full domain
-                    return urljoin(settings.MEDIA_URL, obj.photo.name)
-                else:
-                    # Local: build absolute URL
-                    request = self.context.get('request')
-                    if request:
-                        return request.build_absolute_uri(settings.MEDIA_URL + obj.photo.name)
-                    else:
-                        return urljoin(settings.MEDIA_URL, obj.photo.name)
-        except Exception as e:
-            # Log error but don't break serialization
-            import logging
-            logger = logging.getLogger(__name__)
-            logger.error(f"Error getting photo URL: {e}")
-        
-        return None
+        return self._get_file_url(obj.photo)
+    
+    def get_photo_variants(self, obj):
+        """Return {size: {format: url}} for the square avatar sizes"""
+        return self._get_variant_urls(obj, 'photo', obj.photo_variants)
 
 
 class UserSerializer(serializers.ModelSerializer):
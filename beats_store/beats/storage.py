@@ -0,0 +1,247 @@
+"""
+Storage backends used for media files.
+
+These are the stock FileSystemStorage/S3Boto3Storage with every call that
+reaches the disk or S3 timed as 'storage' for the request metrics (see
+beats.instrumentation). URL generation is not timed: it never leaves the
+process for public media.
+
+TimedS3Storage is only built when something asks for it, so local setups
+never import boto3 and S3 setups pay for it on first storage use rather than
+on every process start.
+
+With MEDIA_CONTENT_ADDRESSED the Timed backends are wrapped by
+ContentAddressedStorageMixin, which stores each distinct file once under the
+hash of its content (see the mixin for the naming scheme).
+"""
+
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.core.files.utils import validate_file_name
+from django.db import transaction
+from django.db.models import F
+from .instrumentation import timed
+import hashlib
+import posixpath
+import re
+
+# Storage methods that do I/O against the backend
+TIMED_METHODS = ('_open', '_save', 'delete', 'exists', 'listdir', 'size', 'get_modified_time')
+
+# Hex digits of the SHA-256 used as content address (160 bits, like git object names)
+DIGEST_LENGTH = 40
+
+# Folder holding the content-addressed objects
+BLOB_PREFIX = 'cas'
+
+# Content-addressed objects never change, so clients and CDNs may keep them for a year
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+IMMUTABLE_CACHE_CONTROL = f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+
+# "<folder>/<digest>/<filename>", as returned by ContentAddressedStorageMixin.save()
+_CONTENT_NAME_RE = re.compile(rf'(?:^|/)(?P<digest>[0-9a-f]{{{DIGEST_LENGTH}}})/(?P<filename>[^/]+)$')
+_BLOB_NAME_RE = re.compile(rf'(?:^|/){BLOB_PREFIX}/[0-9a-f]{{2}}/[0-9a-f]{{{DIGEST_LENGTH}}}(\.\w+)?$')
+
+
+class TimedStorageMixin:
+    """Time the I/O methods of a storage class as 'storage'"""
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        for name in TIMED_METHODS:
+            setattr(cls, name, _timed_method(getattr(cls, name)))
+
+
+def _timed_method(method):
+    def wrapper(self, *args, **kwargs):
+        with timed('storage'):
+            return method(self, *args, **kwargs)
+    wrapper.__name__ = method.__name__
+    wrapper.__doc__ = method.__doc__
+    return wrapper
+
+
+class TimedFileSystemStorage(TimedStorageMixin, FileSystemStorage):
+    pass
+
+
+def blob_name(name):
+    """Return the key of the object behind a content-addressed name, or None for other names"""
+    match = _CONTENT_NAME_RE.search(name or '')
+    if match is None:
+        return None
+    digest = match['digest']
+    extension = posixpath.splitext(match['filename'])[1].lower()
+    return f'{BLOB_PREFIX}/{digest[:2]}/{digest}{extension}'
+
+
+def is_blob_name(name):
+    """Check whether ``name`` is the key of a content-addressed object, whose bytes never change"""
+    return bool(_BLOB_NAME_RE.search(name or ''))
+
+
+def content_digest(content):
+    """Return the content address of a File: the leading DIGEST_LENGTH hex digits of its SHA-256"""
+    digest = hashlib.sha256()
+    for chunk in content.chunks():
+        digest.update(chunk)
+    content.seek(0)
+    return digest.hexdigest()[:DIGEST_LENGTH]
+
+
+class ContentAddressedStorageMixin:
+    """Store each distinct file once, keyed by the hash of its content.
+
+    save() returns "<folder>/<digest>/<filename>": the folder from upload_to
+    and the filename are kept, so names stay readable and code that looks at
+    them (snippet detection, variant prefixes) is unaffected. The bytes live
+    once under "cas/<ab>/<digest><ext>", shared by every name with that
+    digest, and saving content that is already stored transfers nothing.
+    URLs point at that key, so they are immutable.
+
+    Each save takes a reference on the object (a ContentBlob row) and
+    delete() drops one; the object is deleted with its last reference, once
+    the transaction commits. Saving under a public folder (previews, covers,
+    avatars) marks the object public, which lets /media/ serve it. Other names (files stored before this backend,
+    or written straight to the backend by direct and resumable uploads) pass
+    through untouched.
+    """
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        validate_file_name(name, allow_relative_path=True)
+
+        # Names are unique per content, so get_available_name() has nothing to do
+        name = self.content_name(name, content, max_length)
+        validate_file_name(name, allow_relative_path=True)
+        return self._save(name, content)
+
+    def content_name(self, name, content, max_length=None):
+        """Return the name save() stores ``content`` under when asked for ``name``"""
+        return self._content_name(name, content_digest(content), max_length)
+
+    def _content_name(self, name, digest, max_length):
+        folder, filename = posixpath.split(name)
+        name = posixpath.join(folder, digest, filename)
+        excess = len(name) - max_length if max_length else 0
+        if excess > 0:
+            stem, extension = posixpath.splitext(filename)
+            if excess >= len(stem):
+                raise SuspiciousFileOperation(
+                    f'Storage can not find an available filename for "{name}". '
+                    'Please make sure that the corresponding file field '
+                    'allows sufficient "max_length".'
+                )
+            name = posixpath.join(folder, digest, stem[:-excess] + extension)
+        return name
+
+    def _save(self, name, content):
+        from .inventory import public_prefixes
+        from .models import ContentBlob
+
+        key = blob_name(name)
+        if key is None:
+            return super()._save(name, content)
+        public = name.startswith(public_prefixes())
+        with transaction.atomic():
+            blob, _ = ContentBlob.objects.select_for_update().get_or_create(
+                name=key, defaults={'size': content.size, 'public': public},
+            )
+            # The row lock keeps a concurrent delete from removing the object in between
+            if not super().exists(key):
+                stored = super()._save(key, content)
+                if stored != key:
+                    # Written concurrently by a save that didn't hold the lock (SQLite); keep one copy
+                    super().delete(stored)
+            blob.references = F('references') + 1
+            blob.public = blob.public or public
+            blob.save(update_fields=['references', 'public', 'updated_at'])
+        return name
+
+    def delete(self, name):
+        from .models import ContentBlob
+
+        key = blob_name(name)
+        if key is None:
+            return super().delete(name)
+        released = ContentBlob.objects.filter(name=key, references__gt=0).update(
+            references=F('references') - 1,
+        )
+        if released:
+            transaction.on_commit(lambda: self.collect(key))
+
+    def collect(self, key):
+        """Delete a content-addressed object and its row if nothing references it any more"""
+        from .models import ContentBlob
+
+        with transaction.atomic():
+            # Locked, so a save of the same content waits and then uploads it again
+            unreferenced = ContentBlob.objects.select_for_update().filter(name=key, references=0)
+            if unreferenced.exists():
+                super().delete(key)
+                unreferenced.delete()
+
+    def _stored_name(self, name):
+        return blob_name(name) or name
+
+    def _open(self, name, mode='rb'):
+        return super()._open(self._stored_name(name), mode)
+
+    def exists(self, name):
+        return super().exists(self._stored_name(name))
+
+    def size(self, name):
+        return super().size(self._stored_name(name))
+
+    def path(self, name):
+        return super().path(self._stored_name(name))
+
+    def url(self, name, *args, **kwargs):
+        return super().url(self._stored_name(name), *args, **kwargs)
+
+    def get_modified_time(self, name):
+        return super().get_modified_time(self._stored_name(name))
+
+    def get_accessed_time(self, name):
+        return super().get_accessed_time(self._stored_name(name))
+
+    def get_created_time(self, name):
+        return super().get_created_time(self._stored_name(name))
+
+
+class ContentAddressedFileSystemStorage(ContentAddressedStorageMixin, TimedFileSystemStorage):
+    pass
+
+
+def __getattr__(name):
+    # Module-level __getattr__ (PEP 562): import_string('beats.storage.TimedS3Storage') lands here
+    if name == 'ContentAddressedS3Storage':
+        global ContentAddressedS3Storage
+
+        class ContentAddressedS3Storage(ContentAddressedStorageMixin, __getattr__('TimedS3Storage')):
+            def get_object_parameters(self, name):
+                params = super().get_object_parameters(name)
+                if is_blob_name(name):
+                    params['CacheControl'] = IMMUTABLE_CACHE_CONTROL
+                return params
+
+        ContentAddressedS3Storage.__qualname__ = 'ContentAddressedS3Storage'
+        return ContentAddressedS3Storage
+    if name == 'TimedS3Storage':
+        if 'TimedS3Storage' in globals():
+            return globals()['TimedS3Storage']
+        from storages.backends.s3boto3 import S3Boto3Storage
+
+        global TimedS3Storage
+
+        class TimedS3Storage(TimedStorageMixin, S3Boto3Storage):
+            pass
+
+        # Named as if defined at module level, for pickling and repr
+        TimedS3Storage.__qualname__ = 'TimedS3Storage'
+        return TimedS3Storage
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
@@ -0,0 +1,387 @@
+"""
+Synthetic data for benchmarks, load tests and production-sized local copies.
+
+Rows are inserted in batches with bulk_create, so none of the per-save media
+signals run and memory stays flat: 100k beats, 50k users and 1M purchases
+never exist in Python at the same time. Distributions are skewed the way a
+real catalog is - a few genres dominate, tempo follows the genre, minor keys
+outnumber major ones and a small share of beats collect most purchases.
+
+Generated beats can point at small but real audio/image files written by
+create_assets(). Everything created here belongs to users whose username
+starts with a common prefix, which is how clear() finds it again. Nothing in
+here checks which database it is writing to; see the generate_catalog and
+benchmark_api commands for the safeguards.
+"""
+
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+import bisect
+import io
+import itertools
+import random
+import struct
+import wave
+import zipfile
+
+# Relative share of each genre in the catalog, with the (mean, spread) of its tempo
+GENRES = {
+    'Trap': (30, (140, 8)),
+    'Hip Hop': (20, (92, 8)),
+    'Drill': (12, (142, 4)),
+    'R&B': (10, (75, 10)),
+    'Boom Bap': (8, (90, 5)),
+    'Afrobeats': (8, (105, 5)),
+    'Lo-Fi': (7, (80, 6)),
+    'Pop': (5, (115, 10)),
+}
+MINOR_SCALES = ['C Minor', 'A Minor', 'D Minor', 'F Minor', 'E Minor', 'G Minor', 'F# Minor', 'B Minor']
+MAJOR_SCALES = ['C Major', 'G Major', 'D Major', 'F Major', 'A Major', 'E Major']
+# Share of beats written in a minor key
+MINOR_SHARE = 0.8
+
+# (price, weight) tiers per license
+MP3_PRICES = [(Decimal('19.99'), 3), (Decimal('24.99'), 2), (Decimal('29.99'), 4), (Decimal('34.99'), 1)]
+WAV_PRICES = [(Decimal('39.99'), 3), (Decimal('49.99'), 4), (Decimal('59.99'), 1)]
+STEMS_PRICES = [(Decimal('99.99'), 3), (Decimal('149.99'), 2), (Decimal('199.99'), 1)]
+# Share of beats sold with a WAV / with stems
+WAV_SHARE = 0.85
+STEMS_SHARE = 0.6
+
+# Purchases: (download type, weight) and (payment status, weight)
+DOWNLOAD_TYPES = [('mp3', 60), ('wav', 30), ('stems', 10)]
+PAYMENT_STATUSES = [('completed', 92), ('pending', 5), ('failed', 3)]
+# Zipf exponents: how strongly purchases concentrate on popular beats / heavy buyers
+BEAT_POPULARITY_SKEW = 1.1
+BUYER_ACTIVITY_SKEW = 0.8
+
+NAME_ADJECTIVES = [
+    'Midnight', 'Golden', 'Cold', 'Velvet', 'Neon', 'Lost', 'Silent', 'Heavy', 'Crystal', 'Broken',
+    'Electric', 'Hazy', 'Wild', 'Frozen', 'Smoky', 'Burning', 'Lunar', 'Sacred', 'Hollow', 'Savage',
+]
+NAME_NOUNS = [
+    'Drift', 'Dreams', 'Streets', 'Waves', 'Skyline', 'Ghost', 'Rain', 'Empire', 'Pulse', 'Horizon',
+    'Echoes', 'Gravity', 'Phantom', 'Mirage', 'Thunder', 'Vibes', 'Shadows', 'Motion', 'Static', 'Bloom',
+]
+
+# Password every synthetic user logs in with
+SYNTHETIC_PASSWORD = 'synthetic-password'
+DEFAULT_PREFIX = 'synthetic'
+
+# How far back created_at timestamps are spread
+HISTORY_DAYS = 3 * 365
+
+# Distinct waveforms shared between synthetic beats
+WAVEFORM_POOL_SIZE = 16
+
+# One silent MPEG-1 Layer III frame: 128 kbps, 44.1 kHz, mono, no CRC. The
+# all-zero side information decodes as silence.
+_MP3_FRAME = b'\xff\xfb\x90\xc4' + bytes(413)
+_MP3_FRAMES_PER_SECOND = 44100 / 1152
+
+
+def silent_mp3(seconds=1.0):
+    """Return a playable MP3 of silence"""
+    return _MP3_FRAME * max(1, round(seconds * _MP3_FRAMES_PER_SECOND))
+
+
+def silent_wav(seconds=1.0, sample_rate=8000):
+    """Return a 16-bit mono WAV of silence"""
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(struct.pack('<h', 0) * int(seconds * sample_rate))
+    return buffer.getvalue()
+
+
+def stems_zip(seconds=1.0):
+    """Return a zip of silent WAV stems"""
+    stem = silent_wav(seconds)
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for name in ('drums', 'bass', 'melody'):
+            archive.writestr(f'{name}.wav', stem)
+    return buffer.getvalue()
+
+
+def solid_png(size=64, color=(40, 40, 40)):
+    """Return a square PNG of a single colour"""
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.new('RGB', (size, size), color).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def synthetic_waveform(rng, buckets=None):
+    """Return waveform peaks shaped like beats.media.compute_waveform_peaks() output"""
+    from .media import WAVEFORM_BUCKETS
+
+    buckets = buckets or WAVEFORM_BUCKETS
+    data = []
+    for _ in range(buckets):
+        peak = rng.randint(20, 127)
+        data.extend((-peak, peak))
+    return {
+        'version': 2, 'channels': 1, 'sample_rate': 44100, 'samples_per_pixel': 44100 * 30 // buckets,
+        'bits': 8, 'length': buckets, 'duration': 30.0, 'data': data,
+    }
+
+
+def create_assets(storage, count, seconds=1.0):
+    """Write ``count`` sets of media files and return their storage names.
+
+    Returns a list of dicts with mp3_file, snippet_mp3, wav_file, stems_file
+    and cover_art names, ready to be passed to Beat(...).
+    """
+    from django.core.files.base import ContentFile
+
+    mp3 = silent_mp3(seconds)
+    wav = silent_wav(seconds)
+    stems = stems_zip(seconds)
+    assets = []
+    for i in range(count):
+        png = solid_png(color=((i * 53) % 256, (i * 97) % 256, (i * 151) % 256))
+        assets.append({
+            # Under each field's upload_to, so the files are served and collected like uploads
+            'mp3_file': storage.save(f'beats/synthetic/{i}.mp3', ContentFile(mp3)),
+            'snippet_mp3': storage.save(f'preview-snippet/synthetic/{i}_preview.mp3', ContentFile(mp3)),
+            'wav_file': storage.save(f'beats/synthetic/{i}.wav', ContentFile(wav)),
+            'stems_file': storage.save(f'beats/synthetic/{i}.zip', ContentFile(stems)),
+            'cover_art': storage.save(f'covers/synthetic/{i}.png', ContentFile(png)),
+        })
+    return assets
+
+
+@contextmanager
+def manual_timestamps(model):
+    """Let bulk_create keep the created_at/updated_at values set on the instances"""
+    fields = [
+        field for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+    ]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def _weighted(choices):
+    """Turn [(value, weight)] into (values, cumulative weights) for rng.choices()"""
+    values = [value for value, _ in choices]
+    return values, list(itertools.accumulate(weight for _, weight in choices))
+
+
+def _zipf_cumulative(count, skew):
+    """Cumulative weights that make item i roughly 1/(i+1)**skew as likely as the first"""
+    return list(itertools.accumulate(1 / (rank ** skew) for rank in range(1, count + 1)))
+
+
+def _batches(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def _past_timestamp(rng, now, days=HISTORY_DAYS):
+    # Squaring biases timestamps towards the recent end, like a growing store
+    return now - timedelta(seconds=int(days * 86400 * rng.random() ** 2))
+
+
+def create_users(count, prefix=DEFAULT_PREFIX, rng=None, batch_size=5000):
+    """Bulk-create users (and their profiles) sharing one password hash; returns their pks"""
+    from django.contrib.auth.hashers import make_password
+    from django.contrib.auth.models import User
+    from django.utils import timezone
+    from .models import UserProfile
+
+    rng = rng or random.Random(0)
+    # Hashing once keeps this fast; every user still logs in with SYNTHETIC_PASSWORD
+    password = make_password(SYNTHETIC_PASSWORD)
+    now = timezone.now()
+    pks = []
+    for batch in _batches(range(count), batch_size):
+        users = User.objects.bulk_create([
+            User(
+                username=f'{prefix}_{i}',
+                email=f'{prefix}_{i}@example.com',
+                password=password,
+                date_joined=_past_timestamp(rng, now),
+            )
+            for i in batch
+        ])
+        # bulk_create skips the post_save signal that normally creates profiles
+        UserProfile.objects.bulk_create([UserProfile(user=user) for user in users])
+        pks.extend(user.pk for user in users)
+    return pks
+
+
+def create_beats(count, assets=(), producer=None, waveforms=False, rng=None, batch_size=5000):
+    """Bulk-create beats, cycling through ``assets`` for their files; returns their pks"""
+    from django.utils import timezone
+    from .models import Beat
+
+    rng = rng or random.Random(0)
+    genres, genre_weights = _weighted([(genre, share) for genre, (share, _) in GENRES.items()])
+    mp3_prices, mp3_weights = _weighted(MP3_PRICES)
+    wav_prices, wav_weights = _weighted(WAV_PRICES)
+    stems_prices, stems_weights = _weighted(STEMS_PRICES)
+    waveform_pool = [synthetic_waveform(rng) for _ in range(WAVEFORM_POOL_SIZE)] if waveforms else []
+    now = timezone.now()
+
+    def build(i):
+        genre = rng.choices(genres, cum_weights=genre_weights)[0]
+        mean, spread = GENRES[genre][1]
+        files = dict(assets[i % len(assets)]) if assets else {}
+        has_wav = rng.random() < WAV_SHARE
+        has_stems = rng.random() < STEMS_SHARE
+        if not has_wav:
+            files.pop('wav_file', None)
+        if not has_stems:
+            files.pop('stems_file', None)
+        return Beat(
+            name=f'{rng.choice(NAME_ADJECTIVES)} {rng.choice(NAME_NOUNS)} {i}',
+            genre=genre,
+            bpm=min(180, max(60, round(rng.gauss(mean, spread)))),
+            scale=rng.choice(MINOR_SCALES if rng.random() < MINOR_SHARE else MAJOR_SCALES),
+            mp3_price=rng.choices(mp3_prices, cum_weights=mp3_weights)[0],
+            wav_price=rng.choices(wav_prices, cum_weights=wav_weights)[0] if has_wav else None,
+            stems_price=rng.choices(stems_prices, cum_weights=stems_weights)[0] if has_stems else None,
+            waveform_peaks=waveform_pool[i % len(waveform_pool)] if waveform_pool else None,
+            uploaded_by_id=producer,
+            created_at=_past_timestamp(rng, now),
+            **files,
+        )
+
+    pks = []
+    with manual_timestamps(Beat):
+        for batch in _batches(range(count), batch_size):
+            pks.extend(beat.pk for beat in Beat.objects.bulk_create([build(i) for i in batch]))
+    return pks
+
+
+def create_purchases(count, user_ids, beat_ids, rng=None, batch_size=5000):
+    """Bulk-create purchases over distinct (user, beat, download type) triples.
+
+    Popular beats and heavy buyers get most purchases (Zipf-distributed), and
+    a beat is only bought in formats it is sold in. Returns the number created.
+    """
+    from django.utils import timezone
+    from .models import Beat, Purchase
+
+    rng = rng or random.Random(0)
+    if not user_ids or not beat_ids:
+        return 0
+
+    prices = {
+        row['pk']: row
+        for row in Beat.objects.filter(pk__in=beat_ids).values('pk', 'mp3_price', 'wav_price', 'stems_price').iterator()
+    }
+    # Shuffle so popularity doesn't simply follow insertion order
+    beats = list(beat_ids)
+    users = list(user_ids)
+    rng.shuffle(beats)
+    rng.shuffle(users)
+    beat_weights = _zipf_cumulative(len(beats), BEAT_POPULARITY_SKEW)
+    user_weights = _zipf_cumulative(len(users), BUYER_ACTIVITY_SKEW)
+    download_types, type_weights = _weighted(DOWNLOAD_TYPES)
+    statuses, status_weights = _weighted(PAYMENT_STATUSES)
+    count = min(count, len(users) * len(beats))
+    now = timezone.now()
+
+    seen = set()
+    attempts = 0
+    max_attempts = count * 20
+
+    def generate():
+        nonlocal attempts
+        created = 0
+        while created < count and attempts < max_attempts:
+            attempts += 1
+            user = users[bisect.bisect_left(user_weights, rng.random() * user_weights[-1])]
+            beat = beats[bisect.bisect_left(beat_weights, rng.random() * beat_weights[-1])]
+            download_type = rng.choices(download_types, cum_weights=type_weights)[0]
+            price = prices[beat][f'{download_type}_price']
+            if price is None or (user, beat, download_type) in seen:
+                continue
+            seen.add((user, beat, download_type))
+            created += 1
+            created_at = _past_timestamp(rng, now)
+            yield Purchase(
+                user_id=user,
+                beat_id=beat,
+                download_type=download_type,
+                price_paid=price,
+                payment_status=rng.choices(statuses, cum_weights=status_weights)[0],
+                created_at=created_at,
+                updated_at=created_at,
+            )
+
+    total = 0
+    with manual_timestamps(Purchase):
+        for batch in _batches(generate(), batch_size):
+            Purchase.objects.bulk_create(batch)
+            total += len(batch)
+    return total
+
+
+def create_producer(prefix=DEFAULT_PREFIX):
+    """Return the pk of the staff account synthetic beats are uploaded by"""
+    from django.contrib.auth.models import User
+
+    producer, _ = User.objects.get_or_create(
+        username=f'{prefix}_producer',
+        defaults={'email': f'{prefix}_producer@example.com', 'is_staff': True},
+    )
+    return producer.pk
+
+
+def seed(beats, users, purchases, assets=0, waveforms=False, storage=None, prefix=DEFAULT_PREFIX,
+         seed=0, batch_size=5000, progress=None):
+    """Create a full synthetic dataset.
+
+    ``progress`` is called with a message after each stage. Returns a dict
+    with the created user_ids, beat_ids and purchase count.
+    """
+    rng = random.Random(seed)
+    report = progress or (lambda message: None)
+
+    files = []
+    if assets:
+        from django.core.files.storage import default_storage
+
+        files = create_assets(storage or default_storage, assets)
+        report(f'Wrote {len(files)} asset set(s)')
+    user_ids = create_users(users, prefix, rng, batch_size)
+    report(f'Created {len(user_ids)} user(s)')
+    beat_ids = create_beats(beats, files, create_producer(prefix), waveforms, rng, batch_size)
+    report(f'Created {len(beat_ids)} beat(s)')
+    purchase_count = create_purchases(purchases, user_ids, beat_ids, rng, batch_size)
+    report(f'Created {purchase_count} purchase(s)')
+    return {'user_ids': user_ids, 'beat_ids': beat_ids, 'purchases': purchase_count}
+
+
+def clear(prefix=DEFAULT_PREFIX):
+    """Delete every synthetic user, their purchases and the beats they uploaded.
+
+    Returns the number of rows deleted. Files written by create_assets() are
+    left in storage.
+    """
+    from django.contrib.auth.models import User
+    from .models import Beat
+
+    users = User.objects.filter(username__startswith=f'{prefix}_')
+    beats_deleted, _ = Beat.objects.filter(uploaded_by__in=users).delete()
+    # Purchases and profiles cascade from their users
+    users_deleted, _ = users.delete()
+    return beats_deleted + users_deleted
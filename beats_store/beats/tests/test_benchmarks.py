@@ -0,0 +1,48 @@
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import SimpleTestCase
+from beats.management.commands.benchmark_api import ENDPOINTS, _percentile, _summarize
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+
+class BenchmarkApiTests(SimpleTestCase):
+
+    def test_summary(self):
+        self.assertEqual(_percentile([1, 2, 3, 4], 50), 2)
+        self.assertEqual(_percentile([1, 2, 3, 4], 99), 4)
+        self.assertEqual(_percentile([], 50), 0.0)
+
+        result = _summarize([(0.001, 200), (0.003, 200), (0.002, 404)], elapsed=0.5, peak_rss_kb=None)
+        self.assertEqual(result['status_codes'], {'200': 2, '404': 1})
+        self.assertEqual(result['errors'], 1)
+        self.assertEqual(result['p50_ms'], 2.0)
+        self.assertEqual(result['throughput_rps'], 6.0)
+
+    def test_unknown_endpoints_are_rejected(self):
+        with self.assertRaisesMessage(CommandError, 'Unknown endpoint(s): search'):
+            call_command('benchmark_api', '--endpoints', 'catalog,search')
+
+    def test_smoke(self):
+        # A separate process: the command creates and destroys its own test database
+        work_dir = tempfile.mkdtemp(prefix='beats-benchmark-test-')
+        self.addCleanup(shutil.rmtree, work_dir, ignore_errors=True)
+        output = os.path.join(work_dir, 'results.json')
+        subprocess.run(
+            [sys.executable, 'manage.py', 'benchmark_api', '--beats', '5', '--users', '3', '--purchases', '5',
+             '--assets', '1', '--requests', '2', '--warmup', '0', '--output', output],
+            cwd=settings.BASE_DIR, check=True, capture_output=True, timeout=300,
+        )
+        with open(output) as f:
+            report = json.load(f)
+        self.assertEqual(report['mode'], 'test-client')
+        self.assertEqual(list(report['endpoints']), ENDPOINTS)
+        for endpoint, result in report['endpoints'].items():
+            with self.subTest(endpoint):
+                self.assertEqual(result['requests'], 2)
+                self.assertEqual(result['errors'], 0, result['status_codes'])
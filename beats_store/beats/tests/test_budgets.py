@@ -0,0 +1,387 @@
+"""
+Query-count and latency budgets for every endpoint.
+
+Each request in BUDGETS is sent against a small seeded catalog, the catalog
+is grown tenfold, and the request is sent again. A test fails when:
+
+- an endpoint runs more queries than its budget,
+- its query count changes with the size of the data (a per-row query), or
+- it takes longer than its latency ceiling on the larger catalog.
+
+Failures list the offending query shapes (see beats.queries). When a change
+legitimately adds a query, raise the endpoint's budget in the same commit.
+
+Latency ceilings are deliberately loose so they only catch order-of-magnitude
+regressions; set LATENCY_BUDGET_SCALE (e.g. 3) on slow CI machines.
+"""
+
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import URLPattern, URLResolver, get_resolver, resolve
+from rest_framework_simplejwt.tokens import RefreshToken
+from types import SimpleNamespace
+from unittest import mock
+from beats import resumable, synthetic
+from beats.models import Beat, Purchase, RequestProfile, ResumableUpload
+from beats.queries import analyze_queries
+from beats.uploads import create_ticket, upload_key
+import hashlib
+import hmac
+import io
+import json
+import os
+import random
+import shutil
+import tempfile
+import time
+
+# Rows of each kind in the small catalog; the large one has GROWTH times as many
+SMALL = 5
+GROWTH = 10
+
+LATENCY_SCALE = float(os.environ.get('LATENCY_BUDGET_SCALE', '1'))
+
+WEBHOOK_SECRET = 'whsec_budget'
+
+# label -> (maximum queries, latency ceiling in ms)
+BUDGETS = {
+    'GET root redirect': (0, 50),
+    'GET api-root': (0, 50),
+    'GET beat-list': (1, 250),
+    'POST beat-list': (2, 250),
+    'GET beat-detail': (1, 100),
+    'PATCH beat-detail': (3, 100),
+    'DELETE beat-detail': (5, 100),
+    'POST beat-upload': (2, 50),
+    'POST beat-finalize-upload': (4, 100),
+    'POST direct_upload': (0, 100),
+    'POST resumable_uploads': (3, 100),
+    'GET resumable_upload': (2, 50),
+    'PATCH resumable_upload': (5, 100),
+    'POST resumable_upload_finalize': (7, 100),
+    'GET beat-waveform': (1, 50),
+    'GET beat-preview': (1, 50),
+    'GET beat-check-purchase': (3, 100),
+    'GET beat-download': (3, 100),
+    'POST beat-create-payment-intent': (3, 100),
+    'POST beat-confirm-payment': (6, 100),
+    'POST stripe_webhook': (9, 100),
+    'GET user_profile': (2, 100),
+    'PATCH user_profile': (6, 100),
+    'POST user_registration': (7, 100),
+    'POST token_obtain_pair': (4, 100),
+    'POST token_refresh': (1, 50),
+    'GET schema': (0, 50),
+    'GET swagger-ui': (0, 50),
+    'GET redoc': (0, 50),
+    'GET metrics': (2, 100),
+    'GET media': (0, 50),
+    'GET admin_logout': (4, 100),
+    'GET admin:login': (0, 100),
+    'GET admin:index': (5, 250),
+    'GET admin:auth_user_changelist': (8, 500),
+    'GET admin:auth_group_changelist': (7, 250),
+    'GET admin:beats_beat_changelist': (11, 500),
+    'GET admin:beats_beat_change': (8, 500),
+    'GET admin:beats_purchase_changelist': (8, 500),
+    'GET admin:beats_purchase_change': (11, 500),
+    'GET admin:beats_userprofile_changelist': (7, 500),
+    'GET admin:beats_stripewebhookevent_changelist': (8, 250),
+    'GET admin:beats_requestprofile_changelist': (8, 250),
+    'GET admin:beats_requestprofile_download': (3, 100),
+}
+
+
+def _stripe_signature(payload):
+    timestamp = int(time.time())
+    signature = hmac.new(
+        WEBHOOK_SECRET.encode('utf-8'), f'{timestamp}.{payload}'.encode('utf-8'), hashlib.sha256,
+    ).hexdigest()
+    return f't={timestamp},v1={signature}'
+
+
+def _leaf_patterns(resolver, namespace=None):
+    """Yield (namespace, pattern) for every view reachable from ``resolver``"""
+    for pattern in resolver.url_patterns:
+        if isinstance(pattern, URLResolver):
+            yield from _leaf_patterns(pattern, pattern.namespace or namespace)
+        elif isinstance(pattern, URLPattern):
+            yield namespace, pattern
+
+
+_media_root = tempfile.mkdtemp(prefix='beats-budget-')
+
+
+@override_settings(
+    MEDIA_ROOT=_media_root,
+    OPENAPI_SCHEMA_DIR=os.path.join(_media_root, 'openapi'),
+    STRIPE_SECRET_KEY='sk_test_budget',
+    STRIPE_WEBHOOK_SECRET=WEBHOOK_SECRET,
+    # Budgets measure our code, not PBKDF2
+    PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+    # The admin templates reference the manifest built by collectstatic
+    STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage',
+)
+class EndpointBudgetTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'pw')
+        call_command('build_schema', verbosity=0, stdout=io.StringIO())
+        cls.assets = synthetic.create_assets(default_storage, 1)
+        cls.rng = random.Random(0)
+        cls.fresh_id = cls._add_rows('small', SMALL)[-1]
+        cls.buyer = User.objects.filter(username__startswith='small_').order_by('pk').first()
+        RequestProfile.objects.create(
+            user=cls.admin, method='GET', path='/api/beats/', status_code=200, duration_ms=10,
+            format='cprofile', data=b'profile',
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(_media_root, ignore_errors=True)
+
+    @classmethod
+    def _add_rows(cls, prefix, count):
+        user_ids = synthetic.create_users(count, prefix, cls.rng)
+        beat_ids = synthetic.create_beats(count, cls.assets, cls.admin.pk, waveforms=True, rng=cls.rng)
+        synthetic.create_purchases(count * 4, user_ids, beat_ids, cls.rng)
+        return beat_ids
+
+    # Requests
+
+    def _requests(self, phase):
+        """Yield (label, method, path, kwargs) for one request to every endpoint.
+
+        ``phase`` keeps usernames and Stripe ids distinct between the two runs.
+        """
+        beat = Beat.objects.order_by('pk').first()
+        # The newest seeded beat, which the buyer is made not to own yet
+        fresh = Beat.objects.get(pk=self.fresh_id)
+        Purchase.objects.filter(user=self.buyer, beat__in=[beat, fresh]).delete()
+        Purchase.objects.create(
+            user=self.buyer, beat=beat, download_type='mp3', price_paid=beat.mp3_price,
+            payment_status='completed',
+        )
+        scratch = Beat.objects.create(name=f'Scratch {phase}', genre='Trap', bpm=140, scale='C Minor',
+                                      mp3_price='19.99', mp3_file=self.assets[0]['mp3_file'])
+        purchase = Purchase.objects.filter(user=self.buyer).first()
+        profile = RequestProfile.objects.first()
+        buyer = self._jwt(self.buyer)
+        # The beat API only accepts JWTs, not the admin session
+        staff = self._jwt(self.admin)
+        webhook = json.dumps({
+            'id': f'evt_budget_{phase}',
+            'object': 'event',
+            'type': 'payment_intent.succeeded',
+            'data': {'object': {
+                'id': f'pi_budget_{phase}',
+                'object': 'payment_intent',
+                'amount': 14999,
+                'metadata': {'user_id': str(self.buyer.pk), 'beat_id': str(fresh.pk), 'download_type': 'wav'},
+            }},
+        })
+        upload = SimpleUploadedFile(f'budget_{phase}.mp3', synthetic.silent_mp3(), content_type='audio/mpeg')
+        # One ticket whose file is already stored, one for the direct upload itself
+        uploaded = create_ticket(scratch, 'wav_file', f'budget_{phase}.wav', 'audio/wav', None)
+        default_storage.save(uploaded['key'], ContentFile(synthetic.silent_wav()))
+        direct = create_ticket(scratch, 'wav_file', f'direct_{phase}.wav', 'audio/wav', None)
+        stems = synthetic.stems_zip()
+        pending = self._resumable_upload(scratch, stems)
+        received = self._resumable_upload(scratch, stems, received=True)
+
+        yield 'GET root redirect', 'get', '/', {}
+        yield 'GET api-root', 'get', '/api/', {}
+        yield 'GET beat-list', 'get', '/api/beats/', {}
+        yield 'POST beat-list', 'post', '/api/beats/', {
+            'data': {'name': f'Upload {phase}', 'genre': 'Trap', 'bpm': 140, 'scale': 'C Minor',
+                     'mp3_price': '19.99', 'mp3_file': upload},
+            **staff,
+        }
+        yield 'GET beat-detail', 'get', f'/api/beats/{beat.pk}/', {}
+        yield 'PATCH beat-detail', 'patch', f'/api/beats/{scratch.pk}/', {
+            'data': {'name': f'Renamed {phase}'}, 'content_type': 'application/json', **staff,
+        }
+        yield 'POST beat-upload', 'post', f'/api/beats/{scratch.pk}/upload/', {
+            'data': {'field': 'wav_file', 'filename': f'budget_{phase}.wav', 'content_type': 'audio/wav'},
+            'content_type': 'application/json', **staff,
+        }
+        yield 'POST direct_upload', 'post', '/api/uploads/direct/', {
+            'data': {'key': direct['key'], 'Content-Type': 'audio/wav', 'policy': direct['token'],
+                     'file': SimpleUploadedFile('direct.wav', synthetic.silent_wav(), content_type='audio/wav')},
+        }
+        yield 'POST beat-finalize-upload', 'post', f'/api/beats/{scratch.pk}/finalize_upload/', {
+            'data': {'token': uploaded['token']}, 'content_type': 'application/json', **staff,
+        }
+        yield 'POST resumable_uploads', 'post', '/api/uploads/', {
+            'data': {'beat': scratch.pk, 'field': 'stems_file', 'filename': f'stems_{phase}.zip',
+                     'content_type': 'application/zip', 'size': len(stems)},
+            'content_type': 'application/json', **staff,
+        }
+        yield 'GET resumable_upload', 'get', f'/api/uploads/{pending.pk}/', staff
+        yield 'PATCH resumable_upload', 'patch', f'/api/uploads/{pending.pk}/', {
+            'data': stems, 'content_type': 'application/offset+octet-stream', 'HTTP_UPLOAD_OFFSET': '0', **staff,
+        }
+        yield 'POST resumable_upload_finalize', 'post', f'/api/uploads/{received.pk}/finalize/', staff
+        yield 'DELETE beat-detail', 'delete', f'/api/beats/{scratch.pk}/', staff
+        yield 'GET beat-waveform', 'get', f'/api/beats/{beat.pk}/waveform/', {}
+        yield 'GET beat-preview', 'get', f'/api/beats/{beat.pk}/preview/', {}
+        yield 'GET beat-check-purchase', 'get', f'/api/beats/{beat.pk}/check_purchase/?type=mp3', buyer
+        yield 'GET beat-download', 'get', f'/api/beats/{beat.pk}/download/?type=mp3', buyer
+        yield 'POST beat-create-payment-intent', 'post', f'/api/beats/{fresh.pk}/create_payment_intent/', {
+            'data': {'download_type': 'mp3'}, 'content_type': 'application/json', **buyer,
+        }
+        yield 'POST beat-confirm-payment', 'post', f'/api/beats/{fresh.pk}/confirm_payment/', {
+            'data': {'payment_intent_id': f'pi_confirm_{phase}', 'download_type': 'mp3'},
+            'content_type': 'application/json', **buyer,
+        }
+        yield 'POST stripe_webhook', 'post', '/api/stripe/webhook/', {
+            'data': webhook, 'content_type': 'application/json',
+            'HTTP_STRIPE_SIGNATURE': _stripe_signature(webhook),
+        }
+        yield 'GET user_profile', 'get', '/api/users/profile/', buyer
+        yield 'PATCH user_profile', 'patch', '/api/users/profile/', {
+            'data': {'first_name': f'Buyer {phase}'}, 'content_type': 'application/json', **buyer,
+        }
+        yield 'POST user_registration', 'post', '/api/users/register/', {
+            'data': {'username': f'new_{phase}', 'email': f'new_{phase}@example.com',
+                     'password': 'budget-password-1', 'password_confirm': 'budget-password-1'},
+            'content_type': 'application/json',
+        }
+        yield 'POST token_obtain_pair', 'post', '/api/token/', {
+            'data': {'username': self.buyer.username, 'password': synthetic.SYNTHETIC_PASSWORD},
+            'content_type': 'application/json',
+        }
+        yield 'POST token_refresh', 'post', '/api/token/refresh/', {
+            'data': {'refresh': str(RefreshToken.for_user(self.buyer))}, 'content_type': 'application/json',
+        }
+        yield 'GET schema', 'get', '/api/schema/', {}
+        yield 'GET swagger-ui', 'get', '/api/docs/', {}
+        yield 'GET redoc', 'get', '/api/redoc/', {}
+        yield 'GET metrics', 'get', '/metrics', {'client': 'admin'}
+        yield 'GET media', 'get', f"/media/{self.assets[0]['cover_art']}", {}
+        yield 'GET admin:login', 'get', '/admin/login/', {}
+        yield 'GET admin:index', 'get', '/admin/', {'client': 'admin'}
+        for model in ('auth/user', 'auth/group', 'beats/beat', 'beats/purchase', 'beats/userprofile',
+                      'beats/stripewebhookevent', 'beats/requestprofile'):
+            app_label, model_name = model.split('/')
+            yield f'GET admin:{app_label}_{model_name}_changelist', 'get', f'/admin/{model}/', {'client': 'admin'}
+        yield 'GET admin:beats_beat_change', 'get', f'/admin/beats/beat/{beat.pk}/change/', {'client': 'admin'}
+        yield 'GET admin:beats_purchase_change', 'get', f'/admin/beats/purchase/{purchase.pk}/change/', {
+            'client': 'admin',
+        }
+        yield 'GET admin:beats_requestprofile_download', 'get', f'/admin/beats/requestprofile/{profile.pk}/download/', {
+            'client': 'admin',
+        }
+        # Last, since it ends the admin session
+        yield 'GET admin_logout', 'get', '/admin/logout/', {'client': 'admin'}
+
+    def _resumable_upload(self, beat, content, received=False):
+        upload = ResumableUpload(
+            user=self.admin, beat=beat, field='stems_file', content_type='application/zip', size=len(content),
+            key=upload_key(Beat._meta.get_field('stems_file'), 'stems.zip'),
+        )
+        resumable.start(upload)
+        if received:
+            resumable.write_chunk(upload, io.BytesIO(content), len(content))
+        upload.save()
+        return upload
+
+    def _jwt(self, user):
+        return {'HTTP_AUTHORIZATION': f'Bearer {RefreshToken.for_user(user).access_token}'}
+
+    def _measure(self, phase):
+        """Send every request once; returns label -> (status code, analyzer, seconds)"""
+        admin_client = Client()
+        admin_client.force_login(self.admin)
+        clients = {'anonymous': Client(), 'admin': admin_client}
+        intent = SimpleNamespace(
+            id='pi_budget', client_secret='pi_budget_secret', status='succeeded', amount=1999,
+            metadata={'download_type': 'mp3'},
+        )
+        results = {}
+        with mock.patch('stripe.PaymentIntent.create', return_value=intent), \
+                mock.patch('stripe.PaymentIntent.retrieve', return_value=intent):
+            for label, method, path, kwargs in self._requests(phase):
+                client = clients[kwargs.pop('client', 'anonymous')]
+                with analyze_queries(slow_ms=0) as analyzer:
+                    started = time.perf_counter()
+                    response = getattr(client, method)(path, **kwargs)
+                    if getattr(response, 'streaming', False):
+                        b''.join(response.streaming_content)
+                    elapsed = time.perf_counter() - started
+                results[label] = (response.status_code, analyzer, elapsed)
+        return results
+
+    # Tests
+
+    def test_budgets(self):
+        # Fill per-process caches (content types, URL resolvers) before counting
+        self._measure('warmup')
+        small = self._measure('small')
+        self.fresh_id = self._add_rows('large', SMALL * (GROWTH - 1))[-1]
+        large = self._measure('large')
+
+        for label, (max_queries, max_ms) in BUDGETS.items():
+            with self.subTest(label):
+                self.assertIn(label, large, 'No request is sent for this budget')
+                status_code, analyzer, elapsed = large[label]
+                _, small_analyzer, _ = small[label]
+                self.assertLess(status_code, 400, f'{label} returned {status_code}')
+                self.assertEqual(
+                    analyzer.total_count, small_analyzer.total_count,
+                    f'{label}: query count grows with the data '
+                    f'({small_analyzer.total_count} queries for {SMALL} rows, '
+                    f'{analyzer.total_count} for {SMALL * GROWTH})\n{_shape_diff(small_analyzer, analyzer)}',
+                )
+                self.assertLessEqual(
+                    analyzer.total_count, max_queries,
+                    f'{label}: {analyzer.total_count} queries, budget is {max_queries}\n{analyzer.report()}',
+                )
+                ceiling = max_ms * LATENCY_SCALE
+                self.assertLessEqual(
+                    elapsed * 1000, ceiling,
+                    f'{label}: {elapsed * 1000:.0f} ms, ceiling is {ceiling:.0f} ms\n{analyzer.report()}',
+                )
+
+    def test_every_endpoint_has_a_budget(self):
+        budgeted = {label.split(' ', 1)[1] for label in BUDGETS}
+        # The root redirect is the only unnamed route
+        budgeted.add(None)
+        budgeted.discard('root redirect')
+        missing = set()
+        for namespace, pattern in _leaf_patterns(get_resolver()):
+            if namespace == 'admin':
+                continue
+            if pattern.name not in budgeted:
+                missing.add(pattern.name or str(pattern.pattern))
+        # Admin views are generated per model; require each model's changelist
+        for model in admin.site._registry:
+            name = f'admin:{model._meta.app_label}_{model._meta.model_name}_changelist'
+            if name not in budgeted:
+                missing.add(name)
+        self.assertFalse(missing, f'Endpoints without a budget: {sorted(missing)}')
+
+    def test_budget_labels_match_their_urls(self):
+        for label, _, path, _ in self._requests('labels'):
+            with self.subTest(label):
+                match = resolve(path.split('?')[0])
+                name = label.split(' ', 1)[1]
+                self.assertEqual(match.view_name if match.url_name else 'root redirect', name)
+
+
+def _shape_diff(before, after):
+    """Describe the query shapes whose counts differ between two analyzers"""
+    lines = []
+    for shape in sorted(set(before.shapes) | set(after.shapes)):
+        old = before.shapes.get(shape, {}).get('count', 0)
+        new = after.shapes.get(shape, {}).get('count', 0)
+        if old != new:
+            lines.append(f'  {old:4d} -> {new:4d}  {shape}')
+    return '\n'.join(lines)
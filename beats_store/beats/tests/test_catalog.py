@@ -0,0 +1,61 @@
+from django.contrib.auth.models import User
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, override_settings
+from beats.models import Beat, Purchase
+from beats.synthetic import SYNTHETIC_PASSWORD
+import io
+import shutil
+import tempfile
+
+_media_root = tempfile.mkdtemp(prefix='beats-catalog-')
+
+
+@override_settings(MEDIA_ROOT=_media_root, DEBUG=True)
+class GenerateCatalogTests(TestCase):
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(_media_root, ignore_errors=True)
+
+    def generate(self, *args):
+        out = io.StringIO()
+        call_command('generate_catalog', '--beats', '20', '--users', '5', '--purchases', '30',
+                     '--batch-size', '7', '--noinput', *args, stdout=out)
+        return out.getvalue()
+
+    def test_smoke(self):
+        output = self.generate('--assets', '1', '--waveforms')
+        self.assertIn('Created 20 beats, 5 users and', output)
+
+        producer = User.objects.get(username='synthetic_producer')
+        self.assertEqual(Beat.objects.filter(uploaded_by=producer).count(), 20)
+        self.assertEqual(User.objects.filter(username__startswith='synthetic_').count(), 6)
+        self.assertTrue(User.objects.get(username='synthetic_1').check_password(SYNTHETIC_PASSWORD))
+        self.assertTrue(0 < Purchase.objects.count() <= 30)
+        self.assertFalse(Purchase.objects.filter(user=producer).exists())
+
+        beat = Beat.objects.exclude(mp3_file='').first()
+        self.assertIsNotNone(beat.waveform_peaks)
+        self.assertTrue(default_storage.exists(beat.mp3_file.name))
+
+    def test_existing_data_needs_clear(self):
+        self.generate('--prefix', 'bench')
+        with self.assertRaisesMessage(CommandError, '--clear'):
+            self.generate('--prefix', 'bench')
+
+        self.generate('--prefix', 'bench', '--clear')
+        self.assertEqual(Beat.objects.count(), 20)
+        self.assertEqual(User.objects.filter(username__startswith='bench_').count(), 6)
+
+    def test_arguments_are_checked(self):
+        with self.assertRaisesMessage(CommandError, '--beats cannot be negative'):
+            self.generate('--beats', '-1')
+        with self.assertRaisesMessage(CommandError, 'Purchases need at least one beat and one user'):
+            self.generate('--users', '0')
+        with override_settings(DEBUG=False):
+            with self.assertRaisesMessage(CommandError, 'pass --force'):
+                self.generate()
+        self.assertFalse(Beat.objects.exists())
@@ -0,0 +1,72 @@
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.test import SimpleTestCase, override_settings
+from beats import diskcache
+import os
+import shutil
+import tempfile
+import time
+
+_cache_dir = tempfile.mkdtemp(prefix='beats-diskcache-')
+
+
+@override_settings(MEDIA_CACHE_DIR=_cache_dir, MEDIA_CACHE_MAX_BYTES=1000)
+class DiskCacheTests(SimpleTestCase):
+
+    def setUp(self):
+        # Local storage stands in for S3: entries are validated by mtime and size instead of ETag
+        self.storage = FileSystemStorage(location=tempfile.mkdtemp(prefix='beats-diskcache-media-'))
+        self.addCleanup(shutil.rmtree, self.storage.location, ignore_errors=True)
+        self.addCleanup(shutil.rmtree, _cache_dir, ignore_errors=True)
+
+    def store(self, name, content):
+        return self.storage.save(name, ContentFile(content))
+
+    def test_read_through_and_validation(self):
+        name = self.store('beats/track.mp3', b'a' * 100)
+        path = diskcache.get(self.storage, name)
+        self.assertTrue(path.startswith(_cache_dir) and path.endswith('.mp3'))
+        self.assertEqual(diskcache.get(self.storage, name), path)
+        with diskcache.open_cached(self.storage, name) as f:
+            self.assertEqual(f.read(), b'a' * 100)
+
+        # A replaced file is a different entry
+        with open(self.storage.path(name), 'wb') as f:
+            f.write(b'b' * 120)
+        os.utime(self.storage.path(name), (time.time() + 10, time.time() + 10))
+        self.assertIsNone(diskcache.get(self.storage, name, fill=False))
+        with open(diskcache.get(self.storage, name), 'rb') as f:
+            self.assertEqual(f.read(), b'b' * 120)
+
+        with self.assertRaises(FileNotFoundError):
+            diskcache.get(self.storage, 'beats/missing.mp3')
+        # Too large for a quarter of the cache
+        self.assertIsNone(diskcache.get(self.storage, self.store('beats/big.wav', bytes(300))))
+
+    def test_least_recently_used_entries_are_evicted(self):
+        paths = []
+        for i in range(4):
+            paths.append(diskcache.get(self.storage, self.store(f'covers/{i}.png', bytes(200))))
+            # Distinct ages, oldest first
+            os.utime(paths[-1], (time.time() - 100 + i, time.time() - 100 + i))
+        diskcache.get(self.storage, 'covers/0.png')
+
+        diskcache.get(self.storage, self.store('covers/4.png', bytes(250)))
+        # 1050 bytes cached: evicted down to 900, the oldest unused entry first
+        self.assertEqual([os.path.exists(path) for path in paths], [True, False, True, True])
+
+    def test_checkout_survives_eviction(self):
+        name = self.store('beats/track.mp3', b'ID3' * 10)
+        link = diskcache.checkout(self.storage, name, suffix='.mp3')
+        self.addCleanup(os.unlink, link)
+        os.remove(diskcache.get(self.storage, name))
+        with open(link, 'rb') as f:
+            self.assertEqual(f.read(), b'ID3' * 10)
+
+    @override_settings(MEDIA_CACHE_DIR='')
+    def test_disabled(self):
+        name = self.store('beats/track.mp3', b'x')
+        self.assertIsNone(diskcache.get(self.storage, name))
+        self.assertFalse(diskcache.enabled(self.storage))
+        with diskcache.open_file(self.storage, name) as f:
+            self.assertEqual(f.read(), b'x')
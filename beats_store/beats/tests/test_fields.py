@@ -0,0 +1,55 @@
+from unittest import mock
+from django.test import TestCase
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from beats.models import Beat
+from beats.serializers import BeatListSerializer, BeatSerializer
+
+
+class SparseFieldsetTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.beat = Beat.objects.bulk_create([
+            Beat(name='Track', genre='Trap', bpm=140, scale='C Minor', mp3_file='beats/track.mp3',
+                 cover_art='covers/track.png'),
+        ])[0]
+
+    def test_fields_limits_list_and_detail(self):
+        rows = self.client.get('/api/beats/?fields=id,name,bogus').json()
+        self.assertEqual(rows, [{'id': self.beat.pk, 'name': 'Track'}])
+
+        detail = self.client.get(f'/api/beats/{self.beat.pk}/?fields= name , bpm').json()
+        self.assertEqual(detail, {'name': 'Track', 'bpm': 140})
+
+    def test_omit_drops_fields(self):
+        row = self.client.get('/api/beats/?omit=mp3_file,cover_art').json()[0]
+        self.assertNotIn('mp3_file', row)
+        self.assertNotIn('cover_art', row)
+        self.assertEqual(row['name'], 'Track')
+
+        detail = self.client.get(f'/api/beats/{self.beat.pk}/?fields=id,name&omit=name').json()
+        self.assertEqual(detail, {'id': self.beat.pk})
+
+    def test_dropped_method_fields_are_not_computed(self):
+        with mock.patch.object(BeatSerializer, 'get_cover_art') as get_cover_art:
+            self.client.get(f'/api/beats/{self.beat.pk}/?omit=cover_art')
+        get_cover_art.assert_not_called()
+
+    def test_writes_ignore_the_query_string(self):
+        request = Request(APIRequestFactory().post('/api/beats/?fields=id', {}))
+        fields = BeatSerializer(context={'request': request}).fields
+        self.assertIn('name', fields)
+        self.assertIn('mp3_file', fields)
+
+    def test_wants_field(self):
+        def wants(query, name):
+            request = Request(APIRequestFactory().get(f'/api/beats/?{query}'))
+            return BeatListSerializer.wants_field(request, name)
+
+        self.assertTrue(wants('', 'name'))
+        self.assertFalse(wants('', 'waveform_peaks'))
+        self.assertTrue(wants('fields=id,waveform_peaks', 'waveform_peaks'))
+        self.assertFalse(wants('fields=id,waveform_peaks&omit=waveform_peaks', 'waveform_peaks'))
+        self.assertFalse(wants('fields=id', 'name'))
+        self.assertFalse(wants('omit=name', 'name'))
@@ -0,0 +1,147 @@
+from unittest import mock
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, TestCase, override_settings
+from beats.images import COVER_VARIANT_SIZES, render_image_variants, variant_name, variant_prefix
+from beats.models import Beat
+import io
+import shutil
+import tempfile
+
+_media_root = tempfile.mkdtemp(prefix='beats-images-')
+
+
+def _image(size, mode='RGB', color=(200, 30, 30), format='PNG', **options):
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.new(mode, size, color).save(buffer, format=format, **options)
+    buffer.seek(0)
+    return buffer
+
+
+def _rotated_photo():
+    """A JPEG that is 800x400 as stored, red on the left, tagged to display rotated 90 degrees clockwise"""
+    from PIL import Image
+
+    image = Image.new('RGB', (800, 400), (0, 0, 255))
+    image.paste((255, 0, 0), (0, 0, 400, 400))
+    exif = Image.Exif()
+    exif[0x0112] = 6  # Orientation: rotate 90 CW
+    exif[0x010F] = 'PhoneCam'  # Make
+    buffer = io.BytesIO()
+    image.save(buffer, format='JPEG', exif=exif.tobytes())
+    return buffer.getvalue()
+
+
+def _open(data):
+    from PIL import Image
+
+    return Image.open(io.BytesIO(data))
+
+
+class CoverVariantTests(SimpleTestCase):
+
+    def test_sizes_and_formats(self):
+        rendered = render_image_variants(_image((2000, 1000)), COVER_VARIANT_SIZES)
+        self.assertEqual(set(rendered), {'thumb', 'card', 'full'})
+        for variant, edge in COVER_VARIANT_SIZES.items():
+            with self.subTest(variant):
+                webp, jpeg = _open(rendered[variant]['webp']), _open(rendered[variant]['jpeg'])
+                self.assertEqual((webp.format, jpeg.format), ('WEBP', 'JPEG'))
+                self.assertEqual(webp.size, (edge, edge // 2))
+                self.assertEqual(jpeg.size, (edge, edge // 2))
+
+    def test_small_images_are_not_upscaled(self):
+        rendered = render_image_variants(_image((300, 200)), COVER_VARIANT_SIZES, formats=('jpeg',))
+        self.assertEqual(_open(rendered['thumb']['jpeg']).size, (160, 107))
+        self.assertEqual(_open(rendered['full']['jpeg']).size, (300, 200))
+
+    def test_transparency_is_flattened_onto_white(self):
+        rendered = render_image_variants(_image((100, 100), 'RGBA', (0, 0, 0, 0)), {'x': 100}, formats=('jpeg',))
+        image = _open(rendered['x']['jpeg'])
+        self.assertEqual(image.mode, 'RGB')
+        self.assertGreater(min(image.getpixel((50, 50))), 245)
+
+    def test_variant_names_are_deterministic_per_source(self):
+        self.assertEqual(variant_name('covers/a.png', 'thumb', 'webp'),
+                         f"{variant_prefix('covers/a.png')}/thumb.webp")
+        self.assertTrue(variant_prefix('covers/a.png').startswith('covers/variants/a-'))
+        self.assertNotEqual(variant_prefix('covers/a.png'), variant_prefix('covers/a_x1y2z3w.png'))
+
+
+@override_settings(MEDIA_ROOT=_media_root)
+class CoverVariantStorageTests(TestCase):
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(_media_root, ignore_errors=True)
+
+    def test_variants_follow_the_cover(self):
+        beat = Beat(name='Track', genre='Trap', bpm=140, scale='C Minor')
+        beat.cover_art.save('cover.png', ContentFile(_image((600, 600)).getvalue()), save=False)
+        beat.save()
+        old = beat.cover_art_variants
+        self.assertEqual(set(old), {'thumb', 'card', 'full'})
+        self.assertTrue(default_storage.exists(old['thumb']['webp']))
+        self.assertEqual(_open(default_storage.open(old['card']['jpeg']).read()).size, (480, 480))
+
+        # A new cover replaces the variants of the old one
+        beat.cover_art.save('other.png', ContentFile(_image((600, 300)).getvalue()), save=False)
+        beat.save()
+        self.assertNotEqual(beat.cover_art_variants['thumb']['webp'], old['thumb']['webp'])
+        self.assertFalse(default_storage.exists(old['thumb']['webp']))
+
+        current = beat.cover_art_variants
+        beat.cover_art = None
+        beat.save()
+        self.assertIsNone(beat.cover_art_variants)
+        self.assertFalse(default_storage.exists(current['full']['jpeg']))
+
+
+class AvatarVariantTests(SimpleTestCase):
+
+    def test_orientation_is_applied_and_metadata_dropped(self):
+        rendered = render_image_variants(io.BytesIO(_rotated_photo()), {'large': 256}, square=True)
+        for extension in ('jpeg', 'webp'):
+            with self.subTest(extension):
+                image = _open(rendered['large'][extension])
+                self.assertEqual(image.size, (256, 256))
+                self.assertEqual(dict(image.getexif()), {})
+                self.assertNotIn('exif', image.info)
+        # The red half is on top once rotated
+        image = _open(rendered['large']['jpeg']).convert('RGB')
+        self.assertGreater(image.getpixel((128, 10))[0], 200)
+        self.assertGreater(image.getpixel((128, 245))[2], 200)
+
+    def test_oversized_sources_are_rejected_before_decoding(self):
+        with mock.patch('beats.images.MAX_SOURCE_PIXELS', 1000):
+            with self.assertRaises(ValueError):
+                render_image_variants(_image((100, 100)), {'small': 64})
+
+
+@override_settings(MEDIA_ROOT=_media_root)
+class AvatarUploadTests(TestCase):
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(_media_root, ignore_errors=True)
+
+    def test_upload_is_replaced_by_a_processed_photo(self):
+        profile = User.objects.create_user('listener').profile
+        profile.photo = SimpleUploadedFile('me.jpeg', _rotated_photo(), content_type='image/jpeg')
+        profile.save()
+
+        profile.refresh_from_db()
+        self.assertTrue(profile.photo.name.endswith('.jpg'))
+        with profile.photo.open('rb') as f:
+            stored = _open(f.read())
+        self.assertEqual(stored.size, (256, 256))
+        self.assertEqual(dict(stored.getexif()), {})
+        self.assertEqual(set(profile.photo_variants), {'small', 'medium', 'large'})
+        with default_storage.open(profile.photo_variants['small']['webp']) as f:
+            self.assertEqual(_open(f.read()).size, (64, 64))
@@ -0,0 +1,79 @@
+"""
+Startup import cost of a worker process.
+
+A fresh interpreter boots the WSGI application, loads the URLconf and sets up
+media storage (what a gunicorn worker does before and during its first
+request; management commands load the URLconf for their system checks) under
+``python -X importtime``. The test fails if an SDK that is only needed on
+some code paths gets imported at startup, or if startup imports take longer
+than STARTUP_BUDGET_MS. Failure messages list the slowest imports.
+"""
+
+from django.conf import settings
+from django.test import SimpleTestCase
+import os
+import re
+import subprocess
+import sys
+
+# Imported on the code paths that need them (payments, S3, audio/image processing)
+LAZY_MODULES = ('stripe', 'boto3', 'botocore', 'pydub', 'numpy', 'PIL')
+
+STARTUP_BUDGET_MS = 1500
+LATENCY_SCALE = float(os.environ.get('LATENCY_BUDGET_SCALE', '1'))
+
+BOOT_SCRIPT = (
+    'from django.core.files.storage import default_storage\n'
+    'from django.core.wsgi import get_wsgi_application\n'
+    'from django.urls import get_resolver\n'
+    'get_wsgi_application()\n'
+    'get_resolver().url_patterns\n'
+    # Serializers build media URLs on nearly every request
+    "default_storage.url('beats/example.mp3')\n"
+)
+
+_IMPORT_LINE_RE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+
+def measure_startup():
+    """Boot a worker in a subprocess; returns [(module, self us, cumulative us, depth)]"""
+    env = {key: value for key, value in os.environ.items() if not key.startswith('AWS_')}
+    env.update({'DJANGO_SETTINGS_MODULE': 'beats_store.settings', 'DEBUG': 'False'})
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', BOOT_SCRIPT],
+        cwd=settings.BASE_DIR, env=env, capture_output=True, text=True, check=True,
+    )
+    imports = []
+    for line in result.stderr.splitlines():
+        match = _IMPORT_LINE_RE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            imports.append((module, int(self_us), int(cumulative_us), len(indent) // 2))
+    return imports
+
+
+def startup_report(imports, limit=15):
+    """The slowest top-level imports as text"""
+    top_level = sorted((entry for entry in imports if entry[3] == 0), key=lambda entry: entry[2], reverse=True)
+    lines = [f'{sum(entry[1] for entry in imports) / 1000:.0f} ms importing {len(imports)} modules']
+    for module, _, cumulative_us, _ in top_level[:limit]:
+        lines.append(f'  {cumulative_us / 1000:8.1f} ms  {module}')
+    return '\n'.join(lines)
+
+
+class StartupImportTests(SimpleTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.imports = measure_startup()
+
+    def test_optional_sdks_are_not_imported_at_startup(self):
+        roots = {entry[0].split('.')[0] for entry in self.imports}
+        eager = sorted(roots & set(LAZY_MODULES))
+        self.assertFalse(eager, f'Imported at startup: {eager}\n{startup_report(self.imports)}')
+
+    def test_startup_import_time(self):
+        total_ms = sum(entry[1] for entry in self.imports) / 1000
+        budget = STARTUP_BUDGET_MS * LATENCY_SCALE
+        self.assertLessEqual(total_ms, budget, f'Over the {budget:.0f} ms budget\n{startup_report(self.imports)}')
@@ -0,0 +1,53 @@
+from unittest import mock
+from django.test import TestCase
+from beats import ingestion
+from beats.ingestion import bulk_ingestion, is_bulk_ingesting, pending_snippets
+from beats.models import Beat
+
+
+def _create(name, **files):
+    return Beat.objects.create(name=name, genre='Trap', bpm=140, scale='C Minor', **files)
+
+
+@mock.patch('beats.models.generate_snippet')
+class BulkIngestionTests(TestCase):
+
+    def test_snippets_are_queued_and_generated_on_exit(self, generate_snippet):
+        with mock.patch.object(ingestion, 'generate_pending_snippets') as generate_pending:
+            with bulk_ingestion() as pending:
+                self.assertTrue(is_bulk_ingesting())
+                beat = _create('Track', mp3_file='beats/track.mp3')
+                _create('No audio')
+                self.assertEqual(pending, {beat.pk: False})
+            generate_snippet.assert_not_called()
+            generate_pending.assert_called_once_with({beat.pk: False})
+        self.assertFalse(is_bulk_ingesting())
+
+    def test_nested_blocks_process_once_at_the_outermost_exit(self, generate_snippet):
+        with mock.patch.object(ingestion, 'generate_pending_snippets') as generate_pending:
+            with bulk_ingestion():
+                with bulk_ingestion() as inner:
+                    beat = _create('Track', mp3_file='beats/track.mp3')
+                generate_pending.assert_not_called()
+                self.assertEqual(pending_snippets(), {beat.pk: False})
+                # A replace request wins over the plain generate queued before it
+                ingestion.queue_snippet(beat.pk, replace_existing=True)
+                self.assertEqual(inner, {beat.pk: True})
+            generate_pending.assert_called_once_with({beat.pk: True})
+        self.assertEqual(pending_snippets(), {})
+
+    def test_queue_is_dropped_without_processing(self, generate_snippet):
+        with mock.patch.object(ingestion, 'generate_pending_snippets') as generate_pending:
+            with bulk_ingestion(process_on_exit=False):
+                _create('Track', mp3_file='beats/track.mp3')
+            with self.assertRaises(ValueError):
+                with bulk_ingestion():
+                    _create('Other', mp3_file='beats/other.mp3')
+                    raise ValueError
+            generate_pending.assert_not_called()
+        self.assertFalse(is_bulk_ingesting())
+        self.assertEqual(pending_snippets(), {})
+
+    def test_outside_a_block_snippets_are_generated_inline(self, generate_snippet):
+        beat = _create('Track', mp3_file='beats/track.mp3')
+        generate_snippet.assert_called_once_with(beat, replace_existing=False)
@@ -0,0 +1,130 @@
+from datetime import timedelta
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from beats import synthetic
+from beats.inventory import list_objects, referenced_names
+from beats.models import Beat, ContentBlob, ResumableUpload, UserProfile
+from beats.storage import blob_name
+import io
+import os
+import shutil
+import tempfile
+import time
+
+_media_root = tempfile.mkdtemp(prefix='beats-inventory-')
+
+
+def _age(name, days=2):
+    """Backdate a stored file's modification time"""
+    when = time.time() - days * 24 * 3600
+    os.utime(default_storage.path(name), (when, when))
+
+
+@override_settings(MEDIA_ROOT=_media_root)
+class OrphanedMediaTests(TestCase):
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(_media_root, ignore_errors=True)
+
+    def tearDown(self):
+        shutil.rmtree(_media_root, ignore_errors=True)
+
+    def collect(self, *args):
+        out = io.StringIO()
+        call_command('collect_orphaned_media', *args, stdout=out)
+        return out.getvalue()
+
+    def test_unreferenced_files_are_deleted(self):
+        kept = default_storage.save('beats/kept.mp3', ContentFile(synthetic.silent_mp3()))
+        replaced = default_storage.save('beats/replaced.mp3', ContentFile(b'old'))
+        recent = default_storage.save('beats/recent.mp3', ContentFile(b'new'))
+        variant = default_storage.save('covers/variants/x/thumb.webp', ContentFile(b'webp'))
+        beat = Beat.objects.bulk_create([
+            Beat(name='Track', genre='Trap', bpm=140, scale='C Minor', mp3_file=kept,
+                 cover_art_variants={'thumb': {'webp': variant}}),
+        ])[0]
+        upload = ResumableUpload.objects.create(
+            user=User.objects.create_user('admin'), beat=beat, field='stems_file',
+            key='beats/0123/stems.zip', content_type='application/zip', size=10,
+        )
+        part = default_storage.save(upload.key + '.part', ContentFile(b'PK'))
+        for name in (kept, replaced, variant, part):
+            _age(name)
+
+        self.assertIn('[DRY RUN] beats/replaced.mp3', self.collect('--dry-run'))
+        self.assertTrue(default_storage.exists(replaced))
+
+        output = self.collect()
+        self.assertIn('Deleted: 1 (3 bytes)', output)
+        self.assertFalse(default_storage.exists(replaced))
+        for name in (kept, recent, variant, part):
+            self.assertTrue(default_storage.exists(name), name)
+
+        with self.assertRaises(CommandError):
+            self.collect('--hours', '0.5')
+
+    def test_listing_is_paged(self):
+        for i in range(5):
+            default_storage.save(f'covers/{i}/cover.png', ContentFile(b'png'))
+        pages = list(list_objects(default_storage, 'covers/', page_size=2))
+        self.assertEqual([len(page) for page in pages], [2, 2, 1])
+        self.assertEqual({stored.name for page in pages for stored in page},
+                         {f'covers/{i}/cover.png' for i in range(5)})
+
+    @override_settings(DEFAULT_FILE_STORAGE='beats.storage.ContentAddressedFileSystemStorage')
+    def test_content_addressed_objects(self):
+        kept = default_storage.save('beats/kept.wav', ContentFile(synthetic.silent_wav(seconds=1)))
+        dropped = default_storage.save('beats/dropped.wav', ContentFile(synthetic.silent_wav(seconds=2)))
+        Beat.objects.bulk_create([Beat(name='Track', genre='Trap', bpm=140, scale='C Minor', mp3_file=kept)])
+        self.assertIn(blob_name(kept), referenced_names())
+        for name in (kept, dropped):
+            _age(name)
+
+        # Referenced again just now by a save of the same content
+        ContentBlob.objects.update(updated_at=timezone.now() - timedelta(days=2))
+        ContentBlob.objects.filter(name=blob_name(dropped)).update(updated_at=timezone.now())
+        self.collect()
+        self.assertTrue(default_storage.exists(dropped))
+
+        ContentBlob.objects.update(updated_at=timezone.now() - timedelta(days=2))
+        self.collect()
+        self.assertFalse(default_storage.exists(dropped))
+        self.assertTrue(default_storage.exists(kept))
+        self.assertEqual(list(ContentBlob.objects.values_list('name', flat=True)), [blob_name(kept)])
+
+    def test_audit_reports_missing_empty_and_resized_files(self):
+        mp3 = synthetic.silent_mp3()
+        names = {
+            'mp3_file': default_storage.save('beats/track.mp3', ContentFile(mp3)),
+            'wav_file': 'beats/missing.wav',
+            'stems_file': default_storage.save('beats/stems.zip', ContentFile(b'')),
+            'cover_art': default_storage.save('covers/cover.png', ContentFile(synthetic.solid_png())),
+        }
+        metadata = {'mp3_file': {'name': names['mp3_file'], 'size': len(mp3) + 1}}
+        beat = Beat.objects.bulk_create([
+            Beat(name='Track', genre='Trap', bpm=140, scale='C Minor', media_metadata=metadata, **names),
+        ])[0]
+        user = User.objects.create_user('buyer')
+        UserProfile.objects.filter(user=user).update(
+            photo_variants={'small': {'jpeg': 'user-avatar/variants/x/small.jpeg'}},
+        )
+
+        out = io.StringIO()
+        with self.assertRaisesMessage(CommandError, '4 file reference(s) failed the audit'):
+            call_command('audit_media', '--workers', '3', stdout=out)
+        output = out.getvalue()
+        self.assertIn(f'beats/track.mp3 (Beat {beat.pk} mp3_file): {len(mp3)} bytes, recorded as {len(mp3) + 1}',
+                      output)
+        self.assertIn('beats/missing.wav', output)
+        self.assertIn('beats/stems.zip', output)
+        self.assertIn('user-avatar/variants/x/small.jpeg', output)
+        self.assertNotIn('covers/cover.png (', output)
+
+        call_command('audit_media', '--prefix', 'covers/', stdout=io.StringIO())
@@ -0,0 +1,116 @@
+from decimal import Decimal
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+from beats import synthetic
+from beats.metadata import describe, digest_header
+from beats.models import Beat, Purchase
+import hashlib
+import io
+import shutil
+import tempfile
+
+_media_root = tempfile.mkdtemp(prefix='beats-metadata-')
+
+
+class DescribeTests(SimpleTestCase):
+
+    def test_mp3(self):
+        content = synthetic.silent_mp3(seconds=3)
+        metadata = describe(io.BytesIO(content), 'beat.mp3')
+        self.assertEqual(metadata['size'], len(content))
+        self.assertEqual(metadata['sha256'], hashlib.sha256(content).hexdigest())
+        self.assertEqual(metadata['content_type'], 'audio/mpeg')
+        self.assertEqual(metadata['bitrate'], 128000)
+        self.assertEqual(metadata['sample_rate'], 44100)
+        self.assertAlmostEqual(metadata['duration'], 3, places=1)
+
+    def test_mp3_behind_a_large_id3_tag(self):
+        # 64 KiB of tag frames (as with embedded artwork), size as syncsafe bytes
+        tag = b'ID3\x03\x00\x00\x00\x04\x00\x00' + bytes(64 * 1024)
+        metadata = describe(io.BytesIO(tag + synthetic.silent_mp3(seconds=2)))
+        self.assertEqual(metadata['content_type'], 'audio/mpeg')
+        self.assertAlmostEqual(metadata['duration'], 2, places=1)
+
+    def test_wav(self):
+        metadata = describe(io.BytesIO(synthetic.silent_wav(seconds=2, sample_rate=22050)))
+        self.assertEqual(metadata['content_type'], 'audio/wav')
+        self.assertEqual(metadata['duration'], 2.0)
+        self.assertEqual(metadata['sample_rate'], 22050)
+        self.assertEqual(metadata['bitrate'], 22050 * 16)
+        self.assertEqual(metadata['channels'], 1)
+
+    def test_other_files(self):
+        self.assertEqual(describe(io.BytesIO(synthetic.stems_zip()))['content_type'], 'application/zip')
+        self.assertEqual(describe(io.BytesIO(b'plain text'), 'notes.txt')['content_type'], 'text/plain')
+        self.assertNotIn('duration', describe(io.BytesIO(synthetic.solid_png())))
+
+
+@override_settings(MEDIA_ROOT=_media_root)
+class MediaMetadataTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.wav = synthetic.silent_wav(seconds=1)
+        cls.buyer = User.objects.create_user('buyer', password='pw')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(_media_root, ignore_errors=True)
+
+    def create_beat(self):
+        beat = Beat(name='Track', genre='Trap', bpm=140, scale='C Minor', wav_price=Decimal('39.99'))
+        beat.wav_file.save('track.wav', ContentFile(self.wav), save=False)
+        beat.save()
+        return beat
+
+    def test_recorded_on_upload(self):
+        beat = self.create_beat()
+        beat.refresh_from_db()
+        metadata = beat.get_media_metadata('wav_file')
+        self.assertEqual(metadata['name'], beat.wav_file.name)
+        self.assertEqual(metadata['size'], len(self.wav))
+        self.assertEqual(metadata['sha256'], hashlib.sha256(self.wav).hexdigest())
+        self.assertEqual(self.client.get(f'/api/beats/{beat.pk}/').json()['media_metadata'], beat.media_metadata)
+
+        # Replaced outside a normal save: stale until the backfill runs
+        name = default_storage.save('beats/other.wav', ContentFile(synthetic.silent_wav(seconds=2)))
+        Beat.objects.filter(pk=beat.pk).update(wav_file=name)
+        beat.refresh_from_db()
+        self.assertIsNone(beat.get_media_metadata('wav_file'))
+        call_command('backfill_media_metadata', stdout=io.StringIO())
+        beat.refresh_from_db()
+        self.assertEqual(beat.get_media_metadata('wav_file')['duration'], 2.0)
+
+    @override_settings(MEDIA_METADATA_INLINE_MAX_BYTES=100)
+    def test_large_files_are_left_to_the_backfill(self):
+        beat = self.create_beat()
+        beat.refresh_from_db()
+        self.assertIsNone(beat.get_media_metadata('wav_file'))
+        call_command('backfill_media_metadata', stdout=io.StringIO())
+        beat.refresh_from_db()
+        self.assertEqual(beat.get_media_metadata('wav_file')['size'], len(self.wav))
+
+    def test_download_headers(self):
+        beat = self.create_beat()
+        Purchase.objects.create(user=self.buyer, beat=beat, download_type='wav', price_paid=Decimal('39.99'),
+                                payment_status='completed')
+        auth = {'HTTP_AUTHORIZATION': f'Bearer {RefreshToken.for_user(self.buyer).access_token}'}
+        url = f'/api/beats/{beat.pk}/download/?type=wav'
+        sha256 = hashlib.sha256(self.wav).hexdigest()
+
+        response = self.client.get(url, **auth)
+        self.assertEqual(response['ETag'], f'"{sha256}"')
+        self.assertEqual(response['Repr-Digest'], digest_header(sha256))
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=f'"{sha256}"', **auth).status_code, 304)
+
+        # A file that no longer matches its metadata is served without the checksum
+        with default_storage.open(beat.wav_file.name, 'wb') as f:
+            f.write(self.wav + b'tail')
+        response = self.client.get(url, **auth)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Repr-Digest', response)
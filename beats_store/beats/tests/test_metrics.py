@@ -0,0 +1,75 @@
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase, override_settings
+from beats.instrumentation import registry, server_timing_header, timed, track_request
+from beats.models import Beat
+
+
+class ServerTimingHeaderTests(SimpleTestCase):
+
+    def test_format(self):
+        with track_request() as timings:
+            with timed('db'):
+                with timed('db'):  # Nested calls are counted once
+                    pass
+            with timed('storage'):
+                pass
+        header = server_timing_header(timings)
+        self.assertRegex(header, r'^total;dur=[\d.]+, db;dur=[\d.]+;desc="1 queries", '
+                                 r'storage;dur=[\d.]+;desc="1 calls"$')
+
+    def test_timed_does_nothing_outside_a_request(self):
+        with timed('db'):
+            pass
+
+
+@override_settings(DEBUG=False, METRICS_TOKEN=None)
+class MetricsEndpointTests(TestCase):
+
+    def setUp(self):
+        registry.reset()
+
+    @override_settings(METRICS_TOKEN='s3cret')
+    def test_token_is_required_when_configured(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+        self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='s3cret').status_code, 403)
+        # Staff sessions don't bypass a configured token
+        self.client.force_login(User.objects.create_user('admin', is_staff=True))
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+
+        response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer s3cret')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+
+    def test_staff_only_without_a_token(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        self.client.force_login(User.objects.create_user('listener'))
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        self.client.force_login(User.objects.create_user('admin', is_staff=True))
+        self.assertEqual(self.client.get('/metrics').status_code, 200)
+
+    @override_settings(DEBUG=True)
+    def test_open_in_debug_without_a_token(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 200)
+
+    @override_settings(METRICS_TOKEN='s3cret')
+    def test_requests_are_counted_per_endpoint(self):
+        Beat.objects.create(name='Track', genre='Trap', bpm=140, scale='C Minor')
+        self.client.get('/api/beats/')
+        self.client.get('/no-such-page/')
+        body = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer s3cret').content.decode()
+        self.assertIn('beats_http_requests_total{endpoint="beat-list",method="GET",status="200"} 1', body)
+        self.assertIn('endpoint="unmatched",method="GET",status="404"', body)
+        self.assertIn('beats_dependency_calls_total{endpoint="beat-list",method="GET",dependency="db"}', body)
+
+
+class ServerTimingMiddlewareTests(TestCase):
+
+    @override_settings(SERVER_TIMING_HEADERS=True)
+    def test_header_is_added_when_enabled(self):
+        response = self.client.get('/api/beats/')
+        self.assertRegex(response['Server-Timing'], r'^total;dur=[\d.]+, db;dur=[\d.]+;desc="\d+ queries"')
+
+    @override_settings(SERVER_TIMING_HEADERS=False)
+    def test_header_is_omitted_when_disabled(self):
+        self.assertNotIn('Server-Timing', self.client.get('/api/beats/'))
@@ -0,0 +1,34 @@
+from django.test import TestCase
+from beats.models import Beat
+
+
+class LoadedValueTrackingTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        # bulk_create skips the media signals, so no files are needed
+        cls.beat = Beat.objects.bulk_create([
+            Beat(name='Track', genre='Trap', bpm=140, scale='C Minor', mp3_file='beats/track.mp3',
+                 snippet_mp3='preview-snippet/track_preview.mp3'),
+        ])[0]
+
+    def test_saving_a_loaded_beat_does_not_reread_the_row(self):
+        beat = Beat.objects.get(pk=self.beat.pk)
+        beat.name = 'Renamed'
+        with self.assertNumQueries(1):
+            beat.save()
+        self.assertFalse(beat.has_field_changed('mp3_file'))
+
+    def test_partial_save_keeps_unsaved_changes_pending(self):
+        beat = Beat.objects.get(pk=self.beat.pk)
+        beat.mp3_file = 'beats/other.mp3'
+        beat.save(update_fields=['name'])
+        self.assertFalse(beat.has_field_changed('mp3_file', update_fields=['name']))
+        self.assertTrue(beat.has_field_changed('mp3_file'))
+        self.assertEqual(beat.get_loaded_value('mp3_file'), 'beats/track.mp3')
+
+    def test_hand_built_instance_reads_the_row_once(self):
+        beat = Beat(pk=self.beat.pk, name='Track', mp3_file='beats/other.mp3')
+        with self.assertNumQueries(1):
+            self.assertTrue(beat.has_field_changed('mp3_file'))
+            self.assertFalse(beat.has_field_changed('cover_art'))
@@ -0,0 +1,71 @@
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from beats import profiling
+from beats.models import RequestProfile
+import json
+import marshal
+
+
+@override_settings(PROFILER_ENABLED=True, PROFILER_MAX_PER_HOUR=20, PROFILER_KEEP=100)
+class RequestProfilerTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user('admin', is_staff=True)
+        cls.token = profiling.make_token(cls.staff)
+
+    def get(self, token=None, path='/api/beats/?genre=Trap', **headers):
+        return self.client.get(path, HTTP_X_PROFILE_TOKEN=token or self.token, **headers)
+
+    def test_profile_is_saved(self):
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        profile = RequestProfile.objects.get()
+        self.assertEqual(response['X-Profile'], f'saved; id={profile.pk}')
+        self.assertEqual((profile.user, profile.method, profile.path, profile.format),
+                         (self.staff, 'GET', '/api/beats/?genre=Trap', 'cprofile'))
+        self.assertIsInstance(marshal.loads(bytes(profile.data)), dict)
+
+        response = self.get(HTTP_X_PROFILE_MODE='sample')
+        profile = RequestProfile.objects.get(pk=response['X-Profile'].split('=')[1])
+        self.assertEqual(profile.format, 'speedscope')
+        self.assertEqual(json.loads(bytes(profile.data))['profiles'][0]['type'], 'sampled')
+
+    def test_invalid_tokens_are_skipped(self):
+        listener = User.objects.create_user('listener')
+        for token in ('garbage', profiling.make_token(listener)):
+            with self.subTest(token=token):
+                response = self.get(token)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response['X-Profile'], 'skipped; invalid or expired token')
+
+        with override_settings(PROFILER_TOKEN_MAX_AGE=-1):
+            self.assertEqual(self.get()['X-Profile'], 'skipped; invalid or expired token')
+        self.assertFalse(RequestProfile.objects.exists())
+
+    def test_query_string_tokens_are_ignored(self):
+        response = self.client.get(f'/api/beats/?__profile={self.token}')
+        self.assertNotIn('X-Profile', response)
+        self.assertFalse(RequestProfile.objects.exists())
+
+    @override_settings(PROFILER_ENABLED=False)
+    def test_disabled(self):
+        self.assertNotIn('X-Profile', self.get())
+
+    @override_settings(PROFILER_MAX_PER_HOUR=1)
+    def test_hourly_cap(self):
+        self.assertTrue(self.get()['X-Profile'].startswith('saved'))
+        self.assertEqual(self.get()['X-Profile'], 'skipped; hourly limit reached')
+        self.assertEqual(RequestProfile.objects.count(), 1)
+
+    @override_settings(PROFILER_KEEP=2)
+    def test_old_profiles_are_pruned(self):
+        ids = [int(self.get()['X-Profile'].split('=')[1]) for _ in range(3)]
+        self.assertEqual(set(RequestProfile.objects.values_list('pk', flat=True)), set(ids[1:]))
+
+    @override_settings(PROFILER_MAX_BYTES=10)
+    def test_large_profiles_keep_only_the_summary(self):
+        self.get()
+        profile = RequestProfile.objects.get()
+        self.assertEqual(bytes(profile.data), b'')
+        self.assertTrue(profile.summary.startswith('Raw profile dropped'))
@@ -0,0 +1,106 @@
+from decimal import Decimal
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+from beats.models import Beat, Purchase, RequestProfile, StripeWebhookEvent
+from beats.queries import RepeatedQueryError, analyze_queries, normalize_sql
+
+# More rows than QUERY_REPEAT_THRESHOLD, so any per-row query trips the detector
+ROWS = 12
+
+
+class NormalizeSqlTests(TestCase):
+    def test_literals_and_in_lists_collapse(self):
+        self.assertEqual(
+            normalize_sql("SELECT * FROM t WHERE id = 12 AND name = 'it''s'   AND pk IN (%s, %s, %s)"),
+            "SELECT * FROM t WHERE id = ? AND name = ? AND pk IN (...)",
+        )
+        self.assertEqual(
+            normalize_sql('SELECT * FROM t WHERE pk IN (%s)'),
+            normalize_sql('SELECT * FROM t WHERE pk IN (%s, %s)'),
+        )
+        self.assertEqual(normalize_sql('RELEASE SAVEPOINT "s1403_x15"'), 'RELEASE SAVEPOINT ?')
+
+    def test_repeated_shapes_are_reported(self):
+        users = [User.objects.create_user(f'user{i}') for i in range(ROWS)]
+        with analyze_queries() as analyzer:
+            for user in users:
+                User.objects.get(pk=user.pk)
+        (shape, stats), = analyzer.repeated(threshold=5)
+        self.assertEqual(stats['count'], ROWS)
+
+    @override_settings(QUERY_ANALYSIS_ENABLED=True, QUERY_REPEAT_RAISE=True, QUERY_REPEAT_THRESHOLD=0)
+    def test_repeated_shapes_fail_requests(self):
+        # With a threshold of 0 the list page's single query already counts as repeated
+        with self.assertRaises(RepeatedQueryError):
+            self.client.get('/api/beats/')
+
+    @override_settings(QUERY_ANALYSIS_ENABLED=False, QUERY_REPEAT_RAISE=True, QUERY_REPEAT_THRESHOLD=0)
+    def test_analysis_can_be_disabled(self):
+        self.assertEqual(self.client.get('/api/beats/').status_code, 200)
+
+
+@override_settings(
+    QUERY_ANALYSIS_ENABLED=True,
+    QUERY_REPEAT_RAISE=True,
+    # The admin templates reference the manifest built by collectstatic
+    STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage',
+)
+class RepeatedQueryTests(TestCase):
+    """Pages that render many rows must not run a query per row"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'pw')
+        cls.users = [User.objects.create_user(f'user{i}', password='pw') for i in range(ROWS)]
+        cls.beats = Beat.objects.bulk_create([
+            Beat(name=f'Beat {i}', genre='Trap', bpm=140, scale='C Minor',
+                 mp3_price=Decimal('29.99'), uploaded_by=cls.users[i])
+            for i in range(ROWS)
+        ])
+        Purchase.objects.bulk_create([
+            Purchase(user=user, beat=beat, download_type='mp3', price_paid=Decimal('29.99'),
+                     payment_status='completed')
+            for user, beat in zip(cls.users, cls.beats)
+        ])
+        StripeWebhookEvent.objects.bulk_create([
+            StripeWebhookEvent(stripe_event_id=f'evt_{i}', event_type='payment_intent.succeeded')
+            for i in range(ROWS)
+        ])
+        RequestProfile.objects.bulk_create([
+            RequestProfile(user=cls.admin, method='GET', path='/api/beats/', status_code=200,
+                           duration_ms=10, format='cprofile')
+            for _ in range(ROWS)
+        ])
+
+    def auth_header(self, user):
+        return {'HTTP_AUTHORIZATION': f'Bearer {RefreshToken.for_user(user).access_token}'}
+
+    def test_beat_list(self):
+        response = self.client.get('/api/beats/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()), ROWS)
+
+    def test_beat_detail(self):
+        response = self.client.get(f'/api/beats/{self.beats[0].pk}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['uploaded_by_username'], 'user0')
+
+    def test_check_purchase(self):
+        user = self.users[0]
+        for beat in self.beats[:2]:
+            response = self.client.get(
+                f'/api/beats/{beat.pk}/check_purchase/?type=mp3', **self.auth_header(user)
+            )
+            self.assertEqual(response.status_code, 200)
+
+    def test_user_profile(self):
+        response = self.client.get('/api/users/profile/', **self.auth_header(self.users[0]))
+        self.assertEqual(response.status_code, 200)
+
+    def test_admin_changelists(self):
+        self.client.force_login(self.admin)
+        for model in ('beat', 'purchase', 'userprofile', 'stripewebhookevent', 'requestprofile'):
+            with self.subTest(model=model):
+                response = self.client.get(f'/admin/beats/{model}/')
+                self.assertEqual(response.status_code, 200)
@@ -0,0 +1,44 @@
+from decimal import Decimal
+from django.test import SimpleTestCase
+from django.utils.translation import gettext_lazy
+from rest_framework.renderers import JSONRenderer
+from beats import renderers
+from beats.renderers import FastJSONParser, FastJSONRenderer
+import datetime
+import io
+import unittest
+import uuid
+
+PAYLOAD = {
+    'price': Decimal('29.99'),
+    'free': Decimal('0.00'),
+    'created_at': datetime.datetime(2024, 3, 1, 12, 30, 15, 123456, tzinfo=datetime.timezone.utc),
+    'naive': datetime.datetime(2024, 3, 1, 12, 30),
+    'offset': datetime.datetime(2024, 3, 1, 12, 30, tzinfo=datetime.timezone(datetime.timedelta(hours=2))),
+    'date': datetime.date(2024, 3, 1),
+    'time': datetime.time(9, 5, 0, 500000),
+    'id': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+    'label': gettext_lazy('Beats'),
+    'text': 'Café\u2028line',
+    'nested': [{'bpm': 140, 'ratio': 0.5, 'ok': True, 'none': None}],
+}
+
+
+@unittest.skipIf(renderers.orjson is None, 'orjson is not installed')
+class FastJSONRendererTests(SimpleTestCase):
+
+    def test_output_matches_drf(self):
+        self.assertEqual(FastJSONRenderer().render(PAYLOAD), JSONRenderer().render(PAYLOAD))
+
+    def test_wide_integers_fall_back_to_the_stdlib(self):
+        data = {'big': 2 ** 70}
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_indented_output_is_left_to_drf(self):
+        context = {'indent': 2}
+        self.assertEqual(FastJSONRenderer().render(PAYLOAD, 'application/json', context),
+                         JSONRenderer().render(PAYLOAD, 'application/json', context))
+
+    def test_parser_round_trip(self):
+        body = FastJSONRenderer().render({'name': 'Café', 'bpm': 140})
+        self.assertEqual(FastJSONParser().parse(io.BytesIO(body)), {'name': 'Café', 'bpm': 140})
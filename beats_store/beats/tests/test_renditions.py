@@ -0,0 +1,91 @@
+from django.test import SimpleTestCase, TestCase
+from beats.media import choose_rendition, encode_renditions
+from beats.models import Beat
+
+RENDITIONS = {
+    '64k': {'mp3': 'preview-snippet/variants/x/64k.mp3', 'opus': 'preview-snippet/variants/x/64k.opus'},
+    '128k': {'mp3': 'preview-snippet/variants/x/128k.mp3', 'opus': 'preview-snippet/variants/x/128k.opus'},
+}
+
+
+class ChooseRenditionTests(SimpleTestCase):
+
+    def test_defaults_to_the_highest_bitrate_mp3(self):
+        self.assertEqual(choose_rendition(RENDITIONS), ('128k', 'mp3'))
+        self.assertEqual(choose_rendition(RENDITIONS, accept='*/*'), ('128k', 'mp3'))
+        self.assertIsNone(choose_rendition(None))
+
+    def test_save_data_gets_the_lowest_bitrate(self):
+        self.assertEqual(choose_rendition(RENDITIONS, save_data=True), ('64k', 'mp3'))
+
+    def test_accept_picks_the_format(self):
+        self.assertEqual(choose_rendition(RENDITIONS, accept='audio/ogg'), ('128k', 'opus'))
+        self.assertEqual(choose_rendition(RENDITIONS, accept='audio/mpeg;q=0.5, audio/*'), ('128k', 'opus'))
+        # The most specific range wins over a wildcard
+        self.assertEqual(choose_rendition(RENDITIONS, accept='audio/ogg;q=0, audio/*'), ('128k', 'mp3'))
+
+    def test_explicit_choice(self):
+        self.assertEqual(choose_rendition(RENDITIONS, bitrate='64k', extension='opus', save_data=False),
+                         ('64k', 'opus'))
+        with self.assertRaises(ValueError):
+            choose_rendition(RENDITIONS, bitrate='320k')
+        with self.assertRaises(ValueError):
+            choose_rendition({'64k': {'mp3': 'x.mp3'}}, extension='opus')
+
+
+class _NoOpusAudio:
+    """Stands in for an AudioSegment exported by an ffmpeg built without libopus"""
+
+    def __init__(self):
+        self.exports = []
+
+    def export(self, out_f, format, codec, bitrate):
+        from pydub.exceptions import CouldntEncodeError
+
+        self.exports.append((codec, bitrate))
+        if codec == 'libopus':
+            raise CouldntEncodeError('Encoding failed. ffmpeg returned error code: 1\nUnknown encoder')
+        out_f.write(f'{format}@{bitrate}'.encode())
+
+
+class EncodeRenditionsTests(SimpleTestCase):
+
+    def test_unavailable_encoder_skips_only_its_format(self):
+        audio = _NoOpusAudio()
+        with self.assertLogs('beats.media', 'WARNING'):
+            renditions = encode_renditions(audio, ('mp3', 'opus'))
+        self.assertEqual(renditions, {'64k': {'mp3': b'mp3@64k'}, '128k': {'mp3': b'mp3@128k'}})
+        # Not retried for the next bitrate
+        self.assertEqual([codec for codec, _ in audio.exports].count('libopus'), 1)
+
+
+class PreviewEndpointTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.beat, cls.plain = Beat.objects.bulk_create([
+            Beat(name='Track', genre='Trap', bpm=140, scale='C Minor', mp3_file='beats/track.mp3',
+                 snippet_mp3='preview-snippet/track_preview.mp3', snippet_renditions=RENDITIONS),
+            Beat(name='Plain', genre='Trap', bpm=140, scale='C Minor', mp3_file='beats/plain.mp3',
+                 snippet_mp3='preview-snippet/plain_preview.mp3'),
+        ])
+
+    def test_redirects_to_the_chosen_rendition(self):
+        response = self.client.get(f'/api/beats/{self.beat.pk}/preview/', HTTP_SAVE_DATA='on')
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(response['Location'].endswith('/variants/x/64k.mp3'))
+        self.assertIn('Save-Data', response['Vary'])
+
+        response = self.client.get(f'/api/beats/{self.beat.pk}/preview/?codec=opus')
+        self.assertTrue(response['Location'].endswith('/variants/x/128k.opus'))
+
+        response = self.client.get(f'/api/beats/{self.beat.pk}/preview/?bitrate=320k')
+        self.assertEqual(response.status_code, 400)
+
+    def test_falls_back_to_the_snippet(self):
+        response = self.client.get(f'/api/beats/{self.plain.pk}/preview/')
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(response['Location'].endswith('/preview-snippet/plain_preview.mp3'))
+
+        response = self.client.get(f'/api/beats/{self.plain.pk}/preview/?codec=opus')
+        self.assertEqual(response.status_code, 302)
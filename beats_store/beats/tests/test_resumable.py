@@ -0,0 +1,115 @@
+from datetime import timedelta
+from django.contrib.auth.models import User
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import RefreshToken
+from beats import synthetic
+from beats.models import Beat, ResumableUpload
+import io
+import os
+import shutil
+import tempfile
+
+_media_root = tempfile.mkdtemp(prefix='beats-resumable-')
+
+
+@override_settings(MEDIA_ROOT=_media_root)
+class ResumableUploadTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'pw')
+        cls.beat = Beat.objects.bulk_create([
+            Beat(name='Track', genre='Trap', bpm=140, scale='C Minor', mp3_file='beats/track.mp3'),
+        ])[0]
+        cls.stems = synthetic.stems_zip(seconds=2)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(_media_root, ignore_errors=True)
+
+    def setUp(self):
+        self.auth = {'HTTP_AUTHORIZATION': f'Bearer {RefreshToken.for_user(self.admin).access_token}'}
+
+    def create(self, content=None, **overrides):
+        data = {'beat': self.beat.pk, 'field': 'stems_file', 'filename': 'stems.zip',
+                'content_type': 'application/zip', 'size': len(content or self.stems), **overrides}
+        return self.client.post('/api/uploads/', data, content_type='application/json', **self.auth)
+
+    def patch(self, location, offset, chunk):
+        return self.client.patch(location, chunk, content_type='application/offset+octet-stream',
+                                 HTTP_UPLOAD_OFFSET=str(offset), **self.auth)
+
+    def test_chunked_upload(self):
+        response = self.create()
+        self.assertEqual(response.status_code, 201, response.content)
+        location = response['Location']
+        upload = ResumableUpload.objects.get()
+        self.assertTrue(os.path.exists(default_storage.path(upload.key) + '.part'))
+
+        half = len(self.stems) // 2
+        response = self.patch(location, 0, self.stems[:half])
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(response['Upload-Offset'], str(half))
+
+        # Resending from a stale offset is refused; HEAD says where to resume
+        self.assertEqual(self.patch(location, 0, self.stems[:half]).status_code, 409)
+        self.assertEqual(self.client.head(location, **self.auth)['Upload-Offset'], str(half))
+
+        finalize = location + 'finalize/'
+        self.assertEqual(self.client.post(finalize, **self.auth).status_code, 409)
+        self.assertEqual(self.patch(location, half, self.stems[half:]).status_code, 204)
+        response = self.client.post(finalize, **self.auth)
+        self.assertEqual(response.status_code, 200, response.content)
+
+        self.beat.refresh_from_db()
+        self.assertEqual(self.beat.stems_file.name, upload.key)
+        with self.beat.stems_file.open('rb') as f:
+            self.assertEqual(f.read(), self.stems)
+        self.assertFalse(ResumableUpload.objects.exists())
+
+    def test_chunks_are_validated(self):
+        location = self.create()['Location']
+        response = self.client.patch(location, b'PK', content_type='application/octet-stream',
+                                     HTTP_UPLOAD_OFFSET='0', **self.auth)
+        self.assertEqual(response.status_code, 415)
+        self.assertEqual(self.patch(location, 0, self.stems + b'extra').status_code, 400)
+        response = self.client.patch(location, b'PK', content_type='application/offset+octet-stream', **self.auth)
+        self.assertEqual(response.status_code, 400)
+
+    def test_finalize_rejects_the_wrong_content(self):
+        content = b'not a zip at all'
+        location = self.create(content)['Location']
+        self.patch(location, 0, content)
+        response = self.client.post(location + 'finalize/', **self.auth)
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(ResumableUpload.objects.exists())
+        self.beat.refresh_from_db()
+        self.assertFalse(self.beat.stems_file)
+
+    def test_create_is_validated(self):
+        self.assertEqual(self.create(beat=self.beat.pk + 1).status_code, 400)
+        self.assertEqual(self.create(size=None).status_code, 400)
+        self.assertEqual(self.create(filename='stems.wav').status_code, 400)
+
+        buyer = User.objects.create_user('buyer', password='pw')
+        self.auth = {'HTTP_AUTHORIZATION': f'Bearer {RefreshToken.for_user(buyer).access_token}'}
+        self.assertEqual(self.create().status_code, 403)
+
+    def test_cancel_and_abort_stale(self):
+        location = self.create()['Location']
+        upload = ResumableUpload.objects.get()
+        part = default_storage.path(upload.key) + '.part'
+        self.assertEqual(self.client.delete(location, **self.auth).status_code, 204)
+        self.assertFalse(os.path.exists(part))
+
+        self.create()
+        self.create()
+        ResumableUpload.objects.filter(pk=ResumableUpload.objects.first().pk).update(
+            updated_at=timezone.now() - timedelta(days=2),
+        )
+        call_command('abort_stale_uploads', stdout=io.StringIO())
+        self.assertEqual(ResumableUpload.objects.count(), 1)
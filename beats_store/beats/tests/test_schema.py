@@ -0,0 +1,34 @@
+from django.core.management import call_command
+from django.test import SimpleTestCase, override_settings
+import io
+import shutil
+import tempfile
+
+
+class SchemaViewTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.directory = tempfile.mkdtemp(prefix='beats-schema-')
+        cls.addClassCleanup(shutil.rmtree, cls.directory, ignore_errors=True)
+        call_command('build_schema', output_dir=cls.directory, verbosity=0, stdout=io.StringIO())
+
+    def test_serves_prebuilt_schema_with_etag(self):
+        with override_settings(OPENAPI_SCHEMA_DIR=self.directory):
+            response = self.client.get('/api/schema/')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response['Content-Type'], 'application/vnd.oai.openapi')
+            self.assertIn('max-age=', response['Cache-Control'])
+            self.assertIn(b'/api/beats/', response.content)
+
+            revalidated = self.client.get('/api/schema/', HTTP_IF_NONE_MATCH=response['ETag'])
+            self.assertEqual(revalidated.status_code, 304)
+
+            as_json = self.client.get('/api/schema/?format=json')
+            self.assertEqual(as_json.status_code, 200)
+            self.assertIn('/api/beats/', as_json.json()['paths'])
+            self.assertNotEqual(as_json['ETag'], response['ETag'])
+
+    def test_missing_schema_is_not_generated_outside_debug(self):
+        with override_settings(OPENAPI_SCHEMA_DIR=f'{self.directory}/missing'):
+            self.assertEqual(self.client.get('/api/schema/').status_code, 503)
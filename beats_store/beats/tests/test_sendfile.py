@@ -0,0 +1,103 @@
+from decimal import Decimal
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import TestCase, override_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+from beats import synthetic
+from beats.inventory import is_public_media
+from beats.models import Beat, Purchase
+from beats.storage import blob_name
+import shutil
+import tempfile
+
+_media_root = tempfile.mkdtemp(prefix='beats-sendfile-')
+
+
+@override_settings(MEDIA_ROOT=_media_root)
+class MediaServingTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.name = default_storage.save('beats/track.wav', ContentFile(b'RIFF' + bytes(60)))
+        cls.cover = default_storage.save('covers/track.png', ContentFile(synthetic.solid_png()))
+        cls.buyer = User.objects.create_user('buyer', password='pw')
+        cls.beat = Beat.objects.bulk_create([
+            Beat(name='Track', genre='Trap', bpm=140, scale='C Minor', mp3_price=Decimal('19.99'),
+                 mp3_file='beats/missing.mp3', wav_price=Decimal('39.99'), wav_file=cls.name,
+                 cover_art=cls.cover),
+        ])[0]
+        Purchase.objects.create(user=cls.buyer, beat=cls.beat, download_type='wav',
+                                price_paid=Decimal('39.99'), payment_status='completed')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(_media_root, ignore_errors=True)
+
+    def download(self, download_type='wav'):
+        token = RefreshToken.for_user(self.buyer).access_token
+        return self.client.get(
+            f'/api/beats/{self.beat.pk}/download/?type={download_type}', HTTP_AUTHORIZATION=f'Bearer {token}',
+        )
+
+    def test_download_streams_the_file(self):
+        response = self.download()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'audio/wav')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="Track_wav.wav"')
+        self.assertEqual(b''.join(response.streaming_content), b'RIFF' + bytes(60))
+
+    @override_settings(MEDIA_SENDFILE_BACKEND='nginx', MEDIA_SENDFILE_PREFIX='/protected-media/')
+    def test_download_with_x_accel_redirect(self):
+        response = self.download()
+        self.assertEqual(response['X-Accel-Redirect'], f'/protected-media/{self.name}')
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response.get('Content-Length', '0'), '0')
+
+    @override_settings(MEDIA_SENDFILE_BACKEND='xsendfile')
+    def test_download_with_x_sendfile(self):
+        response = self.download()
+        self.assertEqual(response['X-Sendfile'], default_storage.path(self.name))
+
+    def test_download_of_missing_file(self):
+        Purchase.objects.create(user=self.buyer, beat=self.beat, download_type='mp3',
+                                price_paid=Decimal('19.99'), payment_status='completed')
+        self.assertEqual(self.download('mp3').status_code, 404)
+
+    def test_public_media(self):
+        response = self.client.get(f'/media/{self.cover}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), synthetic.solid_png())
+
+        cached = self.client.get(f'/media/{self.cover}', HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(cached.status_code, 304)
+
+        for path in ('/media/covers/', '/media/covers/nope.png', '/media/../settings.py'):
+            with self.subTest(path):
+                self.assertEqual(self.client.get(path).status_code, 404)
+
+    def test_purchased_files_are_not_public(self):
+        for path in (f'/media/{self.name}', f'/media/covers/../{self.name}', f'/media/covers/%2E%2E/{self.name}'):
+            with self.subTest(path):
+                self.assertEqual(self.client.get(path).status_code, 404)
+
+    @override_settings(DEFAULT_FILE_STORAGE='beats.storage.ContentAddressedFileSystemStorage')
+    def test_content_addressed_objects_of_purchased_files_are_not_public(self):
+        wav = default_storage.save('beats/track.wav', ContentFile(b'RIFF' + bytes(61)))
+        cover = default_storage.save('covers/track.png', ContentFile(synthetic.solid_png(color=(1, 2, 3))))
+        thumb = default_storage.save('covers/variants/track/thumb.webp', ContentFile(b'RIFFWEBP'))
+
+        self.assertEqual(self.client.get(f'/media/{blob_name(wav)}').status_code, 404)
+        for name in (cover, thumb):
+            with self.subTest(name):
+                # One lookup by primary key, whatever the size of the catalog
+                with self.assertNumQueries(1):
+                    self.assertTrue(is_public_media(blob_name(name)))
+                response = self.client.get(f'/media/{blob_name(name)}')
+                self.assertEqual(response.status_code, 200)
+                self.assertIn('immutable', response['Cache-Control'])
+
+        # The same bytes saved under a public name make the object public
+        default_storage.save('preview-snippet/track.wav', ContentFile(b'RIFF' + bytes(61)))
+        self.assertEqual(self.client.get(f'/media/{blob_name(wav)}').status_code, 200)
@@ -0,0 +1,80 @@
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import SimpleTestCase, TestCase, override_settings
+from beats.media import is_auto_snippet, is_stale_snippet, snippet_filename_for
+from beats.models import Beat
+import io
+import shutil
+import tempfile
+
+_media_root = tempfile.mkdtemp(prefix='beats-snippets-')
+
+PEAKS = {'version': 2, 'length': 0, 'data': []}
+RENDITIONS = {'128k': {'mp3': 'preview-snippet/variants/x/128k.mp3'}}
+
+
+class SnippetNameTests(SimpleTestCase):
+
+    def test_auto_snippet_names(self):
+        self.assertEqual(snippet_filename_for('beats/My Track.mp3'), 'My Track_preview.mp3')
+        self.assertTrue(is_auto_snippet('preview-snippet/track_preview.mp3'))
+        # Storage backends that don't overwrite append a random suffix
+        self.assertTrue(is_auto_snippet('preview-snippet/track_preview_a1B2c3D.mp3'))
+        self.assertFalse(is_auto_snippet('preview-snippet/my-own-edit.mp3'))
+        self.assertFalse(is_auto_snippet(''))
+
+    def test_stale_snippets(self):
+        self.assertFalse(is_stale_snippet('preview-snippet/track_preview.mp3', 'beats/track.mp3'))
+        self.assertTrue(is_stale_snippet('preview-snippet/old_preview.mp3', 'beats/track.mp3'))
+        # Uploaded snippets are never replaced
+        self.assertFalse(is_stale_snippet('preview-snippet/my-own-edit.mp3', 'beats/track.mp3'))
+
+
+@override_settings(MEDIA_ROOT=_media_root)
+class BackfillSnippetsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        def beat(name, snippet='', **fields):
+            return Beat(name=name, genre='Trap', bpm=140, scale='C Minor', mp3_file=f'beats/{name}.mp3',
+                        snippet_mp3=snippet, **fields)
+
+        cls.beats = Beat.objects.bulk_create([
+            beat('missing'),
+            beat('stale', 'preview-snippet/old_preview.mp3', waveform_peaks=PEAKS, snippet_renditions=RENDITIONS),
+            beat('current', 'preview-snippet/current_preview.mp3', waveform_peaks=PEAKS,
+                 snippet_renditions=RENDITIONS),
+            beat('nopeaks', 'preview-snippet/nopeaks_preview.mp3', snippet_renditions=RENDITIONS),
+            beat('norenditions', 'preview-snippet/norenditions_preview.mp3', waveform_peaks=PEAKS),
+            beat('uploaded', 'preview-snippet/my-own-edit.mp3'),
+        ])
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(_media_root, ignore_errors=True)
+
+    def backfill(self, *args):
+        out = io.StringIO()
+        call_command('backfill_snippets', *args, '--workers', '1', stdout=out)
+        return out.getvalue()
+
+    def test_dry_run_lists_missing_and_stale_snippets(self):
+        output = self.backfill('--dry-run')
+        self.assertIn('Found 4 beat(s) needing a snippet', output)
+        for name, reason in (('missing', 'missing'), ('stale', 'stale'), ('nopeaks', 'missing waveform'),
+                             ('norenditions', 'missing renditions')):
+            self.assertIn(f'({name}): {reason}', output)
+
+        output = self.backfill('--dry-run', '--force')
+        self.assertIn('(current): forced', output)
+        self.assertNotIn('(uploaded)', output)
+
+        beat_id = str(self.beats[0].pk)
+        self.assertIn('Found 1 beat(s)', self.backfill('--dry-run', '--beat-id', beat_id))
+
+    def test_unreadable_sources_are_reported(self):
+        with self.assertRaisesMessage(CommandError, '1 snippet(s) could not be generated'):
+            self.backfill('--beat-id', str(self.beats[0].pk))
+        self.beats[0].refresh_from_db()
+        self.assertFalse(self.beats[0].snippet_mp3)
@@ -0,0 +1,97 @@
+from decimal import Decimal
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import TestCase, override_settings
+from beats import synthetic
+from beats.images import store_image_variants
+from beats.models import Beat, ContentBlob
+from beats.storage import blob_name
+import os
+import shutil
+import tempfile
+
+_media_root = tempfile.mkdtemp(prefix='beats-storage-')
+
+
+@override_settings(MEDIA_ROOT=_media_root, DEFAULT_FILE_STORAGE='beats.storage.ContentAddressedFileSystemStorage')
+class ContentAddressedStorageTests(TestCase):
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(_media_root, ignore_errors=True)
+
+    def test_duplicates_share_one_object(self):
+        content = synthetic.silent_wav(seconds=1)
+        first = default_storage.save('beats/track.wav', ContentFile(content))
+        again = default_storage.save('beats/track.wav', ContentFile(content))
+        renamed = default_storage.save('beats/other.wav', ContentFile(content))
+        self.assertEqual(first, again)
+        self.assertNotEqual(first, renamed)
+        self.assertRegex(first, r'^beats/[0-9a-f]{40}/track\.wav$')
+
+        key = blob_name(first)
+        self.assertEqual(blob_name(renamed), key)
+        self.assertEqual(os.listdir(os.path.dirname(default_storage.path(first))), [os.path.basename(key)])
+        self.assertEqual(ContentBlob.objects.get().references, 3)
+        self.assertEqual(default_storage.url(renamed), f'/media/{key}')
+        self.assertEqual(default_storage.size(first), len(content))
+        with default_storage.open(renamed) as f:
+            self.assertEqual(f.read(), content)
+
+    def test_object_is_deleted_with_its_last_reference(self):
+        names = [default_storage.save(f'covers/{i}.png', ContentFile(synthetic.solid_png())) for i in range(2)]
+        path = default_storage.path(names[0])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            default_storage.delete(names[0])
+        self.assertTrue(os.path.exists(path))
+        with self.captureOnCommitCallbacks(execute=True):
+            default_storage.delete(names[1])
+            default_storage.delete(names[1])
+        self.assertFalse(os.path.exists(path))
+        self.assertFalse(ContentBlob.objects.exists())
+
+        # Names written straight to the backend (direct uploads) pass through
+        os.makedirs(default_storage.path('beats'), exist_ok=True)
+        with default_storage.open('beats/upload.txt', 'wb') as f:
+            f.write(b'x')
+        self.assertEqual(default_storage.size('beats/upload.txt'), 1)
+        default_storage.delete('beats/upload.txt')
+        self.assertFalse(default_storage.exists('beats/upload.txt'))
+
+    def test_restored_variants_keep_one_reference(self):
+        rendered = {'thumb': {'png': synthetic.solid_png(16)}}
+        first = store_image_variants(default_storage, 'covers/a.png', rendered)
+        again = store_image_variants(default_storage, 'covers/a.png', rendered, old_variants=first)
+        self.assertEqual(again, first)
+        self.assertEqual(ContentBlob.objects.get().references, 1)
+
+        # New content releases the old object
+        with self.captureOnCommitCallbacks(execute=True):
+            changed = store_image_variants(default_storage, 'covers/a.png',
+                                           {'thumb': {'png': synthetic.solid_png(8)}}, old_variants=again)
+        self.assertNotEqual(changed, first)
+        self.assertEqual(list(ContentBlob.objects.values_list('references', flat=True)), [1])
+        self.assertFalse(default_storage.exists(first['thumb']['png']))
+
+    def test_names_fit_max_length(self):
+        name = default_storage.save('beats/' + 'x' * 80 + '.mp3', ContentFile(b'ID3'), max_length=100)
+        self.assertEqual(len(name), 100)
+        self.assertTrue(name.endswith('.mp3'))
+        with self.assertRaises(SuspiciousFileOperation):
+            default_storage.save('beats/track.mp3', ContentFile(b'ID3'), max_length=40)
+
+    def test_beat_files_and_immutable_urls(self):
+        beat = Beat(name='Track', genre='Trap', bpm=140, scale='C Minor', wav_price=Decimal('39.99'))
+        beat.wav_file.save('track.wav', ContentFile(synthetic.silent_wav(seconds=1)), save=False)
+        beat.cover_art.save('track.png', ContentFile(synthetic.solid_png()), save=False)
+        beat.save()
+        self.assertEqual(beat.get_media_metadata('wav_file')['name'], beat.wav_file.name)
+
+        response = self.client.get(beat.cover_art.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('immutable', response['Cache-Control'])
+        # Sold files only leave through the download action
+        self.assertEqual(self.client.get(beat.wav_file.url).status_code, 404)
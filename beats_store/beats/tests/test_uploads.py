@@ -0,0 +1,158 @@
+from django.contrib.auth.models import User
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+from unittest import mock
+from beats import diskcache, synthetic
+from beats.models import Beat, ContentBlob
+from beats.uploads import UploadError, create_ticket, presign
+import io
+import shutil
+import tempfile
+
+_media_root = tempfile.mkdtemp(prefix='beats-uploads-')
+
+
+@override_settings(MEDIA_ROOT=_media_root)
+class DirectUploadTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'pw')
+        cls.beat = Beat.objects.bulk_create([
+            Beat(name='Track', genre='Trap', bpm=140, scale='C Minor', mp3_file='beats/track.mp3'),
+        ])[0]
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(_media_root, ignore_errors=True)
+
+    def api(self, action, data, user=None):
+        token = RefreshToken.for_user(user or self.admin).access_token
+        return self.client.post(
+            f'/api/beats/{self.beat.pk}/{action}/', data, content_type='application/json',
+            HTTP_AUTHORIZATION=f'Bearer {token}',
+        )
+
+    def start(self, filename='master.wav', content_type='audio/wav', field='wav_file'):
+        response = self.api('upload', {'field': field, 'filename': filename, 'content_type': content_type,
+                                       'size': 1000})
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def post_form(self, form, content, content_type='audio/wav'):
+        upload = SimpleUploadedFile('upload', content, content_type=content_type)
+        return self.client.post(form['upload']['url'], {**form['upload']['fields'], 'file': upload})
+
+    def test_upload_and_finalize(self):
+        form = self.start()
+        self.assertTrue(form['upload']['url'].endswith('/api/uploads/direct/'))
+        self.assertRegex(form['key'], r'^beats/[0-9a-f]{32}/master\.wav$')
+
+        self.assertEqual(self.post_form(form, synthetic.silent_wav()).status_code, 204)
+        response = self.api('finalize_upload', {'token': form['token']})
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertTrue(response.json()['wav_file'].endswith(form['key']))
+        self.beat.refresh_from_db()
+        self.assertEqual(self.beat.wav_file.name, form['key'])
+
+    @override_settings(DEFAULT_FILE_STORAGE='beats.storage.ContentAddressedFileSystemStorage')
+    def test_upload_and_finalize_with_content_addressed_storage(self):
+        form = self.start()
+        self.assertEqual(self.post_form(form, synthetic.silent_wav()).status_code, 204)
+        # Stored under the ticket's key, like S3 would
+        self.assertTrue(default_storage.exists(form['key']))
+        self.assertFalse(ContentBlob.objects.exists())
+
+        response = self.api('finalize_upload', {'token': form['token']})
+        self.assertEqual(response.status_code, 200, response.content)
+        self.beat.refresh_from_db()
+        self.assertEqual(self.beat.wav_file.name, form['key'])
+        with self.beat.wav_file.open('rb') as f:
+            self.assertEqual(f.read(), synthetic.silent_wav())
+
+    def test_finalize_does_not_read_the_upload_back(self):
+        form = self.start()
+        self.post_form(form, synthetic.silent_wav())
+        with mock.patch.object(diskcache, 'open_file', wraps=diskcache.open_file) as open_file:
+            self.assertEqual(self.api('finalize_upload', {'token': form['token']}).status_code, 200)
+        open_file.assert_not_called()
+        self.beat.refresh_from_db()
+        self.assertIsNone(self.beat.get_media_metadata('wav_file'))
+
+        out = io.StringIO()
+        call_command('backfill_media_metadata', '--dry-run', stdout=out)
+        self.assertIn(f'Beat {self.beat.pk} (Track): mp3_file, wav_file', out.getvalue())
+
+    def test_finalize_rejects_and_deletes_the_wrong_content(self):
+        form = self.start()
+        self.post_form(form, b'definitely not a wav file')
+        response = self.api('finalize_upload', {'token': form['token']})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('not a valid audio/wav file', response.json()['error'])
+        self.assertFalse(default_storage.exists(form['key']))
+        self.beat.refresh_from_db()
+        self.assertFalse(self.beat.wav_file)
+
+    def test_finalize_needs_an_uploaded_file_and_a_valid_ticket(self):
+        form = self.start()
+        self.assertEqual(self.api('finalize_upload', {'token': form['token']}).status_code, 400)
+        self.assertEqual(self.api('finalize_upload', {'token': form['token'] + 'x'}).status_code, 400)
+
+        other = Beat.objects.bulk_create([Beat(name='Other', genre='Trap', bpm=90, scale='A Minor')])[0]
+        ticket = create_ticket(other, 'wav_file', 'x.wav', 'audio/wav', None)
+        response = self.api('finalize_upload', {'token': ticket['token']})
+        self.assertEqual(response.json()['error'], 'Upload ticket is for a different beat')
+
+    def test_upload_requests_are_validated(self):
+        cases = {
+            'field must be one of': {'field': 'snippet_mp3', 'filename': 'a.mp3', 'content_type': 'audio/mpeg'},
+            'must be a .zip file': {'field': 'stems_file', 'filename': 'a.rar', 'content_type': 'application/zip'},
+            'content_type must be': {'field': 'wav_file', 'filename': 'a.wav', 'content_type': 'text/plain'},
+            'must be between': {'field': 'cover_art', 'filename': 'a.png', 'content_type': 'image/png',
+                                'size': 10 ** 9},
+        }
+        for message, data in cases.items():
+            with self.subTest(message):
+                response = self.api('upload', data)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn(message, response.json()['error'])
+
+        buyer = User.objects.create_user('buyer', password='pw')
+        self.assertEqual(self.api('upload', cases['must be between'], user=buyer).status_code, 403)
+
+    def test_direct_upload_enforces_the_policy(self):
+        form = self.start()
+        fields = form['upload']['fields']
+        tampered = {**form, 'upload': {**form['upload'], 'fields': {**fields, 'key': 'beats/other.wav'}}}
+        self.assertEqual(self.post_form(tampered, synthetic.silent_wav()).status_code, 403)
+        forged = {**form, 'upload': {**form['upload'], 'fields': {**fields, 'policy': 'forged'}}}
+        self.assertEqual(self.post_form(forged, synthetic.silent_wav()).status_code, 403)
+        self.assertEqual(self.post_form(form, b'').status_code, 400)
+
+        self.assertEqual(self.post_form(form, synthetic.silent_wav()).status_code, 204)
+        self.assertEqual(self.post_form(form, synthetic.silent_wav()).status_code, 409)
+
+    def test_s3_presigned_post(self):
+        from storages.backends.s3boto3 import S3Boto3Storage
+
+        storage = S3Boto3Storage(
+            access_key='AKIAEXAMPLE', secret_key='secret', bucket_name='beats-bucket', region_name='us-east-1',
+            default_acl='public-read', object_parameters={'CacheControl': 'max-age=86400'},
+        )
+        ticket = create_ticket(self.beat, 'stems_file', 'Stems.ZIP', 'application/zip', 123)
+        with self.settings(USE_S3=True):
+            form = presign(storage, ticket, local_url=None)
+        self.assertEqual(form['url'], 'https://beats-bucket.s3.amazonaws.com/')
+        fields = form['fields']
+        self.assertEqual(fields['key'], ticket['key'])
+        self.assertTrue(ticket['key'].endswith('/Stems.zip'))
+        self.assertEqual(fields['Content-Type'], 'application/zip')
+        self.assertEqual(fields['acl'], 'public-read')
+        self.assertIn('policy', fields)
+
+        with self.assertRaises(UploadError):
+            create_ticket(self.beat, 'stems_file', 'stems.zip', 'application/zip', 6 * 1024 ** 3)
@@ -0,0 +1,63 @@
+from django.test import SimpleTestCase, TestCase
+from beats.media import compute_waveform_peaks
+from beats.models import Beat
+import numpy as np
+
+
+def _tone(seconds=2.0, frame_rate=8000, channels=2, amplitude=0.5):
+    from pydub import AudioSegment
+
+    t = np.arange(int(seconds * frame_rate)) / frame_rate
+    wave = (np.sin(2 * np.pi * 440 * t) * amplitude * 32767).astype(np.int16)
+    samples = np.repeat(wave, channels)
+    return AudioSegment(data=samples.tobytes(), sample_width=2, frame_rate=frame_rate, channels=channels)
+
+
+class WaveformPeaksTests(SimpleTestCase):
+
+    def test_shape_and_range(self):
+        peaks = compute_waveform_peaks(_tone(), buckets=100)
+        self.assertEqual(peaks['length'], 100)
+        self.assertEqual(len(peaks['data']), 200)
+        self.assertEqual(peaks['samples_per_pixel'], 160)
+        self.assertEqual(peaks['duration'], 2.0)
+        lows, highs = peaks['data'][0::2], peaks['data'][1::2]
+        self.assertTrue(all(-128 <= low <= high <= 127 for low, high in zip(lows, highs)))
+        # Half of full scale
+        self.assertEqual(max(highs), 64)
+        self.assertEqual(min(lows), -64)
+
+    def test_short_audio_has_fewer_buckets(self):
+        peaks = compute_waveform_peaks(_tone(seconds=0.001), buckets=400)
+        self.assertEqual(peaks['length'], 8)
+        self.assertEqual(len(peaks['data']), 16)
+        self.assertEqual(compute_waveform_peaks(_tone(seconds=0))['data'], [])
+
+
+class WaveformEndpointTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.beat = Beat.objects.bulk_create([
+            Beat(name='Track', genre='Trap', bpm=140, scale='C Minor', mp3_file='beats/track.mp3',
+                 snippet_mp3='preview-snippet/track_preview.mp3',
+                 waveform_peaks={'version': 2, 'length': 1, 'data': [-3, 4]}),
+        ])[0]
+
+    def test_revalidated_with_an_etag(self):
+        url = f'/api/beats/{self.beat.pk}/waveform/'
+        response = self.client.get(url)
+        self.assertEqual(response.json()['data'], [-3, 4])
+        self.assertIn('max-age=300', response['Cache-Control'])
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+        Beat.objects.filter(pk=self.beat.pk).update(waveform_peaks={'version': 2, 'length': 1, 'data': [-5, 6]})
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+
+    def test_list_includes_peaks_only_on_request(self):
+        row = self.client.get('/api/beats/').json()[0]
+        self.assertNotIn('waveform_peaks', row)
+        self.assertIn('snippet_mp3', row)
+
+        row = self.client.get('/api/beats/?fields=id,waveform_peaks').json()[0]
+        self.assertEqual(row, {'id': self.beat.pk, 'waveform_peaks': self.beat.waveform_peaks})
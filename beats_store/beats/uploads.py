@@ -0,0 +1,227 @@
+"""
+Direct-to-storage uploads of beat files.
+
+Large WAVs and stems ZIPs shouldn't pass through a gunicorn worker (and
+Django's temporary upload file) on their way to S3. Instead:
+
+1. A staff client asks for an upload ticket for one file field of a beat
+   (``POST /api/beats/<id>/upload/``). The response holds a presigned S3 POST
+   form: the client posts the given ``fields`` plus ``file`` to ``url``,
+   straight to the bucket. S3 itself enforces the size limit and content type.
+2. The client finalizes the upload (``POST /api/beats/<id>/finalize_upload/``)
+   with the ticket's ``token``. The stored object's size and leading bytes
+   are checked, and it is attached to the beat. Rejected objects are deleted.
+
+The ticket is a signed token, so no state is kept between the two steps.
+With local storage the form posts to beats.views.direct_upload instead,
+which stands in for S3 and stores the file under the same key.
+"""
+
+from django.conf import settings
+from django.core import signing
+from django.utils.text import get_valid_filename
+from .instrumentation import timed
+import os
+import uuid
+
+# File field -> extensions, content types and maximum size in bytes it accepts.
+# Presigned POSTs are limited to 5 GB by S3.
+UPLOAD_FIELDS = {
+    'mp3_file': {
+        'extensions': ('.mp3',),
+        'content_types': ('audio/mpeg', 'audio/mp3'),
+        'max_size': 200 * 1024 * 1024,
+    },
+    'wav_file': {
+        'extensions': ('.wav',),
+        'content_types': ('audio/wav', 'audio/x-wav', 'audio/wave', 'audio/vnd.wave'),
+        'max_size': 2 * 1024 * 1024 * 1024,
+    },
+    'stems_file': {
+        'extensions': ('.zip',),
+        'content_types': ('application/zip', 'application/x-zip-compressed'),
+        'max_size': 5 * 1024 * 1024 * 1024,
+    },
+    'cover_art': {
+        'extensions': ('.jpg', '.jpeg', '.png', '.webp'),
+        'content_types': ('image/jpeg', 'image/png', 'image/webp'),
+        'max_size': 20 * 1024 * 1024,
+    },
+}
+
+# Non-standard content types browsers send, -> the type sniff_content_type reports
+CONTENT_TYPE_ALIASES = {
+    'audio/mp3': 'audio/mpeg',
+    'audio/x-wav': 'audio/wav',
+    'audio/wave': 'audio/wav',
+    'audio/vnd.wave': 'audio/wav',
+    'application/x-zip-compressed': 'application/zip',
+}
+
+# Bytes read from the start of an uploaded object to check what it is
+SNIFF_BYTES = 16
+
+_SALT = 'beats.uploads'
+
+
+class UploadError(Exception):
+    """An upload request or uploaded object was rejected; the message is safe to show"""
+
+
+def sniff_content_type(head):
+    """Return the content type implied by the first bytes of a file, or None"""
+    if head.startswith(b'ID3') or (len(head) > 1 and head[0] == 0xFF and head[1] & 0xE0 == 0xE0):
+        return 'audio/mpeg'
+    if head.startswith(b'RIFF') and head[8:12] == b'WAVE':
+        return 'audio/wav'
+    if head.startswith(b'RIFF') and head[8:12] == b'WEBP':
+        return 'image/webp'
+    if head.startswith((b'PK\x03\x04', b'PK\x05\x06')):
+        return 'application/zip'
+    if head.startswith(b'\xff\xd8\xff'):
+        return 'image/jpeg'
+    if head.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'image/png'
+    return None
+
+
+def _canonical(content_type):
+    return CONTENT_TYPE_ALIASES.get(content_type, content_type)
+
+
+def upload_key(field, filename):
+    """Return a fresh storage name for ``filename`` under the field's upload_to.
+
+    Each upload gets its own random folder, so the name never collides and
+    fits the field's max_length without storage renaming it.
+    """
+    folder = f'{field.upload_to.rstrip("/")}/{uuid.uuid4().hex}/'
+    stem, extension = os.path.splitext(get_valid_filename(os.path.basename(filename)))
+    stem = stem[:max(1, field.max_length - len(folder) - len(extension))]
+    return f'{folder}{stem}{extension.lower()}'
+
+
+def check_request(field_name, filename, content_type, size):
+    """Validate an upload request; returns the field's UPLOAD_FIELDS entry.
+
+    ``size`` may be None when the client doesn't announce it. Raises
+    UploadError if the field, file type or size isn't accepted.
+    """
+    spec = UPLOAD_FIELDS.get(field_name)
+    if spec is None:
+        raise UploadError(f'field must be one of {sorted(UPLOAD_FIELDS)}')
+    if not filename or os.path.splitext(filename)[1].lower() not in spec['extensions']:
+        raise UploadError(f"{field_name} must be a {'/'.join(spec['extensions'])} file")
+    if content_type not in spec['content_types']:
+        raise UploadError(f"{field_name} content_type must be one of {list(spec['content_types'])}")
+    if size is not None:
+        try:
+            size = int(size)
+        except (TypeError, ValueError):
+            raise UploadError('size must be an integer') from None
+        if not 0 < size <= spec['max_size']:
+            raise UploadError(f"{field_name} must be between 1 and {spec['max_size']} bytes")
+    return spec
+
+
+def create_ticket(beat, field_name, filename, content_type, size):
+    """Validate an upload request; returns the ticket, with itself signed as 'token'.
+
+    Raises UploadError if the request isn't accepted (see check_request).
+    """
+    spec = check_request(field_name, filename, content_type, size)
+    key = upload_key(beat._meta.get_field(field_name), filename)
+    ticket = {'beat': beat.pk, 'field': field_name, 'key': key, 'content_type': content_type,
+              'max_size': spec['max_size']}
+    return {**ticket, 'token': signing.dumps(ticket, salt=_SALT, compress=True)}
+
+
+def read_ticket(token, max_age=None):
+    """Return the ticket signed into ``token``; raises UploadError if it is invalid or expired"""
+    try:
+        return signing.loads(token or '', salt=_SALT, max_age=max_age)
+    except signing.SignatureExpired:
+        raise UploadError('Upload ticket has expired') from None
+    except signing.BadSignature:
+        raise UploadError('Invalid upload ticket') from None
+
+
+def presign(storage, ticket, local_url):
+    """Return the {'method', 'url', 'fields'} form the client posts the file with.
+
+    ``local_url`` is the stand-in endpoint used when storage is local.
+    """
+    expires = settings.DIRECT_UPLOAD_EXPIRES
+    if not settings.USE_S3:
+        fields = {'key': ticket['key'], 'Content-Type': ticket['content_type'], 'policy': ticket['token']}
+        return {'method': 'POST', 'url': local_url, 'fields': fields}
+
+    fields = {'Content-Type': ticket['content_type']}
+    conditions = [
+        {'Content-Type': ticket['content_type']},
+        ['content-length-range', 1, ticket['max_size']],
+    ]
+    # Match what storage.save() would have set on the object
+    if storage.default_acl:
+        fields['acl'] = storage.default_acl
+        conditions.append({'acl': storage.default_acl})
+    cache_control = storage.object_parameters.get('CacheControl')
+    if cache_control:
+        fields['Cache-Control'] = cache_control
+        conditions.append({'Cache-Control': cache_control})
+    post = storage.connection.meta.client.generate_presigned_post(
+        storage.bucket_name,
+        storage._normalize_name(ticket['key']),
+        Fields=fields,
+        Conditions=conditions,
+        ExpiresIn=expires,
+    )
+    return {'method': 'POST', 'url': post['url'], 'fields': post['fields']}
+
+
+def stat_upload(storage, name):
+    """Return (size, first SNIFF_BYTES bytes) of a stored object without downloading it.
+
+    Raises FileNotFoundError if it doesn't exist.
+    """
+    with timed('storage'):
+        if settings.USE_S3:
+            from botocore.exceptions import ClientError
+
+            obj = storage.bucket.Object(storage._normalize_name(name))
+            try:
+                size = obj.content_length
+                head = obj.get(Range=f'bytes=0-{SNIFF_BYTES - 1}')['Body'].read() if size else b''
+            except ClientError as e:
+                if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                    raise FileNotFoundError(name) from None
+                raise
+            return size, head
+        if not storage.exists(name):
+            raise FileNotFoundError(name)
+        with storage.open(name, 'rb') as f:
+            head = f.read(SNIFF_BYTES)
+        return storage.size(name), head
+
+
+def check_upload(storage, ticket):
+    """Check the object a ticket was issued for; returns its size.
+
+    The object must exist, fit the size limit and start with the bytes of
+    the declared content type. A rejected object is deleted, and UploadError
+    is raised.
+    """
+    name = ticket['key']
+    try:
+        size, head = stat_upload(storage, name)
+    except FileNotFoundError:
+        raise UploadError('Nothing has been uploaded for this ticket') from None
+
+    if not 0 < size <= ticket['max_size']:
+        problem = f"is {size} bytes, the limit is {ticket['max_size']}"
+    elif sniff_content_type(head) != _canonical(ticket['content_type']):
+        problem = f"is not a valid {ticket['content_type']} file"
+    else:
+        return size
+    storage.delete(name)
+    raise UploadError(f'Uploaded file {problem}')
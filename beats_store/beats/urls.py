@@ -1,7 +1,16 @@
 # beats/urls.py
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import BeatViewSet, stripe_webhook, UserProfileView, UserRegistrationView
+from .views import (
+    BeatViewSet,
+    ResumableUploadFinalizeView,
+    ResumableUploadView,
+    ResumableUploadsView,
+    UserProfileView,
+    UserRegistrationView,
+    direct_upload,
+    stripe_webhook,
+)
 
 router = DefaultRouter()
 router.register(r'beats', BeatViewSet)
@@ -10,4 +19,8 @@ urlpatterns = [
     path('stripe/webhook/', stripe_webhook, name='stripe_webhook'),
     path('users/profile/', UserProfileView.as_view(), name='user_profile'),
     path('users/register/', UserRegistrationView.as_view(), name='user_registration'),
+    path('uploads/', ResumableUploadsView.as_view(), name='resumable_uploads'),
+    path('uploads/direct/', direct_upload, name='direct_upload'),
+    path('uploads/<uuid:pk>/', ResumableUploadView.as_view(), name='resumable_upload'),
+    path('uploads/<uuid:pk>/finalize/', ResumableUploadFinalizeView.as_view(), name='resumable_upload_finalize'),
 ] + router.urls
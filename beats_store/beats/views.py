@@ -1,13 +1,20 @@
 from django.shortcuts import render, get_object_or_404
-from django.http import HttpResponse, Http404, JsonResponse
+from django.http import HttpResponse, HttpResponseRedirect, Http404, JsonResponse
 from django.conf import settings
+from django.db import transaction
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import default_storage
+from django.db.models.fields.files import FieldFile
+from django.urls import reverse
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
-import os
-import stripe
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+import hashlib
+import hmac
+import inspect
 import json
 import logging
-import requests
+import posixpath
 
 from rest_framework import viewsets, status
 from rest_framework.decorators import action, api_view, permission_classes
@@ -16,20 +23,41 @@ from rest_framework.permissions import IsAuthenticated, IsAuthenticatedOrReadOnl
 from rest_framework.views import APIView
 from rest_framework_simplejwt.authentication import JWTAuthentication
 from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from drf_spectacular.utils import extend_schema
+from drf_spectacular.views import SCHEMA_KWARGS, SpectacularAPIView
 from django.contrib.auth.models import User
-from .models import Beat, Purchase, StripeWebhookEvent, UserProfile
-from .serializers import BeatSerializer, PurchaseSerializer, UserSerializer, UserRegistrationSerializer
+from .instrumentation import registry, timed
+from .inventory import is_public_media
+from .media import choose_rendition
+from .schema import SchemaNotBuilt, load_schema
+from .sendfile import serve_file
+from .storage import IMMUTABLE_MAX_AGE, is_blob_name
+from .uploads import UPLOAD_FIELDS, UploadError, check_request, check_upload, create_ticket, presign, read_ticket, upload_key
+from . import resumable
+from .models import Beat, Purchase, ResumableUpload, StripeWebhookEvent, UserProfile, defer_media_metadata
+from .serializers import BeatListSerializer, BeatSerializer, PurchaseSerializer, UserSerializer, UserRegistrationSerializer
 
 # Initialize logger first
 logger = logging.getLogger(__name__)
 
-# Configure Stripe (only if key is available)
-if hasattr(settings, 'STRIPE_SECRET_KEY') and settings.STRIPE_SECRET_KEY:
-    stripe.api_key = settings.STRIPE_SECRET_KEY
-else:
+if not getattr(settings, 'STRIPE_SECRET_KEY', None):
     logger.warning("STRIPE_SECRET_KEY is not configured. Payment processing will not work.")
 
 
+def get_stripe():
+    """Return the Stripe SDK, configured with STRIPE_SECRET_KEY.
+
+    Imported on first use rather than with this module: the SDK takes tens of
+    milliseconds to import, which every gunicorn worker and management command
+    would otherwise pay at startup.
+    """
+    import stripe
+
+    if not stripe.api_key and getattr(settings, 'STRIPE_SECRET_KEY', None):
+        stripe.api_key = settings.STRIPE_SECRET_KEY
+    return stripe
+
+
 class OptionalJWTAuthentication(JWTAuthentication):
     """JWT Authentication that doesn't raise exceptions on invalid tokens.
     Useful for public endpoints where invalid tokens should be treated as unauthenticated."""
@@ -58,6 +86,12 @@ class IsStaffOrSuperuser(BasePermission):
             return True  # Allow read operations for everyone
         return request.user.is_authenticated and (request.user.is_staff or request.user.is_superuser)
 
+class IsStaffUser(BasePermission):
+    """Permission class that allows only staff and superusers, for reads as well as writes."""
+    
+    def has_permission(self, request, view):
+        return request.user.is_authenticated and (request.user.is_staff or request.user.is_superuser)
+
 class BeatViewSet(viewsets.ModelViewSet):
     queryset = Beat.objects.all().order_by('-created_at')
     serializer_class = BeatSerializer
@@ -67,13 +101,29 @@ class BeatViewSet(viewsets.ModelViewSet):
     # Valid tokens will still authenticate, but invalid tokens won't cause 403 errors
     authentication_classes = [OptionalJWTAuthentication]
 
+    def get_serializer_class(self):
+        # The catalog gets the compact representation; everything else gets full detail
+        if self.action == 'list':
+            return BeatListSerializer
+        return BeatSerializer
+    
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action != 'list':
+            # uploaded_by_username is only part of the detail representation
+            queryset = queryset.select_related('uploaded_by')
+        elif not BeatListSerializer.wants_field(self.request, 'waveform_peaks'):
+            # Opt-in on the list (see BeatListSerializer), so don't load it either
+            queryset = queryset.defer('waveform_peaks')
+        return queryset
+
     def get_permissions(self):
-        if self.action in ["list", "retrieve"]:  # allow public access to list and retrieve
+        if self.action in ["list", "retrieve", "waveform", "preview"]:  # allow public access to list, retrieve and previews
             return [IsAuthenticatedOrReadOnly()]
         if self.action in ["download", "purchase", "create_payment_intent", "confirm_payment", "check_purchase"]:  # custom actions
             return [IsAuthenticated()]
-        # For create, update, delete operations, require staff or superuser
-        if self.action in ["create", "update", "partial_update", "destroy"]:
+        # For create, update, delete and upload operations, require staff or superuser
+        if self.action in ["create", "update", "partial_update", "destroy", "upload", "finalize_upload"]:
             return [IsStaffOrSuperuser()]
         return [IsStaffOrSuperuser()]  # Default to staff/superuser for any other actions
     
@@ -157,9 +207,7 @@ class BeatViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
         
-        # Ensure Stripe API key is set (in case it wasn't set at module level)
-        if not stripe.api_key:
-            stripe.api_key = settings.STRIPE_SECRET_KEY
+        stripe = get_stripe()
         
         # Stripe expects integer cents
         amount_cents = int(round(float(price) * 100))
@@ -171,19 +219,20 @@ class BeatViewSet(viewsets.ModelViewSet):
         
         try:
             # Create Stripe Payment Intent
-            intent = stripe.PaymentIntent.create(
-                amount=amount_cents,
-                currency='usd',
-                automatic_payment_methods={
-                    'enabled': True,
-                },
-                metadata={
-                    'beat_id': str(beat.id),
-                    'download_type': download_type,
-                    'user_id': str(request.user.id) if request.user.is_authenticated else '',
-                    'beat_name': beat.name,
-                },
-            )
+            with timed('stripe'):
+                intent = stripe.PaymentIntent.create(
+                    amount=amount_cents,
+                    currency='usd',
+                    automatic_payment_methods={
+                        'enabled': True,
+                    },
+                    metadata={
+                        'beat_id': str(beat.id),
+                        'download_type': download_type,
+                        'user_id': str(request.user.id) if request.user.is_authenticated else '',
+                        'beat_name': beat.name,
+                    },
+                )
             
             return Response(
                 {
@@ -222,6 +271,7 @@ class BeatViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
+        stripe = get_stripe()
         try:
             # Verify payment intent with Stripe
             if not hasattr(settings, 'STRIPE_SECRET_KEY') or not settings.STRIPE_SECRET_KEY:
@@ -229,10 +279,8 @@ class BeatViewSet(viewsets.ModelViewSet):
                     {'error': 'Payment processing is not configured'}, 
                     status=status.HTTP_500_INTERNAL_SERVER_ERROR
                 )
-            if not stripe.api_key:
-                stripe.api_key = settings.STRIPE_SECRET_KEY
-            
-            intent = stripe.PaymentIntent.retrieve(payment_intent_id)
+            with timed('stripe'):
+                intent = stripe.PaymentIntent.retrieve(payment_intent_id)
             
             # Verify payment was successful
             if intent.status != 'succeeded':
@@ -309,14 +357,15 @@ class BeatViewSet(viewsets.ModelViewSet):
         logger.info(f"check_purchase: user={request.user.id}, beat={beat.id}, download_type={download_type}, found_purchase={purchase is not None}")
         if purchase:
             logger.info(f"Purchase found: id={purchase.id}, status={purchase.payment_status}")
-        else:
-            # Log all purchases for this user/beat to help debug
+        elif logger.isEnabledFor(logging.DEBUG):
+            # Log all purchases for this user/beat to help debug; skipped unless
+            # debug logging is on, since it costs an extra query on every miss
             all_purchases = Purchase.objects.filter(
                 user=request.user,
                 beat=beat,
                 download_type=download_type
             )
-            logger.info(f"No completed purchase found. All purchases for this user/beat/type: {list(all_purchases.values('id', 'payment_status', 'download_type'))}")
+            logger.debug(f"No completed purchase found. All purchases for this user/beat/type: {list(all_purchases.values('id', 'payment_status', 'download_type'))}")
         
         if purchase:
             return Response({
@@ -330,6 +379,111 @@ class BeatViewSet(viewsets.ModelViewSet):
                 'has_purchase': False
             })
 
+    @action(detail=True, methods=['get'])
+    def waveform(self, request, pk=None):
+        """Return the precomputed waveform peaks of the beat's preview snippet"""
+        beat = self.get_object()
+        if not beat.waveform_peaks:
+            return Response(
+                {'error': 'Waveform not available for this beat'}, 
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        etag = '"%s"' % hashlib.sha1(json.dumps(beat.waveform_peaks, sort_keys=True).encode()).hexdigest()[:16]
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = Response(beat.waveform_peaks)
+        response['ETag'] = etag
+        # Peaks change when the snippet is regenerated under the same URL, so keep
+        # max-age short; clients then revalidate with the ETag
+        patch_cache_control(response, public=True, max_age=300)
+        return response
+
+    @action(detail=True, methods=['get'])
+    def preview(self, request, pk=None):
+        """Redirect to the preview snippet rendition that suits the client.
+
+        ?bitrate= (e.g. "64k") and ?codec= ("mp3" or "opus") pick one
+        explicitly; otherwise Save-Data gets the lowest bitrate and the Accept
+        header picks the format. Beats without renditions redirect to the
+        snippet itself.
+        """
+        beat = self.get_object()
+        if not beat.snippet_mp3:
+            return Response(
+                {'error': 'Preview not available for this beat'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        try:
+            choice = choose_rendition(
+                beat.snippet_renditions,
+                bitrate=request.query_params.get('bitrate'),
+                extension=request.query_params.get('codec'),
+                accept=request.headers.get('Accept', ''),
+                save_data=request.headers.get('Save-Data', '').lower() == 'on',
+            )
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        if choice is None:
+            preview = beat.snippet_mp3
+        else:
+            rendition, extension = choice
+            preview = FieldFile(beat, beat.snippet_mp3.field, beat.snippet_renditions[rendition][extension])
+        response = HttpResponseRedirect(request.build_absolute_uri(preview.url))
+        # The choice depends on these headers; it only changes together with the snippet
+        patch_vary_headers(response, ['Accept', 'Save-Data'])
+        patch_cache_control(response, public=True, max_age=3600)
+        return response
+
+    @action(detail=True, methods=['post'])
+    def upload(self, request, pk=None):
+        """Start a direct-to-storage upload of one of the beat's files (see beats.uploads)"""
+        beat = self.get_object()
+        try:
+            ticket = create_ticket(
+                beat,
+                request.data.get('field'),
+                request.data.get('filename'),
+                request.data.get('content_type'),
+                request.data.get('size'),
+            )
+        except UploadError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        form = presign(
+            Beat._meta.get_field(ticket['field']).storage,
+            ticket,
+            request.build_absolute_uri(reverse('direct_upload')),
+        )
+        return Response({
+            'upload': form,
+            'key': ticket['key'],
+            'token': ticket['token'],
+            'max_size': ticket['max_size'],
+            'expires_in': settings.DIRECT_UPLOAD_EXPIRES,
+        })
+
+    @action(detail=True, methods=['post'])
+    def finalize_upload(self, request, pk=None):
+        """Check a direct upload and attach it to the beat"""
+        beat = self.get_object()
+        try:
+            # No max_age: large uploads may finish long after the ticket's form expired
+            ticket = read_ticket(request.data.get('token'))
+            if ticket['beat'] != beat.pk:
+                raise UploadError('Upload ticket is for a different beat')
+            check_upload(beat._meta.get_field(ticket['field']).storage, ticket)
+        except UploadError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        # Saving runs the usual signals: snippet for mp3_file, variants for cover_art
+        setattr(beat, ticket['field'], ticket['key'])
+        defer_media_metadata(beat, ticket['field'])
+        beat.save(update_fields=[ticket['field']])
+        return Response(BeatSerializer(beat, context=self.get_serializer_context()).data)
+
     @action(detail=True, methods=['get'])
     def download(self, request, pk=None):
         """Download the beat file"""
@@ -383,38 +537,20 @@ class BeatViewSet(viewsets.ModelViewSet):
             file_extension = download_type
         
         try:
-            # Check if storage backend supports .path (local storage)
-            try:
-                file_path = file_obj.path
-                if os.path.exists(file_path):
-                    # Local file storage
-                    with open(file_path, 'rb') as f:
-                        file_content = f.read()
-                else:
-                    return Response(
-                        {'error': 'File not found on server'}, 
-                        status=status.HTTP_404_NOT_FOUND
-                    )
-            except (NotImplementedError, AttributeError):
-                # S3 or other remote storage - download from URL
-                file_url = file_obj.url
-                # Ensure HTTPS for S3 URLs
-                if file_url.startswith('http://') and 'amazonaws.com' in file_url:
-                    file_url = file_url.replace('http://', 'https://')
-                
-                # Download file from URL
-                file_response = requests.get(file_url, timeout=30)
-                file_response.raise_for_status()
-                file_content = file_response.content
-            
-            response = HttpResponse(file_content, content_type=content_type)
-            response['Content-Disposition'] = f'attachment; filename="{beat.name}_{download_type}.{file_extension}"'
-            return response
-        except requests.RequestException as e:
-            logging.error(f'Error downloading file from URL: {str(e)}')
+            # The front proxy (or os.sendfile) sends the bytes; see beats.sendfile
+            return serve_file(
+                file_obj.storage,
+                file_obj.name,
+                request=request,
+                content_type=content_type,
+                filename=f'{beat.name}_{download_type}.{file_extension}',
+                as_attachment=True,
+                metadata=beat.get_media_metadata(file_field),
+            )
+        except FileNotFoundError:
             return Response(
-                {'error': f'Error downloading file: {str(e)}'}, 
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+                {'error': 'File not found on server'}, 
+                status=status.HTTP_404_NOT_FOUND
             )
         except Exception as e:
             logging.error(f'Error reading file: {str(e)}')
@@ -429,14 +565,16 @@ class BeatViewSet(viewsets.ModelViewSet):
 @permission_classes([])  # No authentication required for webhooks
 def stripe_webhook(request):
     """Handle Stripe webhook events"""
+    stripe = get_stripe()
     payload = request.body
     sig_header = request.META.get('HTTP_STRIPE_SIGNATURE')
     endpoint_secret = settings.STRIPE_WEBHOOK_SECRET
     
     try:
-        event = stripe.Webhook.construct_event(
-            payload, sig_header, endpoint_secret
-        )
+        with timed('stripe'):
+            event = stripe.Webhook.construct_event(
+                payload, sig_header, endpoint_secret
+            )
     except ValueError as e:
         logger.error(f"Invalid payload: {e}")
         return HttpResponse(status=400)
@@ -594,3 +732,255 @@ class UserRegistrationView(APIView):
             user_serializer = UserSerializer(user)
             return Response(user_serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+class ResumableUploadsView(APIView):
+    """Start a resumable chunked upload of a beat file (see beats.resumable)"""
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsStaffUser]
+    
+    def post(self, request):
+        beat_id = str(request.data.get('beat', ''))
+        beat = Beat.objects.filter(pk=beat_id).first() if beat_id.isdigit() else None
+        if beat is None:
+            return Response({'error': 'beat must be the id of an existing beat'}, status=status.HTTP_400_BAD_REQUEST)
+        field = request.data.get('field')
+        filename = request.data.get('filename')
+        size = request.data.get('size')
+        try:
+            if size is None:
+                raise UploadError('size is required')
+            check_request(field, filename, request.data.get('content_type'), size)
+        except UploadError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        upload = ResumableUpload(
+            user=request.user,
+            beat=beat,
+            field=field,
+            key=upload_key(Beat._meta.get_field(field), filename),
+            content_type=request.data['content_type'],
+            size=int(size),
+        )
+        resumable.start(upload)
+        upload.save()
+        
+        location = request.build_absolute_uri(reverse('resumable_upload', args=[upload.pk]))
+        return Response(
+            {'id': upload.pk, 'location': location, 'offset': 0, 'size': upload.size,
+             'chunk_size': resumable.CHUNK_SIZE},
+            status=status.HTTP_201_CREATED,
+            headers={'Location': location, 'Tus-Resumable': resumable.TUS_VERSION, 'Upload-Offset': '0'},
+        )
+
+
+class ResumableUploadView(APIView):
+    """Report (GET/HEAD), continue (PATCH) or cancel (DELETE) a resumable upload.
+
+    PATCH takes the next chunk as an application/offset+octet-stream body,
+    with the Upload-Offset header set to the offset the chunk starts at.
+    """
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsStaffUser]
+    
+    def _headers(self, upload):
+        return {
+            'Tus-Resumable': resumable.TUS_VERSION,
+            'Upload-Offset': str(upload.offset),
+            'Upload-Length': str(upload.size),
+            'Cache-Control': 'no-store',
+        }
+    
+    def get(self, request, pk):
+        upload = get_object_or_404(ResumableUpload, pk=pk, user=request.user)
+        return Response(
+            {'id': upload.pk, 'offset': upload.offset, 'size': upload.size, 'chunk_size': resumable.CHUNK_SIZE},
+            headers=self._headers(upload),
+        )
+    
+    def patch(self, request, pk):
+        if request.content_type != 'application/offset+octet-stream':
+            return Response(
+                {'error': 'Chunks must be sent as application/offset+octet-stream'},
+                status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            )
+        try:
+            offset = int(request.headers['Upload-Offset'])
+            length = int(request.META.get('CONTENT_LENGTH') or 0)
+        except (KeyError, ValueError):
+            return Response({'error': 'Upload-Offset header is required'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        # The row lock keeps two requests from writing the same upload at once
+        with transaction.atomic():
+            upload = get_object_or_404(ResumableUpload.objects.select_for_update(), pk=pk, user=request.user)
+            if offset != upload.offset:
+                return Response(
+                    {'error': f'Upload-Offset must be {upload.offset}'},
+                    status=status.HTTP_409_CONFLICT,
+                    headers=self._headers(upload),
+                )
+            if not 0 < length <= upload.size - offset:
+                return Response(
+                    {'error': f'Chunk must be between 1 and {upload.size - offset} bytes'},
+                    status=status.HTTP_400_BAD_REQUEST,
+                    headers=self._headers(upload),
+                )
+            try:
+                # Read straight from the request stream; request.data would buffer the body
+                resumable.write_chunk(upload, request.stream, length)
+            except UploadError as e:
+                return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST, headers=self._headers(upload))
+            except OSError as e:
+                # Usually the client went away; whatever reached storage is kept
+                logger.warning(f"Resumable upload {upload.pk} interrupted at {upload.offset}: {e}")
+                return Response({'error': 'Upload interrupted'}, status=status.HTTP_400_BAD_REQUEST,
+                                headers=self._headers(upload))
+            finally:
+                upload.save(update_fields=['offset', 'parts', 'updated_at'])
+        return Response(status=status.HTTP_204_NO_CONTENT, headers=self._headers(upload))
+    
+    def delete(self, request, pk):
+        upload = get_object_or_404(ResumableUpload, pk=pk, user=request.user)
+        resumable.abort(upload)
+        upload.delete()
+        return Response(status=status.HTTP_204_NO_CONTENT, headers={'Tus-Resumable': resumable.TUS_VERSION})
+
+
+class ResumableUploadFinalizeView(APIView):
+    """Assemble a fully received resumable upload, check it and attach it to its beat"""
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsStaffUser]
+    
+    def post(self, request, pk):
+        with transaction.atomic():
+            upload = get_object_or_404(
+                ResumableUpload.objects.select_for_update().select_related('beat'), pk=pk, user=request.user,
+            )
+            if upload.offset != upload.size:
+                return Response(
+                    {'error': f'Upload is incomplete: {upload.offset} of {upload.size} bytes received'},
+                    status=status.HTTP_409_CONFLICT,
+                )
+            try:
+                resumable.assemble(upload, UPLOAD_FIELDS[upload.field]['max_size'])
+            except UploadError as e:
+                upload.delete()
+                return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            upload.delete()
+        
+        # Saving runs the usual signals: snippet for mp3_file, variants for cover_art
+        beat = upload.beat
+        setattr(beat, upload.field, upload.key)
+        defer_media_metadata(beat, upload.field)
+        beat.save(update_fields=[upload.field])
+        return Response(BeatSerializer(beat, context={'request': request}).data)
+
+
+def metrics(request):
+    """Expose the request metrics of this worker in the Prometheus text format.
+
+    Scrapers authenticate with "Authorization: Bearer <METRICS_TOKEN>"; without
+    a configured token the endpoint is limited to staff users (or DEBUG).
+    """
+    token = settings.METRICS_TOKEN
+    if token:
+        # Constant-time, so the token can't be guessed byte by byte from response times
+        allowed = hmac.compare_digest(request.headers.get('Authorization', '').encode(), f'Bearer {token}'.encode())
+    else:
+        allowed = settings.DEBUG or request.user.is_staff
+    if not allowed:
+        return HttpResponse(status=403)
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+@csrf_exempt
+def direct_upload(request):
+    """Local-storage stand-in for the presigned S3 POST of beats.uploads.
+
+    Takes the same form (key, Content-Type, policy, file) and enforces the
+    same conditions. The signed policy authorizes the upload, like S3's.
+    """
+    if request.method != 'POST':
+        return HttpResponse(status=405, headers={'Allow': 'POST'})
+    if settings.USE_S3:
+        raise Http404('Uploads go to S3')
+    try:
+        ticket = read_ticket(request.POST.get('policy'), max_age=settings.DIRECT_UPLOAD_EXPIRES)
+    except UploadError as e:
+        return JsonResponse({'error': str(e)}, status=403)
+
+    upload = request.FILES.get('file')
+    if request.POST.get('key') != ticket['key'] or request.POST.get('Content-Type') != ticket['content_type']:
+        return JsonResponse({'error': 'Form fields do not match the policy'}, status=403)
+    if upload is None:
+        return JsonResponse({'error': 'No file was uploaded'}, status=400)
+    if not 0 < upload.size <= ticket['max_size']:
+        return JsonResponse({'error': 'File size is outside the allowed range'}, status=400)
+
+    storage = Beat._meta.get_field(ticket['field']).storage
+    if storage.exists(ticket['key']):
+        return JsonResponse({'error': 'This upload has already been stored'}, status=409)
+    # Straight to the backend, like S3 would: a content-addressed save() would store it under another name
+    stored = storage._save(ticket['key'], upload)
+    if stored != ticket['key']:
+        # Stored concurrently by another request with the same ticket
+        storage.delete(stored)
+        return JsonResponse({'error': 'This upload has already been stored'}, status=409)
+    # S3's default success_action_status
+    return HttpResponse(status=204)
+
+
+def serve_media(request, path):
+    """Serve a public media file from local storage (S3 serves its own URLs).
+
+    Replaces django.conf.urls.static.static(), which only works in DEBUG and
+    reads every file through Python. Only previews, covers and avatars are
+    served (see beats.inventory.is_public_media); purchased files go through
+    the download action, which checks the purchase first. Content-addressed
+    objects never change, so they may be cached forever.
+    """
+    if request.method not in ('GET', 'HEAD'):
+        return HttpResponse(status=405, headers={'Allow': 'GET, HEAD'})
+    # Normalized first, so "covers/../beats/x.wav" can't pass the prefix check
+    path = posixpath.normpath(path)
+    if path.startswith(('../', '/')) or path == '..' or not is_public_media(path):
+        raise Http404('File not found')
+    try:
+        response = serve_file(default_storage, path, request=request)
+    except (FileNotFoundError, SuspiciousFileOperation):
+        raise Http404('File not found')
+    if is_blob_name(path):
+        patch_cache_control(response, public=True, max_age=IMMUTABLE_MAX_AGE, immutable=True)
+    return response
+
+
+class SchemaView(SpectacularAPIView):
+    """Serve the OpenAPI schema written by ``manage.py build_schema``.
+
+    Content negotiation (YAML by default, JSON for Swagger UI and
+    ?format=json) works as in SpectacularAPIView. Only DEBUG generates the
+    schema per request, so local changes show up immediately.
+    """
+
+    # Keep the public description from SpectacularAPIView rather than this docstring
+    @extend_schema(description=inspect.cleandoc(SpectacularAPIView.__doc__), **SCHEMA_KWARGS)
+    def get(self, request, *args, **kwargs):
+        if settings.DEBUG:
+            return super().get(request, *args, **kwargs)
+
+        renderer = request.accepted_renderer
+        try:
+            body, etag = load_schema(renderer.format)
+        except SchemaNotBuilt as e:
+            logger.error(f"OpenAPI schema not found at {e}; run 'python manage.py build_schema'")
+            return HttpResponse('Schema unavailable', status=503, content_type='text/plain')
+
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = HttpResponse(body, content_type=renderer.media_type)
+            response['Content-Disposition'] = f'inline; filename="schema.{renderer.format}"'
+        response['ETag'] = etag
+        # Rebuilt on deploy; clients revalidate with the ETag after max-age
+        patch_cache_control(response, public=True, max_age=settings.OPENAPI_SCHEMA_MAX_AGE)
+        patch_vary_headers(response, ['Accept'])
+        return response
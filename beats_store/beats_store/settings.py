@@ -43,6 +43,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so its timings cover every other middleware
+    'beats.middleware.RequestMetricsMiddleware',
+    'beats.middleware.RequestProfilerMiddleware',
+    'beats.middleware.QueryAnalysisMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
@@ -94,7 +98,7 @@ if DEBUG:
     DATABASES = {
         'default': {
             'ENGINE': 'django.db.backends.sqlite3',
-            'NAME': BASE_DIR / 'db.sqlite3',
+            'NAME': config('SQLITE_PATH', default=str(BASE_DIR / 'db.sqlite3')),
         }
     }
 else:
@@ -182,6 +186,9 @@ USE_S3 = (
     AWS_STORAGE_BUCKET_NAME is not None
 )
 
+# Store media under the hash of its content, so identical uploads share one object (see beats.storage)
+MEDIA_CONTENT_ADDRESSED = config('MEDIA_CONTENT_ADDRESSED', default=False, cast=bool)
+
 if USE_S3:
     # AWS S3 settings
     AWS_S3_REGION_NAME = config('AWS_S3_REGION_NAME', default='us-east-1')
@@ -201,7 +208,11 @@ if USE_S3:
     AWS_S3_SECURE_URLS = True  # Force HTTPS in generated URLs
     
     # Media files (user uploads)
-    DEFAULT_FILE_STORAGE = 'storages.backends.s3boto3.S3Boto3Storage'
+    # S3Boto3Storage with its calls timed for the request metrics
+    DEFAULT_FILE_STORAGE = (
+        'beats.storage.ContentAddressedS3Storage' if MEDIA_CONTENT_ADDRESSED
+        else 'beats.storage.TimedS3Storage'
+    )
     
     # Generate correct S3 URL based on region
     # For most regions: https://bucket-name.s3.region.amazonaws.com/
@@ -216,7 +227,32 @@ if USE_S3:
 else:
     # Local file storage (fallback when S3 credentials not provided)
     MEDIA_URL = "/media/"
-    MEDIA_ROOT = BASE_DIR / "media"
+    MEDIA_ROOT = config('MEDIA_ROOT', default=str(BASE_DIR / "media"))
+    DEFAULT_FILE_STORAGE = (
+        'beats.storage.ContentAddressedFileSystemStorage' if MEDIA_CONTENT_ADDRESSED
+        else 'beats.storage.TimedFileSystemStorage'
+    )
+
+# How local media leaves the server once Django has authorized it (see beats.sendfile):
+# '' (FileResponse/os.sendfile), 'nginx' (X-Accel-Redirect) or 'xsendfile' (X-Sendfile)
+MEDIA_SENDFILE_BACKEND = config('MEDIA_SENDFILE_BACKEND', default='')
+# Internal nginx location that aliases MEDIA_ROOT, for X-Accel-Redirect
+MEDIA_SENDFILE_PREFIX = config('MEDIA_SENDFILE_PREFIX', default='/protected-media/')
+
+# Local read-through cache for media read from S3 (see beats.diskcache); empty disables it
+MEDIA_CACHE_DIR = config('MEDIA_CACHE_DIR', default='')
+MEDIA_CACHE_MAX_BYTES = config('MEDIA_CACHE_MAX_BYTES', default=5 * 1024 ** 3, cast=int)
+
+# Also encode the preview renditions of each snippet as Opus (see beats.media.PREVIEW_BITRATES);
+# needs an ffmpeg built with libopus
+PREVIEW_OPUS = config('PREVIEW_OPUS', default=False, cast=bool)
+
+# Files up to this size are described (hashed) in media_metadata when saved; larger ones and
+# direct/resumable uploads are left to the backfill_media_metadata command (see beats.metadata)
+MEDIA_METADATA_INLINE_MAX_BYTES = config('MEDIA_METADATA_INLINE_MAX_BYTES', default=64 * 1024 ** 2, cast=int)
+
+# Lifetime in seconds of the upload forms handed out by /api/beats/<id>/upload/ (see beats.uploads)
+DIRECT_UPLOAD_EXPIRES = config('DIRECT_UPLOAD_EXPIRES', default=3600, cast=int)
 
 # Session Configuration
 SESSION_ENGINE = 'django.contrib.sessions.backends.db'
@@ -255,6 +291,16 @@ else:
 REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
     'DEFAULT_FILTER_BACKENDS': ['django_filters.rest_framework.DjangoFilterBackend'],
+    # orjson-backed JSON with a stdlib fallback when orjson isn't installed
+    'DEFAULT_RENDERER_CLASSES': [
+        'beats.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'beats.renderers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
         "rest_framework.authentication.SessionAuthentication",
         'rest_framework_simplejwt.authentication.JWTAuthentication',
@@ -274,6 +320,10 @@ SPECTACULAR_SETTINGS = {
     'REDOC_DIST': 'SIDECAR',
 }
 
+# Where manage.py build_schema writes the prebuilt schema served at /api/schema/
+OPENAPI_SCHEMA_DIR = config('OPENAPI_SCHEMA_DIR', default=str(BASE_DIR / 'openapi'))
+OPENAPI_SCHEMA_MAX_AGE = config('OPENAPI_SCHEMA_MAX_AGE', default=86400, cast=int)
+
 # JWT Configuration
 from datetime import timedelta
 
@@ -315,3 +365,24 @@ else:
     STRIPE_PUBLISHABLE_KEY = config('STRIPE_PUBLISHABLE_KEY', default=None)
     STRIPE_SECRET_KEY = config('STRIPE_SECRET_KEY', default=None)
     STRIPE_WEBHOOK_SECRET = config('STRIPE_WEBHOOK_SECRET', default=None)
+
+# Request metrics (see beats.instrumentation)
+# Bearer token Prometheus uses to scrape /metrics; without one only staff can read it
+METRICS_TOKEN = config('METRICS_TOKEN', default=None)
+# Add Server-Timing headers (total/db/storage/stripe) to every response
+SERVER_TIMING_HEADERS = config('SERVER_TIMING_HEADERS', default=DEBUG, cast=bool)
+
+# On-demand request profiling (see beats.profiling)
+PROFILER_ENABLED = config('PROFILER_ENABLED', default=True, cast=bool)
+PROFILER_TOKEN_MAX_AGE = config('PROFILER_TOKEN_MAX_AGE', default=15 * 60, cast=int)  # seconds
+PROFILER_MAX_PER_HOUR = config('PROFILER_MAX_PER_HOUR', default=20, cast=int)
+PROFILER_MAX_BYTES = config('PROFILER_MAX_BYTES', default=5 * 1024 * 1024, cast=int)
+PROFILER_KEEP = config('PROFILER_KEEP', default=100, cast=int)
+PROFILER_SAMPLE_INTERVAL = config('PROFILER_SAMPLE_INTERVAL', default=0.002, cast=float)  # seconds
+
+# SQL analysis (see beats.queries). The per-request analysis normalizes every statement,
+# so production leaves it off unless asked; the test suite turns it on where it checks for N+1s
+QUERY_ANALYSIS_ENABLED = config('QUERY_ANALYSIS_ENABLED', default=DEBUG, cast=bool)
+SLOW_QUERY_MS = config('SLOW_QUERY_MS', default=200, cast=int)  # 0 disables slow query logging
+QUERY_REPEAT_THRESHOLD = config('QUERY_REPEAT_THRESHOLD', default=5, cast=int)
+QUERY_REPEAT_RAISE = config('QUERY_REPEAT_RAISE', default=False, cast=bool)
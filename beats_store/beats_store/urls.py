@@ -1,14 +1,15 @@
 from django.contrib import admin
 from django.contrib.auth import logout
-from django.urls import path, include
+from django.urls import path, include, re_path
 from django.shortcuts import redirect
 from django.http import HttpRequest, HttpResponseRedirect
 from django.views.decorators.http import require_http_methods
 
 from django.conf import settings
-from django.conf.urls.static import static
-from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView, SpectacularRedocView
+from drf_spectacular.views import SpectacularSwaggerView, SpectacularRedocView
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+from beats.views import SchemaView, metrics, serve_media
+import re
 
 def redirect_to_admin(request: HttpRequest) -> HttpResponseRedirect:
     return redirect('/admin/', permanent=False)
@@ -25,13 +26,18 @@ urlpatterns = [
     path('admin/', admin.site.urls),
 
     path('api/', include('beats.urls')),
-    path('api/schema/', SpectacularAPIView.as_view(), name='schema'),
+    path('api/schema/', SchemaView.as_view(), name='schema'),
     path('api/docs/', SpectacularSwaggerView.as_view(url_name='schema'), name='swagger-ui'),
     path('api/redoc/', SpectacularRedocView.as_view(url_name='schema'), name='redoc'),
     path('api/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('metrics', metrics, name='metrics'),
 ]
 
-# Serve media files in both development and production
-# In production, consider using cloud storage (S3, etc.) for better performance
-urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+# Public local media (previews, covers and avatars; sold files only through the
+# download action); with S3, MEDIA_URL points at the bucket instead.
+# Files are handed to the front proxy or os.sendfile (see beats.sendfile)
+if not settings.USE_S3:
+    urlpatterns += [
+        re_path(rf'^{re.escape(settings.MEDIA_URL.lstrip("/"))}(?P<path>.+)$', serve_media, name='media'),
+    ]
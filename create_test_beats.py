@@ -15,6 +15,7 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'beats_store.settings')
 django.setup()
 
 from beats.models import Beat
+from beats.ingestion import bulk_ingestion
 from decimal import Decimal
 
 def create_test_beats():
@@ -73,10 +74,12 @@ def create_test_beats():
     ]
     
     created_beats = []
-    for beat_data in test_beats:
-        beat = Beat.objects.create(**beat_data)
-        created_beats.append(beat)
-        print(f"Created beat: {beat.name}")
+    # Queue snippet generation and run it once all beats exist
+    with bulk_ingestion():
+        for beat_data in test_beats:
+            beat = Beat.objects.create(**beat_data)
+            created_beats.append(beat)
+            print(f"Created beat: {beat.name}")
     
     print(f"\nSuccessfully created {len(created_beats)} test beats!")
     print("You can now see the beats in your frontend application.")